@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Memory per track of a whole library held in RAM: the rows of the library index as dicts
+    (LibraryIndex.tracks()), as TrackRecords (LibraryIndex.records()), and of the search index
+    built from the records. The library index is filled with synthetic rows (12 tracks per album, 5
+    albums per artist, short lyrics), no MP3 file is written.
+
+    Usage: python benchmarks/bench_memory.py [number of tracks]
+"""
+
+import gc
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+from typing import Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+# pylint: disable=wrong-import-position
+from library_index import LibraryIndex
+from search_index import SearchIndex
+
+
+def _fill(library: LibraryIndex, count: int) -> None:
+    rng = random.Random(2018)
+    rows = []
+    for index in range(count):
+        album, number = divmod(index, 12)
+        artist = f'Artist Name {album // 5}'
+        title = f'Track Title {index}'
+        rows.append((f'/home/user/Music/{artist}/Album Title {album}/{number + 1:02} - {title}.mp3',
+                     7_500_000, 1_700_000_000_000_000_000 + index, title, artist, f'Album Title {album}', artist,
+                     str(1960 + album % 60), rng.choice(['Rock', 'Jazz', 'Pop', 'Classical']), str(number + 1),
+                     'la la la\n' * 20))
+
+    library._upsert(rows)  # pylint: disable=protected-access
+
+
+def _measure(build: Callable[[], object], count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size / count
+
+
+def main():
+    """
+        Main Function
+    """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    with tempfile.TemporaryDirectory() as directory:
+        with LibraryIndex(os.path.join(directory, 'library.sqlite3')) as library:
+            _fill(library, count)
+
+            print(f"{'tracks() dicts':>14}: {_measure(library.tracks, count):7.0f} bytes/track")
+            print(f"{'records()':>14}: {_measure(library.records, count):7.0f} bytes/track")
+            print(f"{'SearchIndex':>14}: {_measure(lambda: SearchIndex(library.records()), count):7.0f} bytes/track")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Compares the latency and the bytes read of opening a file the old way (EasyID3 + MP3, as
+    TagEditor.file_open used to do) with a single TagSession parse.
+
+    Usage: python benchmarks/bench_open.py [number of files]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+# pylint: disable=wrong-import-position
+from mutagen.easyid3 import EasyID3
+from mutagen.mp3 import MP3
+
+from corpus import CorpusSpec, generate, io_counters
+from tag_engine import TagSession
+
+
+def _old_open(path: str):
+    EasyID3(path)
+    MP3(path)
+
+
+def _session_open(path: str):
+    TagSession(path)
+
+
+def main():
+    """
+        Main Function
+    """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = generate(directory, CorpusSpec(tracks=count, lyrics_size=0, missing_header_ratio=0))
+
+        for name, opener in (('EasyID3 + MP3', _old_open), ('TagSession', _session_open)):
+            read_before, start = io_counters()['read'], time.perf_counter()
+            for path in paths:
+                opener(path)
+            elapsed, read = time.perf_counter() - start, io_counters()['read'] - read_before
+
+            print(f"{name:>14}: {elapsed / count * 1000:7.3f} ms/file, {read / count / 1024:8.1f} KiB read/file")
+
+
+if __name__ == '__main__':
+    main()
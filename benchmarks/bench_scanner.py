@@ -0,0 +1,51 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Throughput (files/sec) of reading the editor tags of a library with EasyID3 (what
+    album_art_all_songs used to do), with a full TagSession parse and with the header-only
+    id3_scanner.
+
+    Usage: python benchmarks/bench_scanner.py [number of files]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+# pylint: disable=wrong-import-position
+from mutagen.easyid3 import EasyID3
+
+import id3_scanner
+from corpus import CorpusSpec, generate, io_counters
+from tag_engine import TagSession
+
+
+def main():
+    """
+        Main Function
+    """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    readers = (('EasyID3', EasyID3),
+               ('TagSession', lambda path: TagSession(path).values()),
+               ('id3_scanner', id3_scanner.scan_tags))
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = generate(directory, CorpusSpec(tracks=count, lyrics_size=0, missing_header_ratio=0))
+
+        for name, reader in readers:
+            read_before, start = io_counters()['read'], time.perf_counter()
+            for path in paths:
+                reader(path)
+            elapsed, read = time.perf_counter() - start, io_counters()['read'] - read_before
+
+            print(f"{name:>12}: {count / elapsed:9.0f} files/sec, {read / count / 1024:8.1f} KiB read/file")
+
+
+if __name__ == '__main__':
+    main()
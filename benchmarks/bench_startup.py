@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Start up time of the GUI and of the batch command line tool.
+
+    The GUI is started with PYMTAG_STARTUP_PROFILE set, which makes it record when its imports were
+    done and when the first frame was on screen, and exit. The slowest top level imports are taken
+    from `python -X importtime`. Needs a display for the GUI part.
+
+    Usage: python benchmarks/bench_startup.py [--runs N] [--no-gui]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SOURCE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+
+def _top_imports(import_log: str, count: int = 10) -> list:
+    """
+        Slowest top level imports of an `-X importtime` log, cumulative microseconds
+    """
+    imports = []
+    for line in import_log.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        _self_time, cumulative, name = line.split('|')
+        if not name[1:].startswith(' '):  # nested imports are indented further
+            imports.append((name.strip(), int(cumulative)))
+
+    return sorted(imports, key=lambda item: -item[1])[:count]
+
+
+def _gui_run() -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        profile = os.path.join(directory, 'profile.json')
+        environment = dict(os.environ, PYMTAG_STARTUP_PROFILE=profile)
+
+        launched = time.time()
+        completed = subprocess.run([sys.executable, '-X', 'importtime', 'py_main.py'], cwd=SOURCE_DIRECTORY,
+                                   env=environment, stderr=subprocess.PIPE, text=True, timeout=120, check=True)
+
+        with open(profile) as profile_file:
+            timings = json.load(profile_file)
+
+    return {'imports_s': timings['imports_done'] - launched, 'first_frame_s': timings['first_frame'] - launched,
+            'top_imports_us': _top_imports(completed.stderr)}
+
+
+def _cli_run() -> dict:
+    launched = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-X', 'importtime', 'py_batch.py', '--help'], cwd=SOURCE_DIRECTORY,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=60, check=True)
+
+    return {'total_s': time.perf_counter() - launched, 'kivy_imported': 'kivy' in completed.stderr,
+            'top_imports_us': _top_imports(completed.stderr)}
+
+
+def main():
+    """
+        Main Function
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--no-gui', dest='gui', action='store_false')
+    args = parser.parse_args()
+
+    report = {}
+    cli_runs = [_cli_run() for _ in range(args.runs)]
+    report['cli'] = {'total_s': statistics.median(run['total_s'] for run in cli_runs),
+                     'kivy_imported': any(run['kivy_imported'] for run in cli_runs),
+                     'top_imports_us': cli_runs[-1]['top_imports_us']}
+
+    if args.gui:
+        gui_runs = [_gui_run() for _ in range(args.runs)]
+        report['gui'] = {'imports_s': statistics.median(run['imports_s'] for run in gui_runs),
+                         'first_frame_s': statistics.median(run['first_frame_s'] for run in gui_runs),
+                         'top_imports_us': gui_runs[-1]['top_imports_us']}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
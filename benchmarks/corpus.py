@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Reproducible synthetic MP3 library for the benchmarks.
+
+    Files are made of silent MPEG frames with ID3 tags whose number of albums, text sizes, album
+    art sizes and ID3 versions are configurable; a share of the files can be left without any
+    ID3 header. The same spec and seed always produce the same bytes.
+
+    Usage: python benchmarks/corpus.py DIRECTORY [--tracks N] [--apic-size BYTES] ...
+"""
+
+import argparse
+import os
+import random
+import resource
+import sys
+from typing import Dict, List, NamedTuple, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+# pylint: disable=wrong-import-position
+from mutagen.id3 import APIC, ID3, TALB, TCON, TDRC, TIT2, TPE1, TPE2, TRCK, USLT
+
+# one silent MPEG-1 layer III frame, 128 kbps 44.1 kHz (26 ms of audio)
+MPEG_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+
+
+class CorpusSpec(NamedTuple):
+    """
+        Shape of the synthetic library
+    """
+    tracks: int = 500
+    albums: int = 25
+    lyrics_size: int = 2048  # bytes of lyrics per track, 0 for none
+    apic_size: int = 200 * 1024  # bytes of album art per track, 0 for none
+    id3_versions: Tuple[int, ...] = (3, 4)  # ID3v2 minor versions, picked per track
+    missing_header_ratio: float = 0.05  # share of tracks without any ID3 tag
+    audio_frames: int = 2300  # ~1 minute of audio
+    seed: int = 2018
+
+
+def io_counters() -> Dict[str, int]:
+    """
+        Bytes read and written by this process so far (Linux only, zeros elsewhere)
+
+    :return: {'read': ..., 'written': ...}
+    :rtype: dict
+    """
+    counters = {'read': 0, 'written': 0}
+    try:
+        with open('/proc/self/io') as io_stats:
+            for line in io_stats:
+                name, value = line.split(':')
+                if name == 'rchar':
+                    counters['read'] = int(value)
+                elif name == 'wchar':
+                    counters['written'] = int(value)
+    except OSError:
+        pass
+
+    return counters
+
+
+def peak_rss_kib() -> int:
+    """
+        Peak resident set size of this process, in KiB
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def generate(directory: str, spec: CorpusSpec = CorpusSpec()) -> List[str]:
+    """
+        Writes the library, one sub directory per album
+
+    :param directory: where to write the library
+    :type directory: str
+    :param spec: shape of the library
+    :type spec: CorpusSpec
+    :return: paths of the tracks
+    :rtype: list
+    """
+    rng = random.Random(spec.seed)
+    album_art = [rng.randbytes(spec.apic_size) for _ in range(spec.albums)] if spec.apic_size else []
+    audio = MPEG_FRAME * spec.audio_frames
+
+    paths = []
+    for index in range(spec.tracks):
+        album = index % spec.albums
+        album_directory = os.path.join(directory, f'Album {album:04}')
+        os.makedirs(album_directory, exist_ok=True)
+
+        path = os.path.join(album_directory, f'{index:06}.mp3')
+        with open(path, 'wb') as file:
+            file.write(audio)
+        paths.append(path)
+
+        if rng.random() < spec.missing_header_ratio:
+            continue
+
+        tags = ID3()
+        tags.add(TIT2(encoding=3, text=f'Title {index}'))
+        tags.add(TPE1(encoding=3, text=f'Artist {rng.randrange(spec.albums * 4)}'))
+        tags.add(TALB(encoding=3, text=f'Album {album}'))
+        tags.add(TPE2(encoding=3, text=f'Album Artist {album}'))
+        tags.add(TDRC(encoding=3, text=str(1960 + album % 60)))
+        tags.add(TCON(encoding=3, text=rng.choice(['Rock', 'Jazz', 'Pop', 'Classical', 'Electronic'])))
+        tags.add(TRCK(encoding=3, text=str(index // spec.albums + 1)))
+        if spec.lyrics_size:
+            tags.add(USLT(encoding=3, lang='eng', desc='Lyrics',
+                          text=''.join(rng.choices('abcdefghij \n', k=spec.lyrics_size))))
+        if album_art:
+            tags.add(APIC(mime='image/jpeg', type=3, desc='Cover', encoding=1, data=album_art[album]))
+
+        tags.save(path, v2_version=rng.choice(spec.id3_versions))
+
+    return paths
+
+
+def main():
+    """
+        Main Function
+    """
+    parser = argparse.ArgumentParser(description='Writes a synthetic MP3 library')
+    parser.add_argument('directory')
+    for field, default in CorpusSpec._field_defaults.items():
+        if field == 'id3_versions':
+            parser.add_argument('--id3-versions', type=int, nargs='+', default=default, choices=(3, 4))
+        else:
+            parser.add_argument(f"--{field.replace('_', '-')}", type=type(default), default=default)
+
+    args = vars(parser.parse_args())
+    directory = args.pop('directory')
+    args['id3_versions'] = tuple(args['id3_versions'])
+
+    paths = generate(directory, CorpusSpec(**args))
+    print(f"{len(paths)} tracks written to {directory}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Benchmark suite: generates a synthetic library (see corpus.py) in a temporary directory and
+    times the code paths behind the editor on it:
+
+        scan       header-only reads of the editor tags (library index refresh)
+        open       TagEditor.file_open: one TagSession parse, tags and album art
+        save       TagEditor.save_file: edit a field and the lyrics, single write
+        album_art  TagEditor.album_art_all_songs: index lookup and album-wide cover art
+        rename     renaming every file from its tags
+
+    Results are printed (or written with --output) as JSON, with files/sec, bytes read/written and
+    the peak RSS after every benchmark, so runs can be compared across releases and machines.
+
+    Usage: python benchmarks/run_benchmarks.py [--tracks N] [--only open save] [--output FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+# pylint: disable=wrong-import-position
+import mutagen
+
+import artwork
+import id3_scanner
+import tag_engine
+from corpus import CorpusSpec, generate, io_counters, peak_rss_kib
+from library_index import LibraryIndex
+
+
+def _bench_scan(paths: List[str]) -> List[str]:
+    for path in paths:
+        id3_scanner.scan_tags(path)
+    return paths
+
+
+def _bench_open(paths: List[str]) -> List[str]:
+    for path in paths:
+        session = tag_engine.TagSession(path)
+        session.values()
+        _ = session.cover
+    return paths
+
+
+def _bench_save(paths: List[str]) -> List[str]:
+    for path in paths:
+        session = tag_engine.TagSession(path)
+        session['title'] = session['title'] + ' (Remastered)'
+        session['lyrics'] = session['lyrics'] + '\nla la la'
+        session.save()
+    return paths
+
+
+def _bench_album_art(paths: List[str]) -> List[str]:
+    cover = artwork.prepare(os.urandom(300 * 1024), None)
+
+    with LibraryIndex(':memory:') as library:
+        library.refresh({os.path.dirname(path) for path in paths}, workers=1)
+
+        for album, album_artist in {(row['album'], row['albumartist']) for row in library.tracks()}:
+            if album and album_artist:
+                tag_engine.apply_cover_to_album(library.tracks_of_album(album, album_artist), album,
+                                                album_artist, cover.picture())
+    return paths
+
+
+def _bench_rename(paths: List[str]) -> List[str]:
+    renamed = []
+    for path in paths:
+        try:
+            renamed.append(tag_engine.rename_file(path, 'artist-title'))
+        except (FileExistsError, KeyError, ValueError):
+            renamed.append(path)
+    return renamed
+
+
+BENCHMARKS = {'scan': _bench_scan, 'open': _bench_open, 'save': _bench_save, 'album_art': _bench_album_art,
+              'rename': _bench_rename}
+
+
+def _measure(name: str, benchmark: Callable[[List[str]], List[str]], paths: List[str]):
+    io_before, start = io_counters(), time.perf_counter()
+    paths = benchmark(paths)
+    elapsed, io_after = time.perf_counter() - start, io_counters()
+
+    return paths, {'name': name, 'files': len(paths), 'seconds': round(elapsed, 4),
+                   'files_per_sec': round(len(paths) / elapsed, 1) if elapsed else None,
+                   'bytes_read': io_after['read'] - io_before['read'],
+                   'bytes_written': io_after['written'] - io_before['written'],
+                   'peak_rss_kib': peak_rss_kib()}
+
+
+def _revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main():
+    """
+        Main Function
+    """
+    parser = argparse.ArgumentParser(description='PyMTag benchmark suite')
+    defaults = CorpusSpec()
+    parser.add_argument('--tracks', type=int, default=defaults.tracks)
+    parser.add_argument('--albums', type=int, default=defaults.albums)
+    parser.add_argument('--apic-size', type=int, default=defaults.apic_size)
+    parser.add_argument('--lyrics-size', type=int, default=defaults.lyrics_size)
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--output', help='write the JSON report to this file')
+    args = parser.parse_args()
+
+    spec = CorpusSpec(tracks=args.tracks, albums=args.albums, apic_size=args.apic_size,
+                      lyrics_size=args.lyrics_size)
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        paths = generate(directory, spec)
+        report = {'revision': _revision(), 'python': platform.python_version(), 'mutagen': mutagen.version_string,
+                  'platform': platform.platform(), 'corpus': spec._asdict(),
+                  'corpus_seconds': round(time.perf_counter() - start, 4), 'benchmarks': []}
+
+        for name in BENCHMARKS:
+            if name in args.only:
+                paths, result = _measure(name, BENCHMARKS[name], paths)
+                report['benchmarks'].append(result)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Album art preparation before embedding.
+
+    The picked image can optionally be normalized: downscaled to a maximum dimension and
+    re-encoded as JPEG, so that an 8 MB PNG scan isn't copied verbatim into every track of an
+    album. Prepared images are cached by content hash, so a batch embeds the very same encoded
+    bytes in every file. The mime type always comes from the actual image format.
+
+    Normalization needs Pillow; without it images are embedded as they are.
+"""
+
+import hashlib
+import os
+from functools import lru_cache
+from io import BytesIO
+from typing import NamedTuple, Optional
+
+from mutagen.id3 import APIC
+
+import tracing
+
+
+class NormalizeOptions(NamedTuple):
+    """
+        How album art is normalized before embedding
+    """
+    max_size: int = 1000  # maximum width and height in pixels
+    quality: int = 90  # JPEG quality
+
+
+DEFAULT_OPTIONS = NormalizeOptions()
+
+
+class CoverArt(NamedTuple):
+    """
+        Album art ready to be embedded
+    """
+    data: bytes
+    mime: str
+    digest: str  # blake2b hash of `data`
+
+    def picture(self) -> APIC:
+        """
+            Front cover frame holding the image
+        """
+        return APIC(mime=self.mime, type=3, desc=u'Cover', encoding=1, data=self.data)
+
+
+def detect_mime(data: bytes) -> str:
+    """
+        Mime type of the image, from its signature
+
+    :param data: content of the image
+    :type data: bytes
+    :return: the mime type, 'image/jpeg' when the format isn't recognised
+    :rtype: str
+    """
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if data.startswith((b'GIF87a', b'GIF89a')):
+        return 'image/gif'
+    if data.startswith(b'BM'):
+        return 'image/bmp'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+
+    return 'image/jpeg'
+
+
+def content_hash(data: bytes) -> str:
+    """
+        Hash identifying the image content
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def normalize(data: bytes, options: NormalizeOptions = DEFAULT_OPTIONS) -> bytes:
+    """
+        Downscales the image to `options.max_size` and re-encodes it as JPEG.
+        A JPEG which is already small enough is kept as it is, to avoid a lossy re-encode.
+
+    :param data: content of the image
+    :type data: bytes
+    :param options: normalization options
+    :type options: NormalizeOptions
+    :return: content of the normalized image (`data` itself when Pillow isn't installed)
+    :rtype: bytes
+    """
+    # Pillow is optional and slow to import, it is only loaded when an image is normalized
+    try:
+        from PIL import Image  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return data
+
+    with Image.open(BytesIO(data)) as image:
+        if detect_mime(data) == 'image/jpeg' and max(image.size) <= options.max_size:
+            return data
+
+        image.thumbnail((options.max_size, options.max_size), Image.LANCZOS)
+
+        if image.mode in ('RGBA', 'LA', 'P'):
+            # JPEG has no transparency, flattening on white
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        encoded = BytesIO()
+        image.save(encoded, format='JPEG', quality=options.quality, optimize=True)
+
+    return encoded.getvalue()
+
+
+@lru_cache(maxsize=4)
+def _prepare(data: bytes, options: Optional[NormalizeOptions]) -> CoverArt:
+    if options is not None:
+        data = normalize(data, options)
+
+    return CoverArt(data, detect_mime(data), content_hash(data))
+
+
+def prepare(data: bytes, options: Optional[NormalizeOptions] = DEFAULT_OPTIONS) -> CoverArt:
+    """
+        Prepares the image for embedding. Results are cached, so preparing the same image again
+        (e.g. for every track of an album) returns the very same encoded bytes.
+
+    :param data: content of the image
+    :type data: bytes
+    :param options: normalization options, None to embed the image as it is
+    :type options: NormalizeOptions
+    :return: the prepared album art
+    :rtype: CoverArt
+    """
+    return _prepare(data, options)
+
+
+@lru_cache(maxsize=4)
+def _load(path: str, _mtime_ns: int, options: Optional[NormalizeOptions]) -> CoverArt:
+    with tracing.span('artwork.load', path=path), open(path, 'rb') as image_file:
+        data = image_file.read()
+        tracing.count('bytes_read', len(data))
+        return prepare(data, options)
+
+
+def load(path: str, options: Optional[NormalizeOptions] = DEFAULT_OPTIONS) -> CoverArt:
+    """
+        Reads and prepares the image file; it is read and encoded only once per process as long
+        as it isn't modified
+
+    :param path: path of the image
+    :type path: str
+    :param options: normalization options, None to embed the image as it is
+    :type options: NormalizeOptions
+    :return: the prepared album art
+    :rtype: CoverArt
+    """
+    return _load(os.path.abspath(path), os.stat(path).st_mtime_ns, options)
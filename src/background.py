@@ -0,0 +1,176 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Runs blocking work (file dialogs, tag parsing and saving, album wide jobs) on worker threads
+    and hands the results back to the Kivy main thread with Clock.schedule_once, so the window
+    keeps drawing frames while the work is going on.
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from kivy.clock import Clock
+
+
+class Cancelled(Exception):
+    """
+        Raised by :meth:`CancelToken.raise_if_cancelled` once the task was cancelled
+    """
+
+
+class CancelToken:
+    """
+        Cooperative cancellation flag shared between the UI and a background task
+    """
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+
+    def __repr__(self) -> str:
+        return f"CancelToken(cancelled={self.cancelled})"
+
+    def cancel(self) -> None:
+        """
+            Asks the task to stop
+        """
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """
+            whether the task was asked to stop
+        """
+        return self._event.is_set()
+
+    @property
+    def event(self) -> threading.Event:
+        """
+            the underlying event, for engine functions taking a `cancel` event
+        """
+        return self._event
+
+    def raise_if_cancelled(self) -> None:
+        """
+            Raises :class:`Cancelled` if the task was asked to stop
+        """
+        if self.cancelled:
+            raise Cancelled()
+
+
+class BackgroundTask:
+    """
+        Handle of a submitted task
+    """
+
+    def __init__(self, future: Future, token: CancelToken) -> None:
+        self.future = future
+        self.token = token
+
+    def __repr__(self) -> str:
+        return f"BackgroundTask(done={self.future.done()}, {self.token!r})"
+
+    def cancel(self) -> None:
+        """
+            Cancels the task, it is dropped if it didn't start yet
+        """
+        self.token.cancel()
+        self.future.cancel()
+
+
+class _ProgressReporter:
+    """
+        Forwards progress from the worker to the main thread, at most once per frame
+    """
+
+    def __init__(self, on_progress: Callable[[int, int], None]) -> None:
+        self._on_progress = on_progress
+        self._lock = threading.Lock()
+        self._latest = None
+
+    def __call__(self, done: int, total: int) -> None:
+        with self._lock:
+            scheduled = self._latest is not None
+            self._latest = (done, total)
+
+        if not scheduled:
+            Clock.schedule_once(self._report)
+
+    def _report(self, _dt: float) -> None:
+        with self._lock:
+            latest, self._latest = self._latest, None
+
+        if latest is not None:
+            self._on_progress(*latest)
+
+
+class BackgroundRunner:
+    """
+        Thread pool whose results are delivered on the Kivy main thread
+    """
+
+    def __init__(self, max_workers: int = 2) -> None:
+        """
+
+        :param max_workers: number of worker threads
+        :type max_workers: int
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pymtag')
+
+    def __repr__(self) -> str:
+        return "BackgroundRunner"
+
+    def submit(self, function: Callable, *args, on_done: Optional[Callable] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None,
+               on_progress: Optional[Callable[[int, int], None]] = None,
+               token: Optional[CancelToken] = None, **kwargs) -> BackgroundTask:
+        """
+            Runs `function(*args, **kwargs)` on a worker thread.
+
+            When `on_progress` is given the function is also passed a `progress(done, total)`
+            callable which is safe to call from the worker. For cancellable work pass the token's
+            event to the function (e.g. `cancel=token.event`) and the token itself as `token`.
+
+        :param function: the blocking work
+        :type function: Callable
+        :param on_done: called on the main thread with the result
+        :type on_done: Callable
+        :param on_error: called on the main thread with the raised exception (Cancelled included)
+        :type on_error: Callable
+        :param on_progress: called on the main thread with (done, total)
+        :type on_progress: Callable
+        :param token: cancellation token of the task
+        :type token: CancelToken
+        :return: handle to cancel the task
+        :rtype: BackgroundTask
+        """
+        token = token or CancelToken()
+        if on_progress is not None:
+            kwargs['progress'] = _ProgressReporter(on_progress)
+
+        future = self._executor.submit(function, *args, **kwargs)
+
+        def _hand_back(finished: Future) -> None:
+            if finished.cancelled():
+                if on_error is not None:
+                    Clock.schedule_once(lambda _dt: on_error(Cancelled()))
+                return
+
+            error = finished.exception()
+            if error is not None:
+                if on_error is not None:
+                    Clock.schedule_once(lambda _dt: on_error(error))
+            elif on_done is not None:
+                result = finished.result()
+                Clock.schedule_once(lambda _dt: on_done(result))
+
+        future.add_done_callback(_hand_back)
+        return BackgroundTask(future, token)
+
+    def shutdown(self) -> None:
+        """
+            Cancels queued tasks and stops the worker threads
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
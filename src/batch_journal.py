@@ -0,0 +1,194 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Checkpoints of batch jobs, so that a job interrupted by a crash, a reboot or a cancel resumes
+    where it stopped instead of starting over.
+
+    Every file a job is done with is appended to the journal of the operation as its path and
+    mtime (after the job wrote it). The journal is named after a hash of the operation and its
+    parameters, so running the same operation again reads it back into a dict and skips every
+    file whose mtime didn't change since, with one lookup and one stat per file. The journal is
+    flushed to disk every SYNC_EVERY files; a crash costs at most those files being done again,
+    which is harmless as the jobs only write files whose tags differ. It is deleted once a run
+    finished without failures.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# next to the library index, see library_index.DEFAULT_DATABASE (not imported, it imports tag_engine)
+DEFAULT_BATCH_DIRECTORY = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+                                       'pymtag', 'batches')
+
+# files appended to the journal between two fsyncs
+SYNC_EVERY = 256
+
+
+def operation_key(*parts: object) -> str:
+    """
+        Name of the journal of an operation, e.g. operation_key('cover', image_hash, paths)
+
+    :param parts: everything which makes the operation different from another one, JSON serializable
+    :type parts: object
+    :return: a short hash of the parts
+    :rtype: str
+    """
+    data = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str).encode()
+    return hashlib.blake2b(data, digest_size=12).hexdigest()
+
+
+class BatchJournal:
+    """
+        Append-only journal of the files an operation is done with
+    """
+
+    def __init__(self, operation: str, directory: str = DEFAULT_BATCH_DIRECTORY) -> None:
+        """
+
+        :param operation: key of the operation, see :func:`operation_key`
+        :type operation: str
+        :param directory: directory of the journals
+        :type directory: str
+        """
+        self.path = os.path.join(directory, f"{operation}.journal")
+        self._lock = threading.Lock()
+        self._file = None
+        self._unsynced = 0
+        self._done: Dict[str, int] = {}  # path -> mtime_ns once done
+
+        try:
+            with open(self.path, encoding='utf-8') as journal:
+                for line in journal:
+                    try:
+                        path, mtime_ns = json.loads(line)
+                    except ValueError:
+                        continue  # the last line, cut short by a crash
+                    self._done[path] = mtime_ns
+        except FileNotFoundError:
+            pass
+
+    def __repr__(self) -> str:
+        return f"BatchJournal({self.path!r}, {len(self._done)} done)"
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+    def __enter__(self) -> 'BatchJournal':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def __contains__(self, path: str) -> bool:
+        """
+            whether the operation is done with the file, and the file didn't change since
+        """
+        mtime_ns = self._done.get(os.path.abspath(path))
+        if mtime_ns is None:
+            return False
+
+        try:
+            return os.stat(path).st_mtime_ns == mtime_ns
+        except OSError:
+            return False
+
+    def record(self, path: str) -> None:
+        """
+            Marks the file as done, with its current mtime
+
+        :param path: path of the file
+        :type path: str
+        """
+        path = os.path.abspath(path)
+        mtime_ns = os.stat(path).st_mtime_ns
+
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, 'a', encoding='utf-8')  # pylint: disable=consider-using-with
+
+            self._file.write(json.dumps([path, mtime_ns], ensure_ascii=False) + '\n')
+            self._done[path] = mtime_ns
+
+            self._unsynced += 1
+            if self._unsynced >= SYNC_EVERY:
+                self._sync()
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self) -> None:
+        """
+            Flushes the journal to disk and closes it, a later run resumes from it
+        """
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def discard(self) -> None:
+        """
+            Deletes the journal, once the operation finished
+        """
+        self.close()
+        self._done.clear()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class ProgressMeter:
+    """
+        Estimated time left of a batch job, from the rate since the first progress report: files
+        skipped thanks to the journal are reported at once when the job starts, so they don't
+        make the rate look faster than it is
+    """
+
+    def __init__(self) -> None:
+        self._start: Optional[Tuple[float, int]] = None  # time and files done at the first report
+
+    def __repr__(self) -> str:
+        return f"ProgressMeter({self._start})"
+
+    def eta(self, done: int, total: int) -> Optional[float]:
+        """
+            Seconds left
+
+        :param done: files done, skipped ones included
+        :type done: int
+        :param total: files of the job
+        :type total: int
+        :return: the estimate, None until the rate is known
+        :rtype: float
+        """
+        now = time.monotonic()
+        if self._start is None:
+            self._start = (now, done)
+            return None
+
+        started, done_before = self._start
+        if done <= done_before:
+            return None
+
+        return (now - started) / (done - done_before) * (total - done)
+
+    def text(self, done: int, total: int) -> str:
+        """
+            Progress as shown to the user, e.g. '120/1000, 0:42 left'
+        """
+        eta = self.eta(done, total)
+        if eta is None:
+            return f"{done}/{total}"
+
+        minutes, seconds = divmod(int(eta), 60)
+        return f"{done}/{total}, {minutes}:{seconds:02d} left"
@@ -0,0 +1,261 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Extraction of the embedded album art of a file or a whole tree.
+
+    The album art is read by the header-only scanner (the tag block only, never the audio) and
+    identified by its content hash, so an image shared by the tracks of an album is written once:
+        * folder mode writes folder.jpg (or .png...) in every directory, with the image most of its
+          tracks have; an existing folder image is kept unless asked to overwrite it,
+        * cache mode writes every distinct image to a content-addressed directory, as
+          <cache>/<first two hex digits>/<hash>.jpg, and reports which image every track has.
+
+    Jobs run on the process pool of tag_engine, one per directory in folder mode and one per file
+    in cache mode. Workers write the images themselves, so image data never goes through the
+    pool's pipes; images are written to a temporary file which is then renamed, an interrupted run
+    never leaves a partial image behind.
+"""
+
+import itertools
+import os
+import stat
+import tempfile
+from collections import Counter
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Sequence, Tuple
+
+import artwork
+import id3_scanner
+import tag_engine
+
+MODE_FOLDER = 'folder'
+MODE_CACHE = 'cache'
+MODES = (MODE_FOLDER, MODE_CACHE)
+
+DEFAULT_COVER_DIRECTORY = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+                                       'pymtag', 'covers')
+
+FOLDER_NAME = 'folder'
+
+EXTENSIONS = {'image/jpeg': '.jpg', 'image/png': '.png', 'image/gif': '.gif', 'image/bmp': '.bmp',
+              'image/webp': '.webp'}
+
+
+class ExtractedCover(NamedTuple):
+    """
+        An image extracted from a file (cache mode) or a directory (folder mode)
+    """
+    digest: str  # content hash of the image
+    path: str  # where the image is
+    written: bool  # False when the image (or, in folder mode, another folder image) was already there
+
+
+class ExtractSummary(NamedTuple):
+    """
+        Outcome of :func:`extract_covers`, counted in files (cache mode) or directories (folder mode)
+    """
+    written: int
+    existing: int
+    without_art: int
+    failed: Dict[str, str]
+
+
+def image_extension(data: bytes) -> str:
+    """
+        File extension of the image, from its signature
+
+    :param data: content of the image
+    :type data: bytes
+    :return: e.g. '.jpg'
+    :rtype: str
+    """
+    return EXTENSIONS.get(artwork.detect_mime(data), '.jpg')
+
+
+def write_image(data: bytes, path: str, mode: int = 0o644, replace: bool = True) -> bool:
+    """
+        Writes the image to a temporary file next to `path` and renames it to `path`
+
+    :param data: content of the image
+    :type data: bytes
+    :param path: path of the image file
+    :type path: str
+    :param mode: permissions of the image file
+    :type mode: int
+    :param replace: replace an existing file, else leave it (even one created while writing)
+    :type replace: bool
+    :return: whether the image was written
+    :rtype: bool
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    fd, temporary = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', suffix='.tmp', dir=directory)
+    try:
+        os.fchmod(fd, mode)  # mkstemp creates the file readable by its owner only
+        with os.fdopen(fd, 'wb') as image:
+            image.write(data)
+
+        if replace:
+            os.replace(temporary, path)
+            return True
+
+        # linking fails if the file exists, unlike a rename
+        try:
+            os.link(temporary, path)
+            written = True
+        except FileExistsError:
+            written = False
+        except OSError:
+            # no hard links on this file system (e.g. FAT), the file is replaced
+            os.replace(temporary, path)
+            return True
+
+        os.unlink(temporary)
+        return written
+
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+
+
+def cache_cover(path: str, cache_directory: str = DEFAULT_COVER_DIRECTORY) -> Optional[ExtractedCover]:
+    """
+        Copies the album art of the file to the content-addressed cache, unless the same image
+        already is in it
+
+    :param path: path of the MP3 file
+    :type path: str
+    :param cache_directory: root of the cache
+    :type cache_directory: str
+    :return: the image in the cache, None when the file has no album art
+    :rtype: ExtractedCover
+    """
+    data = id3_scanner.scan_cover(path)
+    if data is None:
+        return None
+
+    digest = artwork.content_hash(data)
+    target = os.path.join(cache_directory, digest[:2], digest + image_extension(data))
+    if os.path.exists(target):
+        return ExtractedCover(digest, target, False)
+
+    # two workers may find the same new image at once, only one of them writes it
+    return ExtractedCover(digest, target, write_image(data, target, replace=False))
+
+
+def _existing_folder_image(directory: str) -> Optional[str]:
+    for extension in dict.fromkeys(EXTENSIONS.values()):
+        path = os.path.join(directory, FOLDER_NAME + extension)
+        if os.path.exists(path):
+            return path
+
+    return None
+
+
+def folder_cover(directory: str, files: Sequence[str], overwrite: bool = False) -> Optional[ExtractedCover]:
+    """
+        Writes the album art most of the files have as the folder image of their directory.
+        Files which can't be read are left out, only a directory that can't be written fails.
+
+    :param directory: the directory
+    :type directory: str
+    :param files: the MP3 files of the directory
+    :type files: Sequence[str]
+    :param overwrite: replace an existing folder image (of any format) which differs
+    :type overwrite: bool
+    :return: the folder image, None when none of the files has album art
+    :rtype: ExtractedCover
+    """
+    counts, images, sources = Counter(), {}, {}
+    for path in files:
+        try:
+            data = id3_scanner.scan_cover(path)
+        except OSError:
+            continue
+        if data is not None:
+            digest = artwork.content_hash(data)
+            counts[digest] += 1
+            images.setdefault(digest, data)
+            sources.setdefault(digest, path)
+
+    if not counts:
+        return None
+
+    digest = counts.most_common(1)[0][0]
+    data = images[digest]
+    target = os.path.join(directory, FOLDER_NAME + image_extension(data))
+
+    existing = _existing_folder_image(directory)
+    if existing is not None:
+        with open(existing, 'rb') as image:
+            if artwork.content_hash(image.read()) == digest or not overwrite:
+                return ExtractedCover(digest, existing, False)
+
+    # the folder image gets the permissions of the track it was extracted from
+    write_image(data, target, stat.S_IMODE(os.stat(sources[digest]).st_mode) & 0o666)
+    if existing is not None and existing != target:
+        os.unlink(existing)  # e.g. a folder.png replaced by a folder.jpg
+
+    return ExtractedCover(digest, target, True)
+
+
+def _directory_jobs(paths: Iterable[str], recursive: bool,
+                    overwrite: bool) -> Iterator[Tuple[str, Callable[[str], object]]]:
+    # the walk yields the files of a directory one after the other
+    for directory, files in itertools.groupby(tag_engine.iter_mp3_files(paths, recursive), key=os.path.dirname):
+        yield directory or '.', partial(folder_cover, files=tuple(files), overwrite=overwrite)
+
+
+def extract_covers(paths: Iterable[str], mode: str = MODE_FOLDER,
+                   cache_directory: str = DEFAULT_COVER_DIRECTORY, workers: Optional[int] = None,
+                   recursive: bool = True, overwrite: bool = False,
+                   on_result: Optional[Callable[[tag_engine.JobResult], None]] = None) -> ExtractSummary:
+    """
+        Extracts the album art of every MP3 file below `paths`
+
+    :param paths: files or directories
+    :type paths: Iterable[str]
+    :param mode: MODE_FOLDER or MODE_CACHE
+    :type mode: str
+    :param cache_directory: root of the content-addressed cache, for MODE_CACHE
+    :type cache_directory: str
+    :param workers: number of worker processes, all cores when None, in-process when 1
+    :type workers: int
+    :param recursive: walk directory trees instead of only the top directory
+    :type recursive: bool
+    :param overwrite: replace existing folder images which differ, for MODE_FOLDER
+    :type overwrite: bool
+    :param on_result: called with the result of every directory (MODE_FOLDER) or file (MODE_CACHE),
+                      its value is the ExtractedCover or None
+    :type on_result: Callable[[tag_engine.JobResult], None]
+    :return: counts of the written, already present and missing images, and the failures
+    :rtype: ExtractSummary
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode: {mode}, expected one of {', '.join(MODES)}")
+
+    if mode == MODE_FOLDER:
+        jobs = _directory_jobs(paths, recursive, overwrite)
+    else:
+        job = partial(cache_cover, cache_directory=os.path.abspath(cache_directory))
+        jobs = ((path, job) for path in tag_engine.iter_mp3_files(paths, recursive))
+
+    written, existing, without_art, failed = 0, 0, 0, {}
+    for result in tag_engine.process_jobs(jobs, workers):
+        if not result.ok:
+            failed[result.path] = result.error
+        elif result.value is None:
+            without_art += 1
+        elif result.value.written:
+            written += 1
+        else:
+            existing += 1
+
+        if on_result is not None:
+            on_result(result)
+
+    return ExtractSummary(written, existing, without_art, failed)
@@ -0,0 +1,186 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Finds duplicate tracks by their audio: copies of a song which only differ in their tags or
+    album art hash the same.
+
+    Only the MPEG audio is hashed, the ID3v2 tag at the start and the APEv2/ID3v1 tags at the end
+    are skipped. As identical audio has the same length, files are first grouped by the length of
+    their audio (found from the tag headers, without reading the audio) and only files sharing a
+    length with another file are hashed, with mmap on a process pool. Hashes are cached in the
+    library index, keyed by path, size and mtime, so only new or changed files are hashed again.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+from collections import defaultdict
+from functools import partial
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from mutagen.mp3 import MP3
+
+import id3_scanner
+import tag_engine
+from library_index import LibraryIndex, stat_tree
+
+# bytes hashed at once, the kernel reads ahead of it
+HASH_CHUNK = 4 * 1024 * 1024
+
+ID3V1_SIZE = 128
+APE_FOOTER = struct.Struct('<8sIIII8x')  # preamble, version, tag size, item count, flags
+
+
+class AudioHash(NamedTuple):
+    """
+        Identity of the audio of a file
+    """
+    audio_size: int
+    duration: float
+    digest: str
+
+
+class DuplicateGroup(NamedTuple):
+    """
+        Files with the same audio
+    """
+    digest: str
+    audio_size: int
+    duration: float
+    paths: List[str]
+
+
+def audio_span(path: str) -> Tuple[int, int]:
+    """
+        Offsets of the audio in the file: after the ID3v2 tag, before the APEv2 and ID3v1 tags
+
+    :param path: path of the MP3 file
+    :type path: str
+    :return: (start, end) of the audio
+    :rtype: tuple
+    """
+    with open(path, 'rb') as file:
+        header = id3_scanner.read_header(file)
+        start = header.end if header is not None else 0
+
+        end = file.seek(0, os.SEEK_END)
+        file.seek(max(end - ID3V1_SIZE - APE_FOOTER.size, 0))
+        trailer = file.read()
+
+    if end - start >= ID3V1_SIZE and trailer[-ID3V1_SIZE:][:3] == b'TAG':
+        end -= ID3V1_SIZE
+        trailer = trailer[:-ID3V1_SIZE]
+
+    if len(trailer) >= APE_FOOTER.size:
+        preamble, _version, size, _items, flags = APE_FOOTER.unpack(trailer[-APE_FOOTER.size:])
+        if preamble == b'APETAGEX':
+            # the size covers the items and the footer, the header is there when bit 31 is set
+            end -= size + (APE_FOOTER.size if flags & 0x80000000 else 0)
+
+    return start, max(end, start)
+
+
+def hash_audio(path: str, span: Optional[Tuple[int, int]] = None) -> AudioHash:
+    """
+        Hashes the audio of the file (blake2b over a read-only mmap) and reads its duration
+
+    :param path: path of the MP3 file
+    :type path: str
+    :param span: (start, end) of the audio, found from the tags when not given
+    :type span: tuple
+    :return: length, duration and hash of the audio
+    :rtype: AudioHash
+    """
+    start, end = span or audio_span(path)
+    digest = hashlib.blake2b(digest_size=20)
+
+    if end > start:
+        with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, 'madvise'):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+
+            view = memoryview(mapped)
+            try:
+                for offset in range(start, end, HASH_CHUNK):
+                    digest.update(view[offset:min(offset + HASH_CHUNK, end)])
+            finally:
+                view.release()
+
+    try:
+        duration = round(MP3(path).info.length, 3)
+    except Exception:  # pylint: disable=broad-except
+        duration = 0.0  # not decodable as MPEG audio, still compared by its bytes
+
+    return AudioHash(end - start, duration, digest.hexdigest())
+
+
+def find_duplicates(paths: Iterable[str], library: Optional[LibraryIndex] = None, workers: Optional[int] = None,
+                    progress: Optional[Callable[[int, int], None]] = None) -> List[DuplicateGroup]:
+    """
+        Groups the MP3 files below `paths` with the same audio
+
+    :param paths: directories (or files)
+    :type paths: Iterable[str]
+    :param library: library index caching the hashes
+    :type library: LibraryIndex
+    :param workers: number of worker processes, all cores when None
+    :type workers: int
+    :param progress: called with (files hashed, files to hash)
+    :type progress: Callable[[int, int], None]
+    :return: groups of two or more files, largest audio first
+    :rtype: list
+    """
+    paths = list(paths)
+    cached = library.audio_hashes(paths) if library is not None else {}
+
+    known: Dict[str, AudioHash] = {}
+    spans: Dict[str, Tuple[int, int]] = {}
+    stats: Dict[str, Tuple[int, int]] = {}
+    by_size: Dict[int, List[str]] = defaultdict(list)
+
+    for path, size, mtime_ns in stat_tree(paths):
+        stats[path] = (size, mtime_ns)
+        row = cached.get(path)
+        if row is not None and row[:2] == (size, mtime_ns):
+            known[path] = AudioHash(*row[2:])
+            audio_size = known[path].audio_size
+        else:
+            try:
+                spans[path] = audio_span(path)
+            except OSError:
+                continue
+            audio_size = spans[path][1] - spans[path][0]
+
+        by_size[audio_size].append(path)
+
+    # a file whose audio length is unique can't have a duplicate, it isn't read at all
+    candidates = [path for group in by_size.values() if len(group) > 1 for path in group if path not in known]
+
+    hashed = []
+    jobs = ((path, partial(hash_audio, span=spans[path])) for path in candidates)
+    for done, result in enumerate(tag_engine.process_jobs(jobs, workers), start=1):
+        if result.ok:
+            known[result.path] = result.value
+            hashed.append((result.path, *stats[result.path], *result.value))
+
+        if progress is not None:
+            progress(done, len(candidates))
+
+    if library is not None and hashed:
+        library.store_audio_hashes(hashed)
+
+    groups: Dict[str, List[str]] = defaultdict(list)
+    for group in by_size.values():
+        if len(group) > 1:
+            for path in group:
+                if path in known:
+                    groups[known[path].digest].append(path)
+
+    duplicates = [DuplicateGroup(digest, known[members[0]].audio_size, known[members[0]].duration, sorted(members))
+                  for digest, members in groups.items() if len(members) > 1]
+
+    return sorted(duplicates, key=lambda group: (-group.audio_size, group.paths))
+
@@ -6,14 +6,15 @@
 
 """
 import os
-from collections import OrderedDict
-from typing import AnyStr, Iterator
 
 from kivy.properties import ObjectProperty
 from kivy.uix.button import Button
 from kivy.uix.label import Label
 from kivy.uix.spinner import SpinnerOption, Spinner
 
+# re-exported so GUI modules keep importing Constants from here
+from constants import Constants  # noqa: F401 pylint: disable=unused-import
+
 
 class CustomSpinnerOption(SpinnerOption):
     """
@@ -31,57 +32,6 @@ class CustomSpinner(Spinner, Button):
     option_cls = ObjectProperty(CustomSpinnerOption)
 
 
-# noinspection SpellCheckingInspection
-class Constants(OrderedDict):
-    """
-        This class is for providing constants
-    """
-
-    def __init__(self, **kwargs) -> None:
-        super().__init__(**kwargs)
-
-        self.app_icon = 'app_icon.ico'
-
-        self.title = 'Title'
-        self.artist = 'Artist'
-        self.album = 'Album'
-        self.albumartist = 'Album Artists'
-        self.date = 'Year'
-        self.genre = 'Genre'
-        self.tracknumber = 'Track Number'
-        self.lyrics = 'Lyrics'
-
-        self.name = "PyMTag"
-        self.window_title = f"{self.name} - MP3 Tag Editor"
-
-        self.default_tag_cover = os.path.join('../res', 'default_music.jpg')
-
-        self.rocket_image = os.path.join('../res', 'rocket.png')
-        self.switch_icon = os.path.join("../res", "switch_icon.png")
-
-        # File renaming options
-        self.rename = {"no-rename": "Don't Rename", "title-album": "{Title} - {Album}",
-                       "album-title": "{Album} - {Title}", "artist-title": "{Artist} - {Title}",
-                       "album-artist-title": "{Album} - {Artist} - {Title}",
-                       "artist-album-title": "{Artist} - {Album} - {Title}",
-                       "album-albumartist-title": "{Album} - {AlbumArtist} - {Title}",
-                       "albumartist-album-title": "{AlbumArtist} - {Album} - {Title}"
-                       }
-
-    def __getitem__(self, item) -> AnyStr:
-        return self.__dict__[item]
-
-    # noinspection SpellCheckingInspection
-    def __iter__(self) -> Iterator[str]:
-        """
-        Creating iterator to use in UI creation
-
-        :yield: [description]
-        :rtype: Iterator[str]
-        """
-        yield from ['title', 'artist', 'album', 'albumartist', 'date', 'genre', 'tracknumber', 'lyrics']
-
-
 class PymLabel(Label):
     """
         File Info Label
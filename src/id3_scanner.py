@@ -0,0 +1,349 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Fast header-only ID3v2 scanner for bulk reads.
+
+    Unlike mutagen's MP3/EasyID3 it never looks at the MPEG stream and never decodes frames it
+    wasn't asked for: the tag is read in bounded chunks, unwanted frames (the album art in
+    particular) are skipped with a seek, and scanning stops as soon as every requested frame was
+    found. Meant for library scans, album matching and cover extraction; editing still goes
+    through TagSession.
+"""
+
+import struct
+import zlib
+from typing import BinaryIO, Dict, Iterable, Iterator, NamedTuple, Optional, Set, Tuple
+
+from mutagen.id3 import TCON
+
+# frames behind the editor keys, see tag_engine.EASY_FRAMES
+SCAN_FRAMES = ('TIT2', 'TPE1', 'TALB', 'TPE2', 'TDRC', 'TCON', 'TRCK')
+
+KEY_FRAMES = {'title': 'TIT2', 'artist': 'TPE1', 'album': 'TALB', 'albumartist': 'TPE2',
+              'date': 'TDRC', 'genre': 'TCON', 'tracknumber': 'TRCK', 'lyrics': 'USLT'}
+
+# ID3v2.2 frame ids and ID3v2.3 frames which were renamed in ID3v2.4
+V22_FRAMES = {'TT2': 'TIT2', 'TP1': 'TPE1', 'TAL': 'TALB', 'TP2': 'TPE2', 'TYE': 'TDRC', 'TCO': 'TCON',
+              'TRK': 'TRCK', 'ULT': 'USLT', 'PIC': 'APIC'}
+V23_FRAMES = {'TYER': 'TDRC'}
+
+# size of the chunks the tag is read in, enough for the text frames of nearly every file
+SCAN_CHUNK = 16 * 1024
+
+ENCODINGS = {0: ('latin-1', b'\x00'), 1: ('utf-16', b'\x00\x00'), 2: ('utf-16-be', b'\x00\x00'),
+             3: ('utf-8', b'\x00')}
+
+
+class ID3Header(NamedTuple):
+    """
+        The ten byte ID3v2 header
+    """
+    major: int
+    flags: int
+    size: int  # size of the tag after the header, excluding the footer
+
+    @property
+    def unsynchronised(self) -> bool:
+        """
+            whether the whole tag is unsynchronised
+        """
+        return bool(self.flags & 0x80)
+
+    @property
+    def end(self) -> int:
+        """
+            offset of the first byte after the tag (and its footer)
+        """
+        return 10 + self.size + (10 if self.flags & 0x10 else 0)
+
+
+def _syncsafe(data: bytes) -> int:
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _resync(data: bytes) -> bytes:
+    return data.replace(b'\xff\x00', b'\xff')
+
+
+def read_header(file: BinaryIO) -> Optional[ID3Header]:
+    """
+        Reads the ID3v2 header at the current position of the file
+
+    :param file: file opened in binary mode
+    :type file: BinaryIO
+    :return: the header, None if there is no (supported) ID3v2 tag
+    :rtype: ID3Header
+    """
+    data = file.read(10)
+    if len(data) < 10 or data[:3] != b'ID3' or data[3] not in (2, 3, 4) or any(byte & 0x80 for byte in data[6:]):
+        return None
+
+    return ID3Header(data[3], data[5], _syncsafe(data[6:10]))
+
+
+def decode_text(data: bytes) -> str:
+    """
+        Decodes the first value of a text frame
+
+    :param data: frame payload, starting with the encoding byte
+    :type data: bytes
+    :return: the text
+    :rtype: str
+    """
+    if not data:
+        return ''
+
+    encoding, terminator = ENCODINGS.get(data[0], ENCODINGS[0])
+    return _split_terminated(data[1:], terminator)[0].decode(encoding, 'replace').rstrip('\x00')
+
+
+def _split_terminated(data: bytes, terminator: bytes):
+    """
+        Splits at the first terminator, which for two byte encodings has to be at an even offset
+    """
+    index = data.find(terminator)
+    while len(terminator) == 2 and index != -1 and index % 2:
+        index = data.find(terminator, index + 1)
+
+    if index == -1:
+        return data, b''
+
+    return data[:index], data[index + len(terminator):]
+
+
+def decode_lyrics(data: bytes) -> str:
+    """
+        Decodes the text of an USLT frame
+
+    :param data: frame payload, starting with the encoding byte
+    :type data: bytes
+    :return: the lyrics
+    :rtype: str
+    """
+    if len(data) < 4:
+        return ''
+
+    encoding, terminator = ENCODINGS.get(data[0], ENCODINGS[0])
+    _description, text = _split_terminated(data[4:], terminator)
+    return text.decode(encoding, 'replace').rstrip('\x00')
+
+
+def _frame_value(frame_id: str, data: bytes) -> str:
+    if frame_id == 'USLT':
+        return decode_lyrics(data)
+
+    text = decode_text(data)
+    if frame_id == 'TCON' and text:
+        # ID3v1 style numeric genres, e.g. "(17)" -> "Rock"
+        genres = TCON(encoding=3, text=[text]).genres
+        return genres[0] if genres else text
+
+    return text
+
+
+def scan_file(file: BinaryIO, frames: Iterable[str] = SCAN_FRAMES) -> Dict[str, str]:
+    """
+        Decodes the requested frames of the ID3v2 tag at the start of the file.
+
+    :param file: file opened in binary mode, positioned at the start
+    :type file: BinaryIO
+    :param frames: ID3v2.4 ids of the wanted frames (text frames and USLT)
+    :type frames: Iterable[str]
+    :return: frame id -> first value, for the frames present in the tag
+    :rtype: dict
+    """
+    header = read_header(file)
+    if header is None:
+        return {}
+
+    wanted = set(frames)
+    found = {}
+    for frame_id, data in iter_frames(file, header, wanted):
+        found[frame_id] = _frame_value(frame_id, data)
+        # the frames found aren't looked for anymore, the scan stops once the set is empty
+        wanted.discard(frame_id)
+
+    return found
+
+
+def iter_frames(file: BinaryIO, header: ID3Header, wanted: Set[str]) -> Iterator[Tuple[str, bytes]]:
+    """
+        Yields the payload of every frame of the tag whose id is in `wanted`, in tag order; the
+        caller may remove ids from `wanted` while iterating, the scan stops once it is empty
+
+    :param file: file opened in binary mode, positioned right after the header
+    :type file: BinaryIO
+    :param header: the header of the tag, see :func:`read_header`
+    :type header: ID3Header
+    :param wanted: ID3v2.4 ids of the wanted frames
+    :type wanted: Set[str]
+    :yield: (frame id, payload with the frame flags undone)
+    :rtype: Iterator[Tuple[str, bytes]]
+    """
+    frame_header_size, id_size = (6, 3) if header.major == 2 else (10, 4)
+
+    tag_end = 10 + header.size
+    if header.unsynchronised and header.major < 4:
+        # ID3v2.3 unsynchronisation applies to the whole tag, frame sizes count resynced bytes
+        buffer, buffer_start = _resync(file.read(header.size)), 10
+        tag_end = 10 + len(buffer)
+    else:
+        buffer, buffer_start = file.read(min(header.size, SCAN_CHUNK)), 10
+
+    position = 10
+    if header.flags & 0x40 and header.major > 2:
+        extended = buffer[:4]
+        position += _syncsafe(extended) if header.major == 4 else 4 + struct.unpack('>I', extended)[0]
+
+    def _read(offset: int, size: int) -> bytes:
+        nonlocal buffer, buffer_start
+        if offset < buffer_start or offset + size > buffer_start + len(buffer):
+            file.seek(offset)
+            buffer, buffer_start = file.read(max(size, min(tag_end - offset, SCAN_CHUNK))), offset
+
+        return buffer[offset - buffer_start:offset - buffer_start + size]
+
+    while wanted and position + frame_header_size <= tag_end:
+        frame_header = _read(position, frame_header_size)
+        if len(frame_header) < frame_header_size or frame_header[0] == 0:
+            # reached the padding
+            break
+
+        try:
+            frame_id = frame_header[:id_size].decode('ascii')
+        except UnicodeDecodeError:
+            break
+
+        flags = 0
+        if header.major == 2:
+            size = int.from_bytes(frame_header[3:6], 'big')
+            frame_id = V22_FRAMES.get(frame_id, frame_id)
+        elif header.major == 3:
+            size, flags = struct.unpack('>IH', frame_header[4:])
+            frame_id = V23_FRAMES.get(frame_id, frame_id)
+        else:
+            size, flags = _syncsafe(frame_header[4:8]), struct.unpack('>H', frame_header[8:])[0]
+
+        data_start = position + frame_header_size
+        position = data_start + size
+
+        if frame_id not in wanted or size == 0 or position > tag_end:
+            continue
+
+        data = _read(data_start, size)
+        try:
+            data = _frame_data(header.major, flags, data)
+        except (ValueError, zlib.error):
+            continue
+
+        if data is not None:
+            yield frame_id, data
+
+
+def _frame_data(major: int, flags: int, data: bytes) -> Optional[bytes]:
+    """
+        Undoes the per frame flags; None for frames which can't be read (encrypted)
+    """
+    if major == 3:
+        compressed, encrypted, grouped = flags & 0x0080, flags & 0x0040, flags & 0x0020
+        if encrypted:
+            return None
+        data = data[1:] if grouped else data
+        return zlib.decompress(data[4:]) if compressed else data
+
+    if major == 4:
+        if flags & 0x0004:
+            return None
+        data = data[1:] if flags & 0x0040 else data
+        data = data[4:] if flags & 0x0001 else data
+        data = _resync(data) if flags & 0x0002 else data
+        return zlib.decompress(data) if flags & 0x0008 else data
+
+    return data
+
+
+def scan(path: str, frames: Iterable[str] = SCAN_FRAMES) -> Dict[str, str]:
+    """
+        Decodes the requested frames of the file's ID3v2 tag
+
+    :param path: path of the MP3 file
+    :type path: str
+    :param frames: ID3v2.4 ids of the wanted frames (text frames and USLT)
+    :type frames: Iterable[str]
+    :return: frame id -> first value, for the frames present in the tag
+    :rtype: dict
+    """
+    with open(path, 'rb', buffering=0) as file:
+        return scan_file(file, frames)
+
+
+def decode_picture(major: int, data: bytes) -> Tuple[int, bytes]:
+    """
+        Decodes an APIC frame (PIC in ID3v2.2)
+
+    :param major: major version of the tag: 2, 3 or 4 for ID3v2.2, v2.3, v2.4
+    :type major: int
+    :param data: frame payload, starting with the encoding byte
+    :type data: bytes
+    :return: (picture type, 3 for the front cover; image data)
+    :rtype: Tuple[int, bytes]
+    """
+    _encoding, terminator = ENCODINGS.get(data[0], ENCODINGS[0])
+    if major == 2:
+        # three letters image format instead of the mime type
+        picture_type, rest = data[4], data[5:]
+    else:
+        _mime, rest = _split_terminated(data[1:], b'\x00')
+        picture_type, rest = rest[0], rest[1:]
+
+    _description, image = _split_terminated(rest, terminator)
+    return picture_type, image
+
+
+def scan_cover(path: str) -> Optional[bytes]:
+    """
+        Reads the album art of the file from its tag only, the front cover when there are
+        several pictures
+
+    :param path: path of the MP3 file
+    :type path: str
+    :return: the image data, None when the file has no album art
+    :rtype: bytes
+    """
+    with open(path, 'rb', buffering=0) as file:
+        header = read_header(file)
+        if header is None:
+            return None
+
+        wanted, first = {'APIC'}, None
+        for _frame_id, data in iter_frames(file, header, wanted):
+            try:
+                picture_type, image = decode_picture(header.major, data)
+            except IndexError:
+                continue  # truncated frame
+            if not image:
+                continue
+            if picture_type == 3:
+                return image
+            first = first if first is not None else image
+
+        return first
+
+
+def scan_tags(path: str, keys: Iterable[str] = tuple(KEY_FRAMES)) -> Dict[str, str]:
+    """
+        Reads the editor tags of the file, like tag_engine.read_tags but without parsing the
+        whole tag
+
+    :param path: path of the MP3 file
+    :type path: str
+    :param keys: keys of `Constants` to read
+    :type keys: Iterable[str]
+    :return: mapping of every key to its value ('' when missing)
+    :rtype: dict
+    """
+    keys = tuple(keys)
+    found = scan(path, (KEY_FRAMES[key] for key in keys))
+    return {key: found.get(KEY_FRAMES[key], '') for key in keys}
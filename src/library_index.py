@@ -0,0 +1,388 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Persistent library index.
+
+    Keeps the path, size, modification time and the editor tags (the keys of `Constants`) of every
+    scanned MP3 file in an SQLite database. Refreshing only stats the files and re-reads the ones
+    whose size or mtime changed (with the header-only id3_scanner), so album matching, renaming
+    previews and searches are answered from the index instead of re-reading every file.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import id3_scanner
+import tag_engine
+from track_record import KEYS as RECORD_KEYS, TrackRecord
+
+DEFAULT_DATABASE = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+                                'pymtag', 'library.sqlite3')
+
+COLUMNS = ('path', 'size', 'mtime_ns') + tag_engine.TAG_KEYS
+
+
+class RefreshSummary(NamedTuple):
+    """
+        Outcome of :meth:`LibraryIndex.refresh`
+    """
+    added: int
+    updated: int
+    removed: int
+    unchanged: int
+    failed: Dict[str, str]
+
+
+def stat_tree(roots: Iterable[str]) -> Iterator[Tuple[str, int, int]]:
+    """
+        Yields (path, size, mtime_ns) of every MP3 file below the roots, using the stat results
+        os.scandir already has at hand
+    """
+    stack = [os.path.abspath(root) for root in roots]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except NotADirectoryError:
+            stat = os.stat(directory)
+            yield directory, stat.st_size, stat.st_mtime_ns
+            continue
+        except OSError:
+            continue
+
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.name.lower().endswith('.mp3'):
+                stat = entry.stat()
+                yield entry.path, stat.st_size, stat.st_mtime_ns
+
+
+def _under(root: str) -> Tuple[str, str]:
+    """
+        Range of paths below `root`, for a range scan of the primary key
+    """
+    root = os.path.join(os.path.abspath(root), '')
+    return root, root[:-1] + chr(ord(os.sep) + 1)
+
+
+class LibraryIndex:
+    """
+        SQLite backed index of the library
+    """
+
+    def __init__(self, database: str = DEFAULT_DATABASE) -> None:
+        """
+
+        :param database: path of the database file, ':memory:' for a throwaway index
+        :type database: str
+        """
+        if database != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+
+        self.database = database
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(database, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+
+        with self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS tracks (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+                f"{', '.join(f'{key} TEXT' for key in tag_engine.TAG_KEYS)})")
+            self._connection.execute('CREATE INDEX IF NOT EXISTS tracks_album '
+                                     'ON tracks (album, albumartist)')
+            # hashes of the audio frames, valid as long as size and mtime_ns match the file
+            self._connection.execute('CREATE TABLE IF NOT EXISTS audio_hashes (path TEXT PRIMARY KEY, size INTEGER, '
+                                     'mtime_ns INTEGER, audio_size INTEGER, duration REAL, digest TEXT)')
+
+    def __repr__(self) -> str:
+        return f"LibraryIndex({self.database!r})"
+
+    def __enter__(self) -> 'LibraryIndex':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM tracks').fetchone()[0]
+
+    def close(self) -> None:
+        """
+            Closes the database
+        """
+        with self._lock:
+            self._connection.close()
+
+    def _query(self, sql: str, parameters: Iterable = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._connection.execute(sql, tuple(parameters)).fetchall()
+
+    def _upsert(self, rows: List[tuple]) -> None:
+        with self._lock, self._connection:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO tracks ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                rows)
+
+    def refresh(self, roots: Iterable[str], workers: Optional[int] = None,
+                progress: Optional[Callable[[int, int], None]] = None) -> RefreshSummary:
+        """
+            Brings the index of the given directories up to date.
+            Only new files and files whose size or mtime changed are parsed (on a process pool);
+            files which disappeared, or changed and no longer parse, are dropped from the index.
+
+        :param roots: directories (or files) to scan
+        :type roots: Iterable[str]
+        :param workers: number of worker processes used for parsing
+        :type workers: int
+        :param progress: called with (files parsed, files to parse)
+        :type progress: Callable[[int, int], None]
+        :return: what changed in the index
+        :rtype: RefreshSummary
+        """
+        roots = [os.path.abspath(root) for root in roots]
+
+        known = {}
+        for root in roots:
+            if os.path.isdir(root):
+                rows = self._query('SELECT path, size, mtime_ns FROM tracks WHERE path >= ? AND path < ?', _under(root))
+            else:
+                rows = self._query('SELECT path, size, mtime_ns FROM tracks WHERE path = ?', (root,))
+            known.update((row['path'], (row['size'], row['mtime_ns'])) for row in rows)
+
+        stats, existing, unchanged = {}, set(), 0
+        for path, size, mtime_ns in stat_tree(roots):
+            previous = known.pop(path, None)
+            if previous == (size, mtime_ns):
+                unchanged += 1
+                continue
+
+            stats[path] = (size, mtime_ns)
+            if previous is not None:
+                existing.add(path)
+
+        rows, failed, added = [], {}, 0
+
+        results = tag_engine.process_tree(stats, id3_scanner.scan_tags, workers=workers)
+        for done, result in enumerate(results, start=1):
+            if result.ok:
+                rows.append((result.path, *stats[result.path], *(result.value[key] for key in tag_engine.TAG_KEYS)))
+                added += result.path not in existing
+            else:
+                failed[result.path] = result.error
+
+            if len(rows) >= 1000:
+                self._upsert(rows)
+                rows.clear()
+
+            if progress is not None:
+                progress(done, len(stats))
+
+        self._upsert(rows)
+        self.remove(known)
+        # a stale row would keep the old size and mtime, and the file would never be parsed again
+        self.remove(path for path in failed if path in existing)
+
+        return RefreshSummary(added, len(stats) - len(failed) - added, len(known), unchanged, failed)
+
+    def update(self, path: str, tags: Optional[Dict[str, str]] = None) -> None:
+        """
+            Updates a single file, e.g. right after it was saved
+
+        :param path: path of the MP3 file
+        :type path: str
+        :param tags: tags of the file, read from the file when not given
+        :type tags: dict
+        """
+        path = os.path.abspath(path)
+        tags = tags if tags is not None else tag_engine.read_tags(path)
+        stat = os.stat(path)
+        self._upsert([(path, stat.st_size, stat.st_mtime_ns, *(tags[key] for key in tag_engine.TAG_KEYS))])
+
+    def remove(self, paths: Iterable[str]) -> None:
+        """
+            Drops files from the index
+
+        :param paths: paths of the removed files
+        :type paths: Iterable[str]
+        """
+        paths = [(os.path.abspath(path),) for path in paths]
+        with self._lock, self._connection:
+            self._connection.executemany('DELETE FROM tracks WHERE path = ?', paths)
+            self._connection.executemany('DELETE FROM audio_hashes WHERE path = ?', paths)
+
+    def rename(self, old_path: str, new_path: str) -> None:
+        """
+            Moves a file's entry to its new path
+
+        :param old_path: path before renaming
+        :type old_path: str
+        :param new_path: path after renaming
+        :type new_path: str
+        """
+        self.rename_many([(old_path, new_path)])
+
+    def rename_many(self, moves: Iterable[Tuple[str, str]]) -> None:
+        """
+            Moves the entries of many renamed files to their new paths, in a single transaction
+
+        :param moves: (path before renaming, path after renaming) of every file, in the order
+                      they were renamed
+        :type moves: Iterable[Tuple[str, str]]
+        """
+        moves = [(os.path.abspath(new_path), os.path.abspath(old_path)) for old_path, new_path in moves]
+        with self._lock, self._connection:
+            self._connection.executemany('UPDATE OR REPLACE tracks SET path = ? WHERE path = ?', moves)
+            self._connection.executemany('UPDATE OR REPLACE audio_hashes SET path = ? WHERE path = ?', moves)
+
+    def get(self, path: str) -> Optional[Dict[str, str]]:
+        """
+            Indexed tags of a file
+
+        :param path: path of the MP3 file
+        :type path: str
+        :return: the row of the file (path, size, mtime_ns and the tags), None if not indexed
+        :rtype: dict
+        """
+        rows = self._query('SELECT * FROM tracks WHERE path = ?', (os.path.abspath(path),))
+        return dict(rows[0]) if rows else None
+
+    def tracks(self, root: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+            Every indexed file, optionally only the ones below `root`
+
+        :param root: directory to restrict the result to
+        :type root: str
+        :return: rows ordered by path
+        :rtype: list
+        """
+        if root is None:
+            return [dict(row) for row in self._query('SELECT * FROM tracks ORDER BY path')]
+
+        return [dict(row) for row in self._query('SELECT * FROM tracks WHERE path >= ? AND path < ? ORDER BY path',
+                                                 _under(root))]
+
+    def record(self, path: str) -> Optional[TrackRecord]:
+        """
+            Like :meth:`get`, as a compact record
+
+        :param path: path of the MP3 file
+        :type path: str
+        :return: the record of the file, None if not indexed
+        :rtype: TrackRecord
+        """
+        rows = self._query(f"SELECT {', '.join(RECORD_KEYS)} FROM tracks WHERE path = ?", (os.path.abspath(path),))
+        return TrackRecord.from_row(rows[0]) if rows else None
+
+    def records(self, root: Optional[str] = None) -> List[TrackRecord]:
+        """
+            Like :meth:`tracks`, as compact records (no lyrics, size or mtime), for holding the
+            whole library in memory; rows are turned into records as they are read, so the full
+            rows are never all in memory at once
+
+        :param root: directory to restrict the result to
+        :type root: str
+        :return: records ordered by path
+        :rtype: list
+        """
+        sql = f"SELECT {', '.join(RECORD_KEYS)} FROM tracks"
+        parameters = ()
+        if root is not None:
+            sql, parameters = sql + ' WHERE path >= ? AND path < ?', _under(root)
+
+        with self._lock:
+            cursor = self._connection.execute(sql + ' ORDER BY path', parameters)
+            return [TrackRecord.from_row(row) for row in cursor]
+
+    def tracks_of_album(self, album: str, album_artist: str) -> List[str]:
+        """
+            Paths of every indexed file of the album, across all directories
+
+        :param album: album name
+        :type album: str
+        :param album_artist: album artist name
+        :type album_artist: str
+        :return: paths ordered by path
+        :rtype: list
+        """
+        return [row['path'] for row in self._query('SELECT path FROM tracks WHERE album = ? AND albumartist = ? '
+                                                   'ORDER BY path', (album, album_artist))]
+
+    def search(self, text: str, limit: int = 100) -> List[Dict[str, str]]:
+        """
+            Files whose title, artist, album, album artist or genre contains `text` (ignoring case)
+
+        :param text: text to search for
+        :type text: str
+        :param limit: maximum number of rows returned
+        :type limit: int
+        :return: matching rows
+        :rtype: list
+        """
+        pattern = '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        fields = ('title', 'artist', 'album', 'albumartist', 'genre')
+        where = ' OR '.join(f"{field} LIKE ? ESCAPE '\\'" for field in fields)
+        return [dict(row) for row in self._query(f'SELECT * FROM tracks WHERE {where} ORDER BY path LIMIT ?',
+                                                 (*[pattern] * len(fields), limit))]
+
+    def audio_hashes(self, roots: Iterable[str]) -> Dict[str, Tuple[int, int, int, float, str]]:
+        """
+            Cached audio hashes of the files below the roots, see duplicates.py
+
+        :param roots: directories (or files)
+        :type roots: Iterable[str]
+        :return: path -> (size, mtime_ns, audio_size, duration, digest)
+        :rtype: dict
+        """
+        hashes = {}
+        for root in roots:
+            root = os.path.abspath(root)
+            if os.path.isdir(root):
+                rows = self._query('SELECT * FROM audio_hashes WHERE path >= ? AND path < ?', _under(root))
+            else:
+                rows = self._query('SELECT * FROM audio_hashes WHERE path = ?', (root,))
+            hashes.update((row['path'], tuple(row)[1:]) for row in rows)
+
+        return hashes
+
+    def store_audio_hashes(self, rows: Iterable[Tuple[str, int, int, int, float, str]]) -> None:
+        """
+            Caches audio hashes
+
+        :param rows: (path, size, mtime_ns, audio_size, duration, digest) of every file
+        :type rows: Iterable[tuple]
+        """
+        with self._lock, self._connection:
+            self._connection.executemany('INSERT OR REPLACE INTO audio_hashes VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+    def rename_preview(self, naming_format: str, root: Optional[str] = None) -> List[Tuple[str, str]]:
+        """
+            New names the files would get with the rename option, without touching any file
+
+        :param naming_format: key or template of `Constants.rename`
+        :type naming_format: str
+        :param root: directory to restrict the preview to
+        :type root: str
+        :return: (current path, new path) of every file whose name would change
+        :rtype: list
+        """
+        template = tag_engine.rename_template(naming_format)
+        if template is None:
+            return []
+
+        preview = []
+        for row in self.records(root):
+            if tag_engine.missing_tags(template, row):
+                continue  # not renamed, see rename_engine.plan_renames
+            new_path = tag_engine.renamed_path(row['path'], template, row)
+            if new_path != row['path']:
+                preview.append((row['path'], new_path))
+
+        return preview
+
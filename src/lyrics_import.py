@@ -0,0 +1,278 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Bulk import of lyrics from .lrc/.txt sidecar files into the USLT frame of the tracks.
+
+    Sidecars are found while walking the given directories and paired with a track either by
+    name ('Song.lrc' next to 'Song.mp3') or, for sidecars kept elsewhere, by artist and title
+    (the [ar:]/[ti:] tags of an LRC file, or an 'Artist - Title' file name) looked up in the
+    library index. A track gets one sidecar, its .lrc file rather than its .txt file, the others
+    are skipped. Pairs are then run on a process pool; a track whose lyrics are already the same
+    is only scanned, not rewritten.
+"""
+
+import os
+import re
+from collections import defaultdict
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import id3_scanner
+import tag_engine
+from library_index import LibraryIndex
+
+SIDECAR_EXTENSIONS = ('.lrc', '.txt')
+
+# [mm:ss], [mm:ss.xx] and the <mm:ss.xx> word timings of enhanced LRC
+TIMESTAMP = re.compile(r'\[\d+:\d{1,2}(?:[.:]\d{1,3})?\]|<\d+:\d{1,2}(?:[.:]\d{1,3})?>')
+# the ID tags of LRC: [ar:Artist], [ti:Title], [al:Album], [length:..], [offset:..], ...; other bracketed
+# lines such as [Chorus: Someone] are lyrics
+METADATA_LINE = re.compile(r'^\[(ar|ti|al|au|length|by|offset|re|ve|#):(.*)\]\s*$', re.IGNORECASE)
+
+MATCH_BASENAME = 'basename'
+MATCH_TAGS = 'tags'
+
+
+class ImportSummary(NamedTuple):
+    """
+        Outcome of :func:`import_tree`
+    """
+    written: List[str]
+    identical: int
+    unmatched: int
+    failed: Dict[str, str]  # track path -> error
+    skipped: List[str]  # sidecars of a track which got another sidecar
+
+
+def read_sidecar(path: str) -> str:
+    """
+        Text of a sidecar file, UTF-8 (with or without BOM) or Latin-1 for older rips
+
+    :param path: path of the .lrc/.txt file
+    :type path: str
+    :return: its text, with '\\n' line endings
+    :rtype: str
+    """
+    with open(path, 'rb') as sidecar:
+        data = sidecar.read()
+
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = data.decode('latin-1')
+
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def lrc_metadata(text: str) -> Dict[str, str]:
+    """
+        ID tags of an LRC file, e.g. {'ar': 'Artist', 'ti': 'Title'}
+
+    :param text: content of the LRC file
+    :type text: str
+    :return: tag -> value
+    :rtype: dict
+    """
+    metadata = {}
+    for line in text.split('\n'):
+        match = METADATA_LINE.match(line.strip())
+        if match:
+            metadata[match.group(1).lower()] = match.group(2).strip()
+
+    return metadata
+
+
+def lyrics_text(text: str, keep_timestamps: bool = False, lrc: bool = True) -> str:
+    """
+        Lyrics to store in the USLT frame: for an LRC file, without the timestamps and the ID
+        tags unless the timestamps are kept; a plain text file is stored as it is
+
+    :param text: content of the sidecar
+    :type text: str
+    :param keep_timestamps: store the LRC file as it is
+    :type keep_timestamps: bool
+    :param lrc: whether the sidecar is an LRC file
+    :type lrc: bool
+    :return: the lyrics
+    :rtype: str
+    """
+    if keep_timestamps or not lrc:
+        return text.strip()
+
+    lines = []
+    for line in text.split('\n'):
+        if METADATA_LINE.match(line.strip()):
+            continue
+        lines.append(TIMESTAMP.sub('', line).strip())
+
+    return '\n'.join(lines).strip()
+
+
+def import_lyrics(path: str, sidecar: str, keep_timestamps: bool = False) -> bool:
+    """
+        Writes the lyrics of the sidecar to the track, unless the track already has them
+
+    :param path: path of the MP3 file
+    :type path: str
+    :param sidecar: path of the .lrc/.txt file
+    :type sidecar: str
+    :param keep_timestamps: store the LRC file as it is
+    :type keep_timestamps: bool
+    :return: whether the file was written
+    :rtype: bool
+    """
+    lyrics = lyrics_text(read_sidecar(sidecar), keep_timestamps, sidecar.lower().endswith('.lrc'))
+
+    # the header-only scanner reads the USLT frame without parsing the rest of the tag
+    if id3_scanner.scan_tags(path, ('lyrics',))['lyrics'].strip() == lyrics:
+        return False
+
+    return tag_engine.save_tags(path, {'lyrics': lyrics})
+
+
+def iter_sidecars(paths: Iterable[str], recursive: bool = True) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+        Walks the directories for sidecar files, pairing them with the track of the same name
+
+    :param paths: sidecar files or directories
+    :type paths: Iterable[str]
+    :param recursive: walk directory trees instead of only the top directory
+    :type recursive: bool
+    :yield: (sidecar path, track path or None when there is no track of the same name)
+    :rtype: Iterator[Tuple[str, Optional[str]]]
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            directory = os.path.dirname(path)
+            tracks = _tracks_by_stem(os.listdir(directory or '.'))
+            track = tracks.get(os.path.splitext(os.path.basename(path))[0])
+            yield path, os.path.join(directory, track) if track else None
+            continue
+
+        for directory, sub_directories, file_names in os.walk(path):
+            sub_directories.sort()
+            tracks = _tracks_by_stem(file_names)
+
+            for file_name in sorted(file_names):
+                stem, extension = os.path.splitext(file_name)
+                if extension.lower() in SIDECAR_EXTENSIONS:
+                    track = tracks.get(stem)
+                    yield os.path.join(directory, file_name), os.path.join(directory, track) if track else None
+
+            if not recursive:
+                break
+
+
+def _tracks_by_stem(file_names: Iterable[str]) -> Dict[str, str]:
+    tracks = {}
+    for file_name in file_names:
+        stem, extension = os.path.splitext(file_name)
+        if extension.lower() == '.mp3':
+            tracks[stem] = file_name
+
+    return tracks
+
+
+def _match_key(artist: str, title: str) -> Tuple[str, str]:
+    return artist.strip().casefold(), title.strip().casefold()
+
+
+def sidecar_key(sidecar: str) -> Optional[Tuple[str, str]]:
+    """
+        Artist and title a sidecar is about, from its LRC tags or an 'Artist - Title' file name
+
+    :param sidecar: path of the .lrc/.txt file
+    :type sidecar: str
+    :return: normalized (artist, title), None when unknown
+    :rtype: tuple
+    """
+    if sidecar.lower().endswith('.lrc'):
+        metadata = lrc_metadata(read_sidecar(sidecar))
+        if metadata.get('ar') and metadata.get('ti'):
+            return _match_key(metadata['ar'], metadata['ti'])
+
+    artist, separator, title = os.path.splitext(os.path.basename(sidecar))[0].partition(' - ')
+    return _match_key(artist, title) if separator else None
+
+
+def _sidecar_order(sidecar: str) -> Tuple[bool, str]:
+    # the .lrc file first, then by path
+    return not sidecar.lower().endswith('.lrc'), sidecar
+
+
+def _pairs(paths: Iterable[str], match: Tuple[str, ...], library: Optional[LibraryIndex], recursive: bool,
+           unmatched: Callable[[str], None], skipped: Callable[[str], None]) -> List[Tuple[str, str]]:
+    sidecars: Dict[str, Dict[str, None]] = defaultdict(dict)  # track -> its sidecars, in order
+    tracks = None
+    for sidecar, track in iter_sidecars(paths, recursive):
+        if MATCH_BASENAME not in match:
+            track = None
+
+        if track is None and MATCH_TAGS in match and library is not None:
+            if tracks is None:
+                # built once, on the first sidecar without a track of the same name
+                tracks = {_match_key(row['artist'], row['title']): row['path'] for row in library.records()
+                          if row['artist'] and row['title']}
+            track = tracks.get(sidecar_key(sidecar))
+
+        if track is None:
+            unmatched(sidecar)
+        else:
+            sidecars[os.path.abspath(track)][os.path.abspath(sidecar)] = None
+
+    # 'Song.lrc' and 'Song.txt' (or sidecars matched by tags) would be two jobs writing the same file
+    pairs = []
+    for track, candidates in sidecars.items():
+        chosen, *others = sorted(candidates, key=_sidecar_order)
+        for sidecar in others:
+            skipped(sidecar)
+        pairs.append((track, chosen))
+
+    return pairs
+
+
+def import_tree(paths: Iterable[str], match: Tuple[str, ...] = (MATCH_BASENAME, MATCH_TAGS),
+                library: Optional[LibraryIndex] = None, keep_timestamps: bool = False,
+                workers: Optional[int] = None, recursive: bool = True,
+                on_result: Optional[Callable[[tag_engine.JobResult], None]] = None) -> ImportSummary:
+    """
+        Imports the lyrics of every sidecar below `paths` into its track
+
+    :param paths: sidecar files or directories
+    :type paths: Iterable[str]
+    :param match: how sidecars are paired with tracks, MATCH_BASENAME and/or MATCH_TAGS
+    :type match: tuple
+    :param library: library index used to match by tags
+    :type library: LibraryIndex
+    :param keep_timestamps: store LRC files as they are
+    :type keep_timestamps: bool
+    :param workers: number of worker processes, all cores when None, in-process when 1
+    :type workers: int
+    :param recursive: walk directory trees instead of only the top directory
+    :type recursive: bool
+    :param on_result: called with the result of every track, its value is whether it was written
+    :type on_result: Callable
+    :return: the written files, the number of already identical and unmatched files, the failures and
+             the skipped sidecars
+    :rtype: ImportSummary
+    """
+    written, identical, failed, unmatched, skipped = [], 0, {}, [], []
+
+    pairs = _pairs(paths, tuple(match), library, recursive, unmatched.append, skipped.append)
+    jobs = ((track, partial(import_lyrics, sidecar=sidecar, keep_timestamps=keep_timestamps))
+            for track, sidecar in pairs)
+
+    for result in tag_engine.process_jobs(jobs, workers):
+        if not result.ok:
+            failed[result.path] = result.error
+        elif result.value:
+            written.append(result.path)
+        else:
+            identical += 1
+
+        if on_result is not None:
+            on_result(result)
+
+    return ImportSummary(written, identical, len(unmatched), failed, skipped)
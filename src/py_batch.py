@@ -0,0 +1,511 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Command line entry point for batch tagging, the GUI free counterpart of py_main.py.
+    It only uses the headless tag engine and never imports Kivy.
+
+    Examples:
+        python py_batch.py show ~/Music
+        python py_batch.py edit --set albumartist="Various Artists" ~/Music/Compilation
+        python py_batch.py cover --image cover.jpg ~/Music/Album
+        python py_batch.py rename --format artist-title ~/Music
+        python py_batch.py undo-rename ~/.cache/pymtag/renames/20261018-120000-4242.jsonl
+        python py_batch.py index ~/Music
+        python py_batch.py watch --format artist-title ~/Incoming
+        python py_batch.py lyrics ~/Music ~/Lyrics
+        python py_batch.py repad --headroom 65536 ~/Music
+        python py_batch.py --restart edit --set genre=Jazz ~/Music
+        python py_batch.py duplicates ~/Music
+        python py_batch.py extract-art --mode cache ~/Music
+        python py_batch.py export --output tags.csv ~/Music
+        python py_batch.py import --dry-run tags.csv
+        python py_batch.py search "dark side"
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from functools import partial
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import artwork
+import batch_journal
+import cover_extract
+import duplicates
+import lyrics_import
+import rename_engine
+import tag_engine
+import tag_exchange
+import tag_writer
+import watch_folder
+from library_index import DEFAULT_DATABASE, LibraryIndex
+
+
+def _image_file(path: str) -> str:
+    """
+        argparse type of the image options: the file has to exist and be readable, before any
+        journal is opened
+    """
+    if not os.path.isfile(path):
+        raise argparse.ArgumentTypeError(f"{path}: no such image file")
+    if not os.access(path, os.R_OK):
+        raise argparse.ArgumentTypeError(f"{path}: not readable")
+
+    return path
+
+
+def _parse_assignments(assignments: List[str]) -> dict:
+    tags = {}
+    for assignment in assignments:
+        key, separator, value = assignment.partition('=')
+        if not separator or key not in tag_engine.TAG_KEYS:
+            raise argparse.ArgumentTypeError(f"expected KEY=VALUE with KEY one of "
+                                             f"{', '.join(tag_engine.TAG_KEYS)}, got {assignment!r}")
+        tags[key] = value
+
+    return tags
+
+
+def _show(path: str) -> dict:
+    return tag_engine.read_tags(path)
+
+
+def _edit(path: str, tags: dict) -> bool:
+    return tag_engine.save_tags(path, tags)
+
+
+def _operation(args: argparse.Namespace) -> str:
+    """
+        Journal key of an edit, cover or repad run: the same command with the same values on the
+        same paths resumes the journal of the previous run
+    """
+    if args.command == 'edit':
+        values = sorted(args.assignments)
+    elif args.command == 'repad':
+        values = [args.headroom, args.growth, args.cap]
+    elif args.remove:
+        values = ['remove']
+    else:
+        with open(args.image, 'rb') as image:
+            values = [artwork.content_hash(image.read()), args.normalize and [args.max_size, args.quality]]
+
+    return batch_journal.operation_key(args.command, values, sorted(map(os.path.abspath, args.paths)),
+                                       args.recursive)
+
+
+def _progress_printer(total: int) -> Callable[[int], None]:
+    """
+        Prints 'done/total, time left' on one line of the terminal, at most twice a second
+    """
+    meter, printed = batch_journal.ProgressMeter(), [0.0]
+
+    def _print(done: int) -> None:
+        text = meter.text(done, total)
+        now = time.monotonic()
+        if sys.stderr.isatty() and (now - printed[0] >= 0.5 or done == total):
+            printed[0] = now
+            print(f"\r{text}\033[K", end='\n' if done == total else '', file=sys.stderr, flush=True)
+
+    return _print
+
+
+def _run_journaled(args: argparse.Namespace, job: Callable[[str], object]) -> int:
+    """
+        Runs an edit, cover or repad job on every file, skipping the files an interrupted run of the
+        same command was done with (see batch_journal); the journal is deleted once a run finished
+        without failures. Ctrl+C stops queueing files and lets the ones being written finish, a
+        second Ctrl+C aborts at once.
+    """
+    journal = batch_journal.BatchJournal(_operation(args))
+    if args.restart:
+        journal.discard()
+
+    stop = threading.Event()
+
+    def _interrupt(*_) -> None:
+        stop.set()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    def _jobs(paths: List[str]) -> Iterator[Tuple[str, Callable[[str], object]]]:
+        for path in paths:
+            if stop.is_set():
+                return
+            yield path, job
+
+    with journal:
+        paths = list(tag_engine.iter_mp3_files(args.paths, args.recursive))
+        remaining = [path for path in paths if path not in journal]
+        progress = _progress_printer(len(paths))
+        progress(len(paths) - len(remaining))
+
+        failures = 0
+        previous = signal.signal(signal.SIGINT, _interrupt)
+        try:
+            results = tag_engine.process_jobs(_jobs(remaining), workers=args.workers)
+            for done, result in enumerate(results, start=len(paths) - len(remaining) + 1):
+                if not result.ok:
+                    failures += 1
+                    print(f"{result.path}: {result.error}", file=sys.stderr)
+                else:
+                    journal.record(result.path)
+                    if args.command == 'repad' and result.value:
+                        print(result.path)
+                progress(done)
+        finally:
+            signal.signal(signal.SIGINT, previous)
+
+        if len(remaining) < len(paths):
+            print(f"{len(paths) - len(remaining)} file(s) done by an earlier run skipped", file=sys.stderr)
+        if stop.is_set():
+            print(f"Interrupted after {len(journal)} of {len(paths)} file(s), run the same command again to resume",
+                  file=sys.stderr)
+            return 130
+        if not failures:
+            journal.discard()
+
+    return 1 if failures else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+        Creates the argument parser of the command line tool
+    """
+    parser = argparse.ArgumentParser(prog='py_batch', description='PyMTag - batch MP3 tag editor')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='number of worker processes (default: all cores)')
+    parser.add_argument('--no-recursive', dest='recursive', action='store_false',
+                        help='only process the top level of the given directories')
+    parser.add_argument('--database', default=DEFAULT_DATABASE, help='library index database')
+    parser.add_argument('--restart', action='store_true',
+                        help='edit, cover and repad: start over instead of resuming an interrupted run')
+
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    show = commands.add_parser('show', help='print the tags of every file as JSON lines')
+    show.add_argument('paths', nargs='+')
+
+    edit = commands.add_parser('edit', help='set tags on every file')
+    edit.add_argument('--set', dest='assignments', action='append', required=True, metavar='KEY=VALUE')
+    edit.add_argument('paths', nargs='+')
+
+    cover = commands.add_parser('cover', help='embed (or remove) the album art of every file')
+    group = cover.add_mutually_exclusive_group(required=True)
+    group.add_argument('--image', type=_image_file, help='image file to embed')
+    group.add_argument('--remove', action='store_true', help='remove the album art')
+    cover.add_argument('--normalize', action='store_true',
+                       help='downscale and re-encode the image as JPEG before embedding it')
+    cover.add_argument('--max-size', type=int, default=artwork.DEFAULT_OPTIONS.max_size,
+                       help='maximum width/height when normalizing (default: %(default)s)')
+    cover.add_argument('--quality', type=int, default=artwork.DEFAULT_OPTIONS.quality,
+                       help='JPEG quality when normalizing (default: %(default)s)')
+    cover.add_argument('paths', nargs='+')
+
+    rename = commands.add_parser('rename', help='rename every file from its tags')
+    rename.add_argument('--format', dest='naming_format', required=True,
+                        choices=[key for key in tag_engine.CONSTANTS.rename if key != 'no-rename'])
+    rename.add_argument('--dry-run', action='store_true', help='only print the new names')
+    rename.add_argument('--journal', help=f'undo journal to write (default: a new file in '
+                                          f'{rename_engine.DEFAULT_JOURNAL_DIRECTORY})')
+    rename.add_argument('paths', nargs='+')
+
+    undo_rename = commands.add_parser('undo-rename', help='put the files of a rename back')
+    undo_rename.add_argument('journal', help='undo journal written by rename')
+
+    index = commands.add_parser('index', help='scan directories into the library index')
+    index.add_argument('paths', nargs='+')
+
+    watch = commands.add_parser('watch', help='tag the MP3 files dropped in directories, until interrupted')
+    watch.add_argument('--format', dest='naming_format', default='no-rename',
+                       choices=list(tag_engine.CONSTANTS.rename))
+    watch.add_argument('--cover', type=_image_file, help='image to embed (default: the cover/folder image next to the file, '
+                                       'for files without album art)')
+    watch.add_argument('--normalize', action='store_true', help='downscale and re-encode the album art as JPEG')
+    watch.add_argument('--settle', type=float, default=watch_folder.WatchOptions().settle,
+                       help='seconds a file must stay unchanged before it is tagged (default: %(default)s)')
+    watch.add_argument('paths', nargs='+')
+
+    lyrics = commands.add_parser('lyrics', help='import lyrics from .lrc/.txt sidecar files')
+    lyrics.add_argument('--match', nargs='+', default=[lyrics_import.MATCH_BASENAME, lyrics_import.MATCH_TAGS],
+                        choices=[lyrics_import.MATCH_BASENAME, lyrics_import.MATCH_TAGS],
+                        help='pair sidecars with the track of the same name and/or by artist and title '
+                             'from the library index (default: both)')
+    lyrics.add_argument('--keep-timestamps', action='store_true', help='store LRC files as they are')
+    lyrics.add_argument('paths', nargs='+', help='directories (or files) holding the sidecars')
+
+    repad = commands.add_parser('repad', help='give every file enough padding for later edits to be written in place')
+    repad.add_argument('--headroom', type=int, default=tag_writer.POLICY.headroom,
+                       help='minimum padding in bytes (default: %(default)s)')
+    repad.add_argument('--growth', type=float, default=tag_writer.POLICY.growth,
+                       help='padding is (growth - 1) times the tag size, within the bounds (default: %(default)s)')
+    repad.add_argument('--cap', type=int, default=tag_writer.POLICY.cap,
+                       help='maximum padding in bytes (default: %(default)s)')
+    repad.add_argument('paths', nargs='+')
+
+    duplicate = commands.add_parser('duplicates', help='print the groups of files with the same audio as JSON lines')
+    duplicate.add_argument('paths', nargs='+')
+
+    extract_art = commands.add_parser('extract-art', help='write the embedded album art to image files')
+    extract_art.add_argument('--mode', choices=cover_extract.MODES, default=cover_extract.MODE_FOLDER,
+                             help='folder: a folder.jpg per directory, cache: every distinct image once in '
+                                  '--cache-dir, named after its hash (default: %(default)s)')
+    extract_art.add_argument('--cache-dir', default=cover_extract.DEFAULT_COVER_DIRECTORY,
+                             help='content-addressed image directory of the cache mode (default: %(default)s)')
+    extract_art.add_argument('--overwrite', action='store_true',
+                             help='folder mode: replace existing folder images which differ')
+    extract_art.add_argument('paths', nargs='+')
+
+    export = commands.add_parser('export', help='write the tags of every file to a CSV or JSON Lines file')
+    export.add_argument('--format', dest='file_format', choices=tag_exchange.FORMATS,
+                        help='default: from the extension of the output, CSV on standard output')
+    export.add_argument('--output', help='file to write (default: standard output)')
+    export.add_argument('paths', nargs='+')
+
+    import_tags = commands.add_parser('import', help='write the tags of an exported file which differ from the files')
+    import_tags.add_argument('--format', dest='file_format', choices=tag_exchange.FORMATS,
+                             help='default: from the extension of the file')
+    import_tags.add_argument('--dry-run', action='store_true', help='only print the differences')
+    import_tags.add_argument('file', help="CSV or JSON Lines file with a 'path' column, '-' for standard input")
+
+    search = commands.add_parser('search', help='search the library index')
+    search.add_argument('--limit', type=int, default=100)
+    search.add_argument('text')
+
+    return parser
+
+
+def _run_index_command(args: argparse.Namespace) -> int:
+    with LibraryIndex(args.database) as library:
+        if args.command == 'search':
+            for row in library.search(args.text, args.limit):
+                print(json.dumps(row, ensure_ascii=False))
+            return 0
+
+        summary = library.refresh(args.paths, workers=args.workers)
+        for path, error in summary.failed.items():
+            print(f"{path}: {error}", file=sys.stderr)
+
+        if args.command == 'rename':
+            return _rename(args, library) or (1 if summary.failed else 0)
+
+        print(f"{summary.added} added, {summary.updated} updated, {summary.removed} removed, "
+              f"{summary.unchanged} unchanged, {len(summary.failed)} failed")
+
+        return 1 if summary.failed else 0
+
+
+def _rename(args: argparse.Namespace, library: LibraryIndex) -> int:
+    rows, not_indexed = [], []
+    for path in args.paths:
+        if os.path.isdir(path):
+            directory = os.path.abspath(path)
+            rows.extend(row for row in library.records(directory)
+                        if args.recursive or os.path.dirname(row.path) == directory)
+            continue
+
+        row = library.record(path)
+        if row is None:
+            not_indexed.append(os.path.abspath(path))
+        else:
+            rows.append(row)
+
+    plan = rename_engine.plan_renames(rows, args.naming_format)
+    for path in not_indexed:
+        plan.conflicts[path] = "not in the library index"
+
+    for path, reason in plan.conflicts.items():
+        print(f"{path}: not renamed, {reason}", file=sys.stderr)
+
+    if args.dry_run:
+        for old_path, new_path in plan.moves.items():
+            print(f"{old_path} -> {new_path}")
+        return 1 if plan.conflicts else 0
+
+    summary = rename_engine.execute_plan(plan, args.journal, library)
+    for path, error in summary.failed.items():
+        print(f"{path}: {error}", file=sys.stderr)
+
+    print(f"{summary.renamed} renamed, {len(plan.conflicts)} conflicts, {len(summary.failed)} failed"
+          + (f", undo with: py_batch.py undo-rename {summary.journal}" if summary.journal else ''))
+    return 1 if plan.conflicts or summary.failed else 0
+
+
+def _watch(args: argparse.Namespace) -> int:
+    options = watch_folder.WatchOptions(naming_format=args.naming_format, cover=args.cover,
+                                        normalize=artwork.DEFAULT_OPTIONS if args.normalize else None,
+                                        settle=args.settle)
+
+    def _report(result: tag_engine.JobResult) -> None:
+        if not result.ok:
+            print(f"{result.path}: {result.error}", file=sys.stderr)
+        else:
+            print(result.path if result.value[0] == result.path else f"{result.path} -> {result.value[0]}",
+                  flush=True)
+
+    with LibraryIndex(args.database) as library:
+        try:
+            watch_folder.watch(args.paths, options, library, args.workers, args.recursive, on_result=_report)
+        except KeyboardInterrupt:
+            pass
+
+    return 0
+
+
+def _extract_art(args: argparse.Namespace) -> int:
+    def _report(result: tag_engine.JobResult) -> None:
+        if not result.ok:
+            print(f"{result.path}: {result.error}", file=sys.stderr)
+        elif result.value is not None:
+            print(json.dumps({'path': result.path, 'image': result.value.path, 'written': result.value.written},
+                             ensure_ascii=False))
+
+    summary = cover_extract.extract_covers(args.paths, args.mode, args.cache_dir, args.workers, args.recursive,
+                                           args.overwrite, on_result=_report)
+    unit = 'directories' if args.mode == cover_extract.MODE_FOLDER else 'files'
+    print(f"{unit}: {summary.written} images written, {summary.existing} already there, "
+          f"{summary.without_art} without album art, {len(summary.failed)} failed", file=sys.stderr)
+    return 1 if summary.failed else 0
+
+
+def _import_lyrics(args: argparse.Namespace) -> int:
+    with LibraryIndex(args.database) as library:
+        if lyrics_import.MATCH_TAGS in args.match:
+            library.refresh(args.paths, workers=args.workers)
+
+        summary = lyrics_import.import_tree(args.paths, tuple(args.match), library, args.keep_timestamps,
+                                            args.workers, args.recursive)
+
+        # the index keeps the lyrics as well
+        for path in summary.written:
+            library.update(path)
+
+    for path, error in summary.failed.items():
+        print(f"{path}: {error}", file=sys.stderr)
+    for sidecar in summary.skipped:
+        print(f"{sidecar}: skipped, its track has another sidecar", file=sys.stderr)
+
+    print(f"{len(summary.written)} written, {summary.identical} already identical, "
+          f"{summary.unmatched} sidecars without a track, {len(summary.skipped)} skipped, "
+          f"{len(summary.failed)} failed")
+    return 1 if summary.failed else 0
+
+
+def _export(args: argparse.Namespace) -> int:
+    file_format = args.file_format or (tag_exchange.format_of(args.output) if args.output else tag_exchange.FORMAT_CSV)
+    failures = []
+
+    def _failed(path: str, error: str) -> None:
+        failures.append(path)
+        print(f"{path}: {error}", file=sys.stderr)
+
+    if args.output is None:
+        tag_exchange.export_tags(args.paths, sys.stdout, file_format, args.workers, args.recursive, _failed)
+    else:
+        with open(args.output, 'w', encoding='utf-8', newline='') as output:
+            tag_exchange.export_tags(args.paths, output, file_format, args.workers, args.recursive, _failed)
+
+    return 1 if failures else 0
+
+
+def _import_tags(args: argparse.Namespace) -> int:
+    file_format = args.file_format or tag_exchange.format_of(args.file)
+
+    def _report(result: tag_engine.JobResult) -> None:
+        if result.ok and result.value:
+            print(json.dumps({'path': result.path, 'changes': result.value}, ensure_ascii=False), flush=True)
+            if not args.dry_run:
+                library.update(result.path)
+
+    with LibraryIndex(args.database) as library:
+        if args.file == '-':
+            summary = tag_exchange.import_rows(tag_exchange.read_rows(sys.stdin, file_format), args.dry_run,
+                                               args.workers, _report)
+        else:
+            with open(args.file, encoding='utf-8-sig', newline='') as source:
+                summary = tag_exchange.import_rows(tag_exchange.read_rows(source, file_format), args.dry_run,
+                                                   args.workers, _report)
+
+    for path, error in summary.failed.items():
+        print(f"{path}: {error}", file=sys.stderr)
+
+    print(f"{summary.changed} {'to write' if args.dry_run else 'written'}, {summary.unchanged} unchanged, "
+          f"{len(summary.failed)} failed", file=sys.stderr)
+    return 1 if summary.failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Main Function
+    :return: exit status
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command in ('index', 'search', 'rename'):
+        return _run_index_command(args)
+
+    if args.command == 'watch':
+        return _watch(args)
+
+    if args.command == 'lyrics':
+        return _import_lyrics(args)
+
+    if args.command == 'export':
+        return _export(args)
+
+    if args.command == 'import':
+        return _import_tags(args)
+
+    if args.command == 'extract-art':
+        return _extract_art(args)
+
+    if args.command == 'duplicates':
+        with LibraryIndex(args.database) as library:
+            for group in duplicates.find_duplicates(args.paths, library, args.workers):
+                print(json.dumps(group._asdict(), ensure_ascii=False))
+        return 0
+
+    if args.command == 'undo-rename':
+        with LibraryIndex(args.database) as library:
+            summary = rename_engine.undo(args.journal, library)
+        for path, error in summary.failed.items():
+            print(f"{path}: {error}", file=sys.stderr)
+        print(f"{summary.renamed} renamed back, {len(summary.failed)} failed")
+        return 1 if summary.failed else 0
+
+    if args.command == 'show':
+        job = _show
+    elif args.command == 'edit':
+        try:
+            job = partial(_edit, tags=_parse_assignments(args.assignments))
+        except argparse.ArgumentTypeError as error:
+            parser.error(str(error))
+    elif args.command == 'repad':
+        job = partial(tag_writer.repad, policy=tag_writer.PaddingPolicy(args.headroom, args.growth, args.cap))
+    else:
+        # every worker prepares the image once and embeds the same bytes in all of its files
+        options = artwork.NormalizeOptions(args.max_size, args.quality) if args.normalize else None
+        job = tag_engine.remove_cover if args.remove else partial(tag_engine.apply_cover, image=args.image,
+                                                                  options=options)
+
+    if args.command != 'show':
+        return _run_journaled(args, job)
+
+    failures = 0
+    for result in tag_engine.process_tree(args.paths, job, workers=args.workers, recursive=args.recursive):
+        if not result.ok:
+            failures += 1
+            print(f"{result.path}: {result.error}", file=sys.stderr)
+        else:
+            print(json.dumps({'path': result.path, **result.value}, ensure_ascii=False))
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,17 +4,23 @@
     16-06-2018
     Author: Naman Jain
 
+    Starts the GUI, or with --serve the tag service (tag_service.py), which doesn't import Kivy.
 """
 
-import pre_setup
-
-pre_setup.main()
+import sys
 
 
 def main():
     """
     Main Function
     """
+    if '--serve' in sys.argv[1:]:
+        import tag_service
+        sys.exit(tag_service.main(sys.argv[1:]))
+
+    import pre_setup
+    pre_setup.main()
+
     import pym_tag
     pym_tag.main()
 
@@ -17,35 +17,48 @@
 # pylint: disable=c-extension-no-member
 # pylint: disable=no-name-in-module
 
+import json
 import os
-import pathlib
 import subprocess
 import sys
-import tempfile
-import webbrowser
-from contextlib import suppress, contextmanager
+import threading
+import time
 from functools import partial
-from glob import glob
-from typing import AnyStr, Tuple, Union
-from urllib.parse import urlunparse, quote, urlencode
+from typing import AnyStr, Callable, Dict, List, Tuple, Union, TYPE_CHECKING
 
 from kivy.app import App
+from kivy.clock import Clock
+from kivy.core.text import LabelBase
 from kivy.core.window import Window
+from kivy.logger import Logger
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.checkbox import CheckBox
 from kivy.uix.image import Image
 from kivy.uix.label import Label
 from kivy.uix.popup import Popup
+from kivy.uix.progressbar import ProgressBar
 from kivy.uix.textinput import TextInput
 from kivy.uix.widget import Widget
-from mutagen import id3, File
-from mutagen.easyid3 import EasyID3
-# noinspection PyProtectedMember
-from mutagen.id3 import APIC, ID3, USLT
-from mutagen.mp3 import MP3
-
 from helper_classes import Constants, PymLabel, CustomSpinner
+from background import BackgroundRunner, BackgroundTask, CancelToken, Cancelled
+from batch_journal import BatchJournal, ProgressMeter, operation_key
+import tracing
+from texture_cache import TextureCache
+
+# mutagen, Pillow and the tagging modules are imported on first use (the first opened file),
+# so they don't add to the start up time
+if TYPE_CHECKING:
+    from mutagen.id3 import APIC
+    import artwork
+    import tag_engine
+    from library_index import LibraryIndex
+    from tag_engine import TagSession
+    from track_record import TrackRecord
+    from track_table import TrackTable
+
+# time at which all modules of the app were imported, for the start up profile
+IMPORTS_DONE = time.time()
 
 
 class TagEditor(App, BoxLayout):
@@ -55,6 +68,8 @@ class TagEditor(App, BoxLayout):
 
     # class attributes
     FILE_OPENED = False  # to store state of the opened file
+    FONT_NAME = 'AlexBrush'  # font of the text fields, registered once
+    FONT_REGISTERED = False
 
     def __init__(self, **kwargs):
         """
@@ -65,6 +80,11 @@ class TagEditor(App, BoxLayout):
         kwargs['orientation'] = 'vertical'
         super().__init__(**kwargs)
 
+        # the font is loaded once and shared by every text field
+        if not TagEditor.FONT_REGISTERED:
+            LabelBase.register(name=TagEditor.FONT_NAME, fn_regular=os.path.join('../res', 'AlexBrush-Regular.ttf'))
+            TagEditor.FONT_REGISTERED = True
+
         self.constants = Constants()
         self.title = self.constants.window_title
         self.icon = os.path.join('../res', 'app_icon.ico')
@@ -87,7 +107,7 @@ class TagEditor(App, BoxLayout):
 
         self.text_input_dict = {key: TextInput(hint_text_color=[26, 12, 232, 1],
                                                hint_text=self.constants[key],
-                                               font_name=os.path.join('../res', 'AlexBrush-Regular.ttf'),
+                                               font_name=TagEditor.FONT_NAME,
                                                halign='center',
                                                multiline=(key != "lyrics"),
                                                write_tab=False,
@@ -124,6 +144,9 @@ class TagEditor(App, BoxLayout):
         save_text = "Save\n\n[size=12][i]CTRL + S[/i][/size]"
         self.button_save = Button(text=save_text, background_color=(255, 0, 0, 1),
                                   background_normal='', markup=True, halign='center', valign='center')
+        tracks_text = "Tracks\n\n[size=12][i]CTRL + T[/i][/size]"
+        self.button_tracks = Button(text=tracks_text, background_color=(255, 0, 0, 1),
+                                    background_normal='', markup=True, halign='center', valign='center')
         self.naming_format = "no-rename"
 
         def _naming_formation_selector(_, selected_text):
@@ -145,30 +168,39 @@ class TagEditor(App, BoxLayout):
         # Button's Layout
         self.layout_button = BoxLayout(orientation='horizontal')
 
-        for widget in self.button_open, self.button_save:
+        for widget in self.button_open, self.button_save, self.button_tracks:
             self.layout_button.add_widget(widget)
 
         # button bindings
-        for button, binding in zip((self.button_open, self.button_save, self.button_album_art_change),
-                                   (self.file_open, self.save_file, self.album_art_manager)):
+        for button, binding in zip((self.button_open, self.button_save, self.button_album_art_change,
+                                    self.button_tracks),
+                                   (self.file_open, self.save_file, self.album_art_manager, self.tracks_open)):
             button.bind(on_press=binding)
 
         self.file_name, self.file_path, self.file_extension = str(), str(), str()
-        self.to_delete = tempfile.TemporaryDirectory()
+        self.tag_session = None  # TagSession of the opened file
+        self._library = None
+        self._search_index = None  # word index of the library, built when the track table is first opened
+        self._art_picker = None  # album art options popup, created when first needed
+        self.checkbox_normalize_art = None  # on the album art options popup
+        self._track_editor = None  # multi-file editing popup and its table, created when first needed
+        self.texture_cache = TextureCache()
+        self.runner = BackgroundRunner()
+        self.busy = False  # a file is being opened or saved in the background
 
     def __repr__(self) -> str:
         return "TagEditor Class"
 
-    @staticmethod
-    @contextmanager
-    def saving(file: File):
+    @property
+    def library(self) -> 'LibraryIndex':
         """
-            calls save method on the object
-        :param file: file to be saved
-        :type file: File
+            Library index, opened on first use
         """
-        yield file
-        file.save()
+        if self._library is None:
+            from library_index import LibraryIndex  # pylint: disable=import-outside-toplevel
+            self._library = LibraryIndex()
+
+        return self._library
 
     def _return_popup(self, title: AnyStr, content: Widget, size: Tuple = (500, 100),
                       size_hint=(None, None)) -> Popup:
@@ -241,22 +273,40 @@ class TagEditor(App, BoxLayout):
             self.text_input_dict[key].text = ''
             self.text_input_dict[key].readonly = True
 
-        if os.path.exists(os.path.join(os.getcwd(), self.constants.default_tag_cover)):
-            self.image_cover_art.source = self.constants.default_tag_cover
-            self.image_cover_art.reload()
-
-        else:
-            self.image_cover_art.clear_widgets()
+        self._show_cover(None)
 
         TagEditor.FILE_OPENED = False
+        self.tag_session = None
         self.checkbox_all_albums_art.disabled = True
 
-        self.to_delete.cleanup()
-        self.to_delete = tempfile.TemporaryDirectory()
-
         # binding keyboard handler
         Window.bind(on_keyboard=self.on_keyboard)
 
+    def _show_cover(self, picture: Union['APIC', None]) -> None:
+        """
+            Shows the album art, decoded from the tag bytes (no temporary file) through the
+            texture cache, or the default cover when there is none or it can't be decoded
+        :param picture: album art frame
+        :type picture: APIC
+        """
+        texture = None
+        if picture is not None:
+            try:
+                texture = self.texture_cache.get(picture.data, picture.mime)
+            except ValueError as error:
+                # a corrupt or unsupported image in the tag, the file itself is still editable
+                Logger.warning(f"PyMTag: {self.file_name}: {error}")
+
+        if texture is not None:
+            self.image_cover_art.texture = texture
+
+        elif os.path.exists(os.path.join(os.getcwd(), self.constants.default_tag_cover)):
+            self.image_cover_art.source = self.constants.default_tag_cover
+            self.image_cover_art.reload()
+
+        else:
+            self.image_cover_art.clear_widgets()
+
     def on_keyboard(self, _, __, ___, codepoint, modifier):
         """
         Handler for keyboard shortcuts
@@ -273,31 +323,119 @@ class TagEditor(App, BoxLayout):
         elif'ctrl' in modifier and codepoint == 's':
             self.save_file(None)
 
+        elif 'ctrl' in modifier and codepoint == 't':
+            self.tracks_open(None)
+
+    def _run_in_background(self, function: Callable, *args, on_done: Callable, **kwargs) -> BackgroundTask:
+        """
+            Runs the blocking function on the background runner; the app is busy (open and save are
+            ignored) until `on_done` is called back on the main thread
+        :param function: the blocking work
+        :type function: Callable
+        :param on_done: called on the main thread with the result
+        :type on_done: Callable
+        :return: handle to cancel the task
+        :rtype: BackgroundTask
+        """
+        self.busy = True
+
+        def _done(result):
+            self.busy = False
+            on_done(result)
+
+        def _error(error: BaseException):
+            self.busy = False
+            if not isinstance(error, Cancelled):
+                self._return_popup(title='Error', content=Label(text=f"{type(error).__name__}: {error}"),
+                                   size=(800, 200)).open()
+
+        return self.runner.submit(function, *args, on_done=_done, on_error=_error, **kwargs)
+
+    def _progress_popup(self, title: AnyStr, text: AnyStr, token: CancelToken) -> Tuple[Popup, ProgressBar]:
+        """
+            Popup showing the progress of a background job, with a button to cancel it
+        :param title: Title of the popup
+        :type title: str
+        :param text: description of the job
+        :type text: str
+        :param token: cancellation token of the job
+        :type token: CancelToken
+        :return: the popup and its progress bar
+        :rtype: tuple
+        """
+        layout = BoxLayout(orientation='vertical')
+        progress_bar = ProgressBar(max=1, value=0)
+        button_cancel = Button(text='Cancel', background_color=(255, 0, 0, 1), background_normal='',
+                               size_hint_y=0.4)
+        button_cancel.bind(on_press=lambda _: token.cancel())
+
+        for widget in Label(text=text), progress_bar, button_cancel:
+            layout.add_widget(widget)
+
+        popup = self._return_popup(title=title, content=layout, size=(600, 250))
+        popup.auto_dismiss = False
+
+        return popup, progress_bar
+
     def file_open(self, _: Union[Button, None]) -> None:
         """
             Opens a Windows file open dialog.
             It will use '.mp3' extension for file types
 
+            The dialog and the parsing of the file run in the background, the fields are filled in
+            by :meth:`_file_opened` once they are done
+
         :param _:
         :type _:
         :return:
         :rtype:
         """
+        if self.busy:
+            return
+
         self.init_app(None)
         self.checkbox_all_albums_art.disabled = False
 
         for text_input in self.text_input_dict.values():
             text_input.readonly = False
 
+        self._run_in_background(self._pick_and_open, on_done=self._file_opened)
+
+    @staticmethod
+    def _pick_and_open() -> Tuple[str, Union['TagSession', None]]:
+        """
+            Runs on a worker thread: shows the file dialog and parses the selected file
+        :return: path of the selected file ('' when cancelled) and its tag session
+        :rtype: tuple
+        """
         # True, None for fileopen and False, File_Name for file save dialog
         try:
-            self.file_path = subprocess.check_output([
-                'zenity', '--file-selection', '--file-filter=MP3 files (MP3) | *.mp3 | *.MP3', '--title=Select an MP3'
-            ]).decode(sys.stdout.encoding).strip()
+            with tracing.span('file_open.dialog'):
+                file_path = subprocess.check_output([
+                    'zenity', '--file-selection', '--file-filter=MP3 files (MP3) | *.mp3 | *.MP3',
+                    '--title=Select an MP3'
+                ]).decode(sys.stdout.encoding).strip()
 
         except subprocess.CalledProcessError:
-            self.file_path = ""
+            file_path = ""
 
+        if not file_path:
+            return file_path, None
+
+        with tracing.span('file_open.import'):
+            from tag_engine import TagSession  # pylint: disable=import-outside-toplevel
+
+        # a single parse serves both the text fields and the album art
+        with tracing.span('file_open.parse', path=file_path):
+            return file_path, TagSession(file_path)
+
+    def _file_opened(self, result: Tuple[str, Union['TagSession', None]]) -> None:
+        """
+            Fills the fields with the file opened by :meth:`_pick_and_open`
+        :param result: path of the selected file and its tag session
+        :type result: tuple
+        """
+        self.file_path, session = result
         self.file_name = os.path.basename(self.file_path)
         self.file_extension = os.path.splitext(self.file_path)[-1]
 
@@ -306,39 +444,22 @@ class TagEditor(App, BoxLayout):
             # if file open operation is cancelled
             return
 
-        try:
-            audio_file = EasyID3(self.file_path)
-            mp3_file = MP3(self.file_path)
-
-        except id3.ID3NoHeaderError:
-            # adding id3 header tags if the file has none
-            with self.saving(File(self.file_path, easy=True)) as file:
-                file.add_tags()
-
-            audio_file = EasyID3(self.file_path)
-            mp3_file = MP3(self.file_path)
-
-        if any(['APIC:Cover' in mp3_file, 'APIC:' in mp3_file]):
-            with open(os.path.join(self.to_delete.name, 'image.jpeg'), 'wb') as img:
-                img.write(mp3_file['APIC:' if 'APIC:' in mp3_file else 'APIC:Cover'].data)
-
-            self.image_cover_art.source = os.path.join(self.to_delete.name, 'image.jpeg')
-            self.image_cover_art.reload()
+        self.tag_session = session
+        self._show_cover(session.cover)
 
         self.title += f" -> {self.file_path}"
         self.label_file_name.pretty_text = self.file_name
 
         # filling the text field with the metadata of the song
-        with suppress(KeyError):
-            for key in self.text_input_dict:
-                if not audio_file.get(key, self.text_input_dict[key].text) == "":
-                    self.text_input_dict[key].text = audio_file.get(key, self.text_input_dict[key].text)[0]
+        for key, value in session.values().items():
+            self.text_input_dict[key].text = value
 
         TagEditor.FILE_OPENED = True
 
     def save_file(self, _: Union[Button, None]) -> None:
         """
         Save file and rename it according to the option selected by the user.
+        The file is written in the background, :meth:`_file_saved` is called once it is done.
 
         :param _:
         :type _:
@@ -346,112 +467,96 @@ class TagEditor(App, BoxLayout):
         :rtype:
         """
 
+        if self.busy:
+            return
+
         if not TagEditor.FILE_OPENED:
             self._return_popup(title='No file opened', content=Label(text="Please open a file...")).open()
             return
 
-        file = None
-        to_return = False
-        save_file_content = f"Saving {self.text_input_dict['title']}"
+        save_file_content = f"Saving {self.text_input_dict['title'].text}"
         saving_file = self._return_popup(title="Saving File", content=Label(text=save_file_content))
+        saving_file.auto_dismiss = False
+        saving_file.open()
 
-        try:
-            file = MP3(self.file_path, ID3=ID3)
-
-        except IndexError:
-            self._return_popup(title="Error", content=Label(text='Please Open a file....'),
-                               size=(200, 200)).open()
-            to_return = True
-
-        with self.saving(file) as file:
-            if to_return:
-                return
-
-            saving_file.open()
-            with suppress(id3.error):
-                file.delete()
-                file.add_tags()
-
-            if not self.image_cover_art.source == self.constants.default_tag_cover:
-                with open(self.image_cover_art.source, 'rb') as album_art_file:
-                    file.tags.add(APIC(
-                        mime=f"image/{pathlib.Path(self.image_cover_art.source).suffix.strip('.')}",
-                        type=3, desc=u'Cover', encoding=1, data=album_art_file.read()
-                    ))
-
-            else:
-                with suppress(KeyError):
-                    if 'APIC:' in file:
-                        file.tags.pop('APIC:')
-                    else:
-                        file.tags.pop('APIC:Cover')
-
-                self.checkbox_all_albums_art.active = False
-
-            file[u"USLT::'eng'"] = (USLT(
-                encoding=3, lang=u'eng', desc=u'Lyrics', text=self.text_input_dict['lyrics'].text.strip())
-            )
-
-        with self.saving(EasyID3(self.file_path)) as music_file:
-            # adding tags to the file
-            for tag in self.text_input_dict:
-                if tag == 'lyrics':
-                    continue
-
-                music_file[tag] = self.text_input_dict[tag].text
-
-            if not self.image_cover_art.source == self.constants.default_tag_cover:
-                with open(self.image_cover_art.source, 'rb') as album_art_file:
-                    file.tags.add(APIC(mime=f"image/{pathlib.Path(self.image_cover_art.source).suffix.strip('.')}",
-                                       type=3, desc=u'Cover', encoding=1, data=album_art_file.read()))
-
-            else:
-                with suppress(KeyError):
-                    if 'APIC:' in file:
-                        file.tags.pop('APIC:')
-                    else:
-                        file.tags.pop('APIC:Cover')
-
-                self.checkbox_all_albums_art.active = False
+        values = {key: text_input.text for key, text_input in self.text_input_dict.items()}
+        self._run_in_background(self._save_session, self.tag_session, values, self.naming_format,
+                                on_done=partial(self._file_saved, saving_file=saving_file))
 
-        self.file_name = self.file_path
-        
-        # if the option is not : "Don't Rename"
-        if self.naming_format != "no-rename" and self.naming_format != "Don't Rename":
-            print(self.naming_format)
-            artist = music_file['artist'][0]
-            albumartist = music_file['albumartist'][0]
-            album = music_file['album'][0]
-            title = music_file['title'][0]
-
-            # renaming the modified file with name according to the chosen option by the user
-            self.file_name = self.naming_format.format(Artist=artist, AlbumArtist=albumartist, Album=album, Title=title)
-            self.file_name = os.path.join(os.path.dirname(self.file_path), f"{self.file_name}.mp3")
+    def _save_session(self, session: 'TagSession', values: Dict[str, str],
+                      naming_format: str) -> Tuple[bool, str, str]:
+        """
+            Runs on a worker thread: writes the tags and renames the file
+        :param session: tag session of the opened file
+        :type session: TagSession
+        :param values: text of every field
+        :type values: dict
+        :param naming_format: rename option selected by the user
+        :type naming_format: str
+        :return: whether the file was written, its (new) path and why it wasn't renamed, if it wasn't
+        :rtype: tuple
+        """
+        import tag_engine  # pylint: disable=import-outside-toplevel
 
+        # album art is set on the session when it is picked or removed, so only the text
+        # fields are left; all frames are then written in a single commit, if anything changed
+        for key, value in values.items():
+            session[key] = value
+
+        with tracing.span('save_file.write', path=session.path):
+            saved = session.save()
+        file_path, not_renamed = session.path, ''
+
+        # renaming the modified file with name according to the chosen option by the user,
+        # a file already having that name is kept and the saved file keeps its name, as does a
+        # file missing a tag of the name
+        with tracing.span('save_file.rename', path=file_path):
             try:
-                os.rename(self.file_path, self.file_name)
+                new_path = tag_engine.rename_file(file_path, naming_format, session.values())
+            except (FileExistsError, ValueError) as error:
+                new_path, not_renamed = file_path, str(error)
 
-            except FileExistsError:
-                os.remove(self.file_name)
-                os.rename(self.file_path, self.file_name)
+        with tracing.span('save_file.index'):
+            if new_path != file_path:
+                self.library.rename(file_path, new_path)
+                self._reindex_rename(file_path, new_path)
+                file_path = session.path = new_path
+            self.library.update(file_path, session.values())
+            self._reindex(file_path, session.values())
 
-            self.file_path = self.file_name
+        return saved, file_path, not_renamed
+
+    def _file_saved(self, result: Tuple[bool, str, str], saving_file: Popup) -> None:
+        """
+            Reports the saved file and starts applying its album art to the album, if selected
+        :param result: whether the file was written, its (new) path and why it wasn't renamed
+        :type result: tuple
+        :param saving_file: the "Saving File" popup
+        :type saving_file: Popup
+        """
+        saved, self.file_path, not_renamed = result
+        self.file_name = self.file_path
+
+        if self.tag_session.cover is None:
+            self.checkbox_all_albums_art.active = False
 
         saving_file.dismiss()
-        self._return_popup(title='MP3 File Saved', content=Label(text=f'{self.file_name} Saved'),
-                           size=(800, 200)).open()
+        message = f'{self.file_name} {"Saved" if saved else "Unchanged"}'
+        if not_renamed:
+            message += f'\nNot renamed: {not_renamed}'
+        self._return_popup(title='MP3 File Saved', content=Label(text=message), size=(800, 200)).open()
 
         self.label_file_name.pretty_text = os.path.basename(self.file_name)
 
         TagEditor.FILE_OPENED = True
 
         if self.checkbox_all_albums_art.active:
-            print(12345)
             try:
                 self.album_art_all_songs(self.text_input_dict['album'].text,
                                          self.text_input_dict['albumartist'].text)
-            except AssertionError:
-                self._return_popup("Missing Fields", content=PymLabel(text="Album and Album Artist is Missing"))
+            except ValueError:
+                self._return_popup("Missing Fields",
+                                   content=PymLabel(text="Album and Album Artist is Missing")).open()
 
         # resetting the widgets after saving the file
         self.init_app(None)
@@ -466,12 +571,26 @@ class TagEditor(App, BoxLayout):
             :return:
             :rtype:
         """
+        if self.busy:
+            return
 
         if not TagEditor.FILE_OPENED:
             self._return_popup(title='No file opened',
                                content=Label(text="Please open a file...")).open()
             return
 
+        # the popup is built on first use and reused afterwards
+        if self._art_picker is None:
+            self._art_picker = self._build_art_picker()
+
+        self._art_picker.open()
+
+    def _build_art_picker(self) -> Popup:
+        """
+            Creates the popup offering the album art options
+        :return: the popup
+        :rtype: Popup
+        """
         # button for the popup
         button_local_picker = Button(text='Local Filesystem', background_color=(255, 0, 0, 1),
                                      background_normal='')
@@ -484,7 +603,7 @@ class TagEditor(App, BoxLayout):
 
         art_button_layout = BoxLayout(orientation='vertical')
         art_picker = self._return_popup(title='Select Album Art', content=art_button_layout,
-                                        size=(200, 200))
+                                        size=(300, 250))
 
         # binding function to button in the popup
         for widget, callback in zip((button_google_search, button_local_picker, button_art_remove,
@@ -494,7 +613,21 @@ class TagEditor(App, BoxLayout):
             widget.bind(on_press=partial(callback, art_picker=art_picker))
             art_button_layout.add_widget(widget)
 
-        art_picker.open()
+        # resizing and re-encoding as JPEG of the picked image, else it is embedded as it is
+        self.checkbox_normalize_art = CheckBox(active=True, color=[0, 0, 0, 1])
+
+        def _label_select(_widget: Widget, _):
+            self.checkbox_normalize_art.active = not self.checkbox_normalize_art.active
+
+        label_normalize = PymLabel(text="[ref=normalize]Resize and convert to JPEG[/ref]", markup=True)
+        label_normalize.bind(on_ref_press=_label_select)
+
+        normalize_layout = BoxLayout(orientation='horizontal')
+        for widget in label_normalize, self.checkbox_normalize_art:
+            normalize_layout.add_widget(widget)
+        art_button_layout.add_widget(normalize_layout)
+
+        return art_picker
 
     def album_art_local(self, _: Button, art_picker: Popup) -> None:
         """
@@ -510,16 +643,47 @@ class TagEditor(App, BoxLayout):
         :type _: Button
         """
         art_picker.dismiss()
+        self._run_in_background(self._pick_album_art, self.checkbox_normalize_art.active,
+                                on_done=self._album_art_picked)
+
+    @staticmethod
+    def _pick_album_art(normalize: bool) -> Union['artwork.CoverArt', None]:
+        """
+            Runs on a worker thread: shows the image file dialog and prepares the selected image
+        :param normalize: resize the image and re-encode it as JPEG, else embed it as it is
+        :type normalize: bool
+        :return: the prepared image, None when the dialog was cancelled
+        :rtype: artwork.CoverArt
+        """
         file_types = "JPEG File, jpg File, PNG File | *.jpg | *.jpeg | *.png;"
 
-        with suppress(subprocess.CalledProcessError):
+        try:
             # opening file dialog in Downloads folder if the image was searched online
             image_path = subprocess.check_output([
                 'zenity', '--file-selection', f'--file-filter={file_types}', '--title=Select an Image file'
             ]).decode(sys.stdout.encoding).strip()
 
-            self.image_cover_art.source = image_path
-            self.image_cover_art.reload()
+        except subprocess.CalledProcessError:
+            return None
+
+        import artwork  # pylint: disable=import-outside-toplevel
+
+        # the image is read (and normalized) once here, and kept on the session until the file is
+        # saved; the same bytes are then embedded in the other songs of the album. Without
+        # normalization the mime type is still the one of the image content, not of its extension.
+        return artwork.load(image_path, artwork.DEFAULT_OPTIONS if normalize else None)
+
+    def _album_art_picked(self, cover: Union['artwork.CoverArt', None]) -> None:
+        """
+            Shows the album art picked by :meth:`_pick_album_art`
+        :param cover: the prepared image
+        :type cover: artwork.CoverArt
+        """
+        if cover is None or self.tag_session is None:
+            return
+
+        self.tag_session.cover = cover.picture()
+        self._show_cover(self.tag_session.cover)
 
     def album_art_google(self, _: Button, art_picker: Popup) -> None:
         """
@@ -537,6 +701,10 @@ class TagEditor(App, BoxLayout):
                                                   "an auto search of album art")).open()
             return
 
+        # pylint: disable=import-outside-toplevel
+        import webbrowser
+        from urllib.parse import urlunparse, quote, urlencode
+
         # Google as_q -> advance search query; tbm=isch -> image search; image size = 500*500
         search_url = urlunparse(('https', 'www.google.co.in', quote('search'), '',
                                  urlencode({'tbm': 'isch',
@@ -560,23 +728,15 @@ class TagEditor(App, BoxLayout):
         """
         art_picker.dismiss()
 
-        file = MP3(self.file_path, ID3=ID3)
-        self.image_cover_art.source = self.constants.default_tag_cover
-
-        try:
-            file.pop('APIC:Cover')
-
-        except KeyError:
-            with suppress(KeyError):
-                file.pop('APIC:')
-
-        finally:
-            self.image_cover_art.reload()
+        # removed from the file when it is saved
+        with tracing.span('album_art_remove'):
+            self.tag_session.cover = None
+            self._show_cover(None)
 
-    @staticmethod
-    def album_art_extract(_: Button, art_picker: Popup) -> None:
+    def album_art_extract(self, _: Button, art_picker: Popup) -> None:
         """
-            Extracting Album art and saving to disc
+            Saves the album art shown in the editor to an image file, folder.jpg (or .png...) next
+            to the MP3 file by default. A whole tree is extracted with `py_batch.py extract-art`.
         :param art_picker:
         :type art_picker: Popup
         :param _:
@@ -584,19 +744,52 @@ class TagEditor(App, BoxLayout):
         """
         art_picker.dismiss()
 
-        # create name for extracted album art and name it on the basis of its album name and replace all punctuation
-        # with ""
-        # extract_file = f"{self.text_input_dict['album'].text}_{round(time())}.jpeg" \
-        #     if self.text_input_dict['album'].text != "" else f"album_art_{round(time())}.jpeg"
-        #
-        # # extract_file = re.sub(r"[^\w\s]", '', extract_file).replace('_', "")
-        #
-        # file_dialog = CreateFileDialog(False, None, extract_file, 0, "*.jpeg| JPEG File", None)
-        # file_dialog.DoModal()
-        #
-        # file_path = file_dialog.GetPathNames()
-        #
-        # shutil.copy(self.image_cover_art.source, file_path[0])
+        picture = self.tag_session.cover
+        if picture is None:
+            self._return_popup(title='No Album Art',
+                               content=Label(text="The file has no album art to extract")).open()
+            return
+
+        directory = os.path.dirname(os.path.abspath(self.file_path))
+        self._run_in_background(self._save_album_art, picture.data, directory, on_done=self._album_art_saved)
+
+    @staticmethod
+    def _save_album_art(data: bytes, directory: str) -> Union[str, None]:
+        """
+            Runs on a worker thread: asks where to save the image and writes it
+        :param data: the image
+        :type data: bytes
+        :param directory: directory of the MP3 file, where the dialog starts
+        :type directory: str
+        :return: path of the written image, None when the dialog was cancelled
+        :rtype: str
+        """
+        import cover_extract  # pylint: disable=import-outside-toplevel
+
+        file_name = cover_extract.FOLDER_NAME + cover_extract.image_extension(data)
+        try:
+            image_path = subprocess.check_output([
+                'zenity', '--file-selection', '--save', '--confirm-overwrite',
+                f'--filename={os.path.join(directory, file_name)}', '--title=Save the Album Art'
+            ]).decode(sys.stdout.encoding).strip()
+
+        except subprocess.CalledProcessError:
+            return None
+
+        with tracing.span('album_art_extract', path=image_path):
+            cover_extract.write_image(data, image_path)
+
+        return image_path
+
+    def _album_art_saved(self, image_path: Union[str, None]) -> None:
+        """
+            Confirms the image written by :meth:`_save_album_art`
+        :param image_path: path of the image
+        :type image_path: str
+        """
+        if image_path is not None:
+            self._return_popup(title='Album Art', content=Label(text=f"Saved to {image_path}"),
+                               size=(800, 200)).open()
 
     def album_art_all_songs(self, album: AnyStr, album_artist: AnyStr) -> None:
         """
@@ -606,23 +799,263 @@ class TagEditor(App, BoxLayout):
         :param album_artist: the album artist name which album art has to be changed
         :type album_artist: str
         """
+        if not album or not album_artist:
+            raise ValueError("Album and Album Artist are required")
+
+        picture, file_path = self.tag_session.cover, os.path.abspath(self.file_path)
+
+        def _apply(progress: Callable[[int, int], None], cancel: threading.Event) -> 'tag_engine.BatchSummary':
+            import artwork  # pylint: disable=import-outside-toplevel
+            import tag_engine  # pylint: disable=import-outside-toplevel
+
+            # applying the same picture to the same album again (after a cancel or a crash) skips
+            # the files which already got it
+            picture_hash = artwork.content_hash(picture.data) if picture is not None else None
+            journal = BatchJournal(operation_key('album_art', album, album_artist, picture_hash))
+
+            # the album's directory is refreshed (only changed files are parsed), tracks of the same
+            # album in other indexed directories (e.g. 'Disc 2') are matched from the index as well
+            with tracing.span('album_art_all_songs.index'):
+                self.library.refresh([os.path.dirname(file_path)], workers=1)
+                paths = [file_name for file_name in self.library.tracks_of_album(album, album_artist)
+                         if not file_name == file_path]
+
+            with tracing.span('album_art_all_songs.apply', files=len(paths)):
+                return tag_engine.apply_cover_to_album(paths, album, album_artist, picture,
+                                                       progress=progress, cancel=cancel, journal=journal)
+
+        token = CancelToken()
+        progress_popup, progress_bar = self._progress_popup('Album Art', f"Applying album art to {album}", token)
+        meter = ProgressMeter()
+
+        def _progress(done: int, total: int):
+            progress_bar.max, progress_bar.value = max(total, 1), done
+            progress_popup.title = f"Album Art ({meter.text(done, total)})"
+
+        def _applied(summary: 'tag_engine.BatchSummary'):
+            progress_popup.dismiss()
+
+            if summary.failed or summary.cancelled:
+                failures = '\n'.join(f"{os.path.basename(path)}: {error}" for path, error in summary.failed.items())
+                self._return_popup(title='Album Art',
+                                   content=Label(text=f"Album art applied to {len(summary.written)} file(s), "
+                                                      f"{summary.skipped} done before, {len(summary.failed)} failed"
+                                                      f"{', cancelled' if summary.cancelled else ''}:\n{failures}"),
+                                   size=(800, 400)).open()
+
+        progress_popup.open()
+        self._run_in_background(_apply, on_done=_applied, on_progress=_progress, token=token, cancel=token.event)
+
+    def tracks_open(self, _: Union[Button, None]) -> None:
+        """
+            Multi-file editing: asks for a directory, indexes it and shows its tracks in the
+            track table, where a column can be set for many tracks at once
+        :param _:
+        :type _: Button
+        """
+        if self.busy:
+            return
+
+        self._run_in_background(self._pick_and_index, on_done=self._tracks_loaded)
+
+    def _pick_and_index(self) -> List['TrackRecord']:
+        """
+            Runs on a worker thread: shows the directory dialog and refreshes the index with it
+        :return: path and tags of every track of the directory, none when cancelled
+        :rtype: list
+        """
+        try:
+            directory = subprocess.check_output([
+                'zenity', '--file-selection', '--directory', '--title=Select a directory'
+            ]).decode(sys.stdout.encoding).strip()
+
+        except subprocess.CalledProcessError:
+            return []
+
+        # only the files changed since the last time are parsed
+        with tracing.span('tracks_open.index', path=directory):
+            summary = self.library.refresh([directory], workers=1)
+            rows = self.library.records(directory)
+
+        with tracing.span('tracks_open.search_index'):
+            if self._search_index is None:
+                from search_index import SearchIndex  # pylint: disable=import-outside-toplevel
+                self._search_index = SearchIndex(self.library.records())
+            elif summary.added or summary.updated or summary.removed:
+                present = {row['path'] for row in rows}
+                self._search_index.remove(path for path in self._search_index.paths(directory) if path not in present)
+                for row in rows:
+                    self._search_index.update(row['path'], row)
+
+        return rows
+
+    def _reindex(self, path: str, tags: Dict[str, str]) -> None:
+        """
+            Updates the search index after a file was saved, if it was built
+        """
+        if self._search_index is not None:
+            self._search_index.update(path, tags)
+
+    def _reindex_rename(self, old_path: str, new_path: str) -> None:
+        """
+            Moves a renamed file in the search index, if it was built
+        """
+        if self._search_index is not None:
+            self._search_index.rename(old_path, new_path)
+
+    def _tracks_loaded(self, rows: List['TrackRecord']) -> None:
+        """
+            Shows the tracks read by :meth:`_pick_and_index`
+        :param rows: path and tags of every track
+        :type rows: list
+        """
+        if not rows:
+            return
+
+        if self._track_editor is None:
+            self._track_editor = self._build_track_editor()
+
+        popup, table = self._track_editor
+        table.show(rows)
+        popup.open()
+
+    def _build_track_editor(self) -> Tuple[Popup, 'TrackTable']:
+        """
+            Creates the multi-file editing popup: the track table, and below it the column to set,
+            its value and the buttons
+        :return: the popup and its table
+        :rtype: tuple
+        """
+        from track_table import COLUMNS, TrackTable  # pylint: disable=import-outside-toplevel
+
+        table = TrackTable()
+        text_input_search = TextInput(multiline=False, write_tab=False, size_hint_x=0.8,
+                                      hint_text='Search title, artist, album, genre, year...')
+        label_found = Label(text='', color=(0, 0, 0, 1), size_hint_x=0.2)
+        column_spinner = CustomSpinner(text=self.constants[COLUMNS[1]],
+                                       values=[self.constants[key] for key in COLUMNS], size_hint_x=0.2)
+        columns = {self.constants[key]: key for key in COLUMNS}
+        text_input_value = TextInput(multiline=False, write_tab=False, size_hint_x=0.35)
+        label_edited = Label(text='', color=(0, 0, 0, 1), size_hint_x=0.15)
+
+        button_set = Button(text='Set for selected', background_color=(255, 0, 0, 1), background_normal='')
+        button_select_all = Button(text='Select all', background_color=(255, 0, 0, 1), background_normal='')
+        button_save = Button(text='Save', background_color=(255, 0, 0, 1), background_normal='')
+
+        def _search(_, text):
+            # answered from the in-memory word index, fast enough to run on every keystroke
+            if self._search_index is not None:
+                found = table.select_paths(self._search_index.search(text)) if text.strip() else 0
+                label_found.text = f"{found} selected" if text.strip() else ''
+
+        text_input_search.bind(text=_search)
+
+        def _set(_):
+            edited = table.edit_column(columns[column_spinner.text], text_input_value.text)
+            label_edited.text = f"{edited} file(s) to save"
+
+        def _save(_):
+            if table.edits and not self.busy:
+                self._save_tracks(table, label_edited)
+
+        for button, callback in zip((button_set, button_select_all, button_save),
+                                    (_set, lambda _: table.select_all(), _save)):
+            button.bind(on_press=callback)
+
+        layout_edit = BoxLayout(orientation='horizontal', size_hint_y=None, height=50)
+        for widget in column_spinner, text_input_value, button_set, button_select_all, label_edited, button_save:
+            layout_edit.add_widget(widget)
+
+        layout_search = BoxLayout(orientation='horizontal', size_hint_y=None, height=40)
+        for widget in text_input_search, label_found:
+            layout_search.add_widget(widget)
+
+        layout = BoxLayout(orientation='vertical')
+        for widget in layout_search, table, layout_edit:
+            layout.add_widget(widget)
+
+        return self._return_popup(title='Tracks', content=layout, size_hint=(0.95, 0.95)), table
+
+    def _save_tracks(self, table: 'TrackTable', label_edited: Label) -> None:
+        """
+            Writes the edits of the track table as one batch in the background; only the files
+            whose values differ are written
+        :param table: the track table
+        :type table: TrackTable
+        :param label_edited: label showing the number of files to save
+        :type label_edited: Label
+        """
+        edits = {path: dict(tags) for path, tags in table.edits.items()}
+
+        def _save(progress: Callable[[int, int], None], cancel: threading.Event) -> 'tag_engine.BatchSummary':
+            import tag_engine  # pylint: disable=import-outside-toplevel
+
+            with tracing.span('tracks_save.write', files=len(edits)):
+                summary = tag_engine.save_many(edits, progress=progress, cancel=cancel)
+
+            with tracing.span('tracks_save.index'):
+                for path in summary.written:
+                    tags = tag_engine.read_tags(path)
+                    self.library.update(path, tags)
+                    self._reindex(path, tags)
+
+            return summary
+
+        token = CancelToken()
+        progress_popup, progress_bar = self._progress_popup('Tracks', f"Saving {len(edits)} file(s)", token)
+        meter = ProgressMeter()
+
+        def _progress(done: int, total: int):
+            progress_bar.max, progress_bar.value = max(total, 1), done
+            progress_popup.title = f"Tracks ({meter.text(done, total)})"
+
+        def _saved(summary: 'tag_engine.BatchSummary'):
+            progress_popup.dismiss()
+
+            # files which were written, or already had the values, are done
+            table.saved(path for path in edits if path not in summary.failed
+                        and (path in summary.written or not summary.cancelled))
+            label_edited.text = f"{len(table.edits)} file(s) to save"
+
+            if summary.failed or summary.cancelled:
+                failures = '\n'.join(f"{os.path.basename(path)}: {error}" for path, error in summary.failed.items())
+                self._return_popup(title='Tracks',
+                                   content=Label(text=f"{len(summary.written)} file(s) saved, "
+                                                      f"{len(summary.failed)} failed"
+                                                      f"{', cancelled' if summary.cancelled else ''}:\n{failures}"),
+                                   size=(800, 400)).open()
+
+        progress_popup.open()
+        self._run_in_background(_save, on_done=_saved, on_progress=_progress, token=token, cancel=token.event)
+
+    def on_start(self):
+        """
+            When PYMTAG_STARTUP_PROFILE is set to a file name, the import and first frame times are
+            written to it (see benchmarks/bench_startup.py) and the app exits
+        """
+        if os.environ.get('PYMTAG_STARTUP_PROFILE'):
+            Window.bind(on_flip=self._write_startup_profile)
+
+    def _write_startup_profile(self, *_) -> None:
+        """
+            Called once the first frame is on screen
+        """
+        Window.unbind(on_flip=self._write_startup_profile)
 
-        for file_name in glob(f"{os.path.dirname(self.file_path)}/*.mp3"):
-            music_file = EasyID3(file_name)
+        with open(os.environ['PYMTAG_STARTUP_PROFILE'], 'w') as profile:
+            json.dump({'imports_done': IMPORTS_DONE, 'first_frame': time.time()}, profile)
 
-            if music_file['album'][0] == album and music_file['albumartist'][0] == album_artist:
-                with self.saving(MP3(file_name)) as mp3_file:
-                    with open(self.image_cover_art.source, 'rb') as alb_art:
-                        mp3_file.tags.add(APIC(mime=f'image/{pathlib.Path(self.image_cover_art.source).suffix}',
-                                               type=3, desc=u'Cover', data=alb_art.read(), encoding=1))
+        Clock.schedule_once(lambda _dt: self.stop())
 
     def on_stop(self):
         """
             this will be called when the app will exit,
-            and it will delete any temporary directory created
+            and it will stop the background jobs and close the library index
         """
-        if self.to_delete is not None:
-            self.to_delete.cleanup()
+        self.runner.shutdown()
+        if self._library is not None:
+            self._library.close()
+        tracing.flush()
         super().on_stop()
 
 
@@ -0,0 +1,302 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Bulk renaming of whole directories with a `Constants.rename` template.
+
+    Renaming is split in two steps. :func:`plan_renames` works out the new name of every file from
+    the library index in a single pass, without touching the disk apart from listing the target
+    directories: names are sanitized, and files whose target is taken (by a file that stays, or by
+    another file of the plan) are left out as conflicts. Chains (a -> b, b -> c) are ordered so a
+    name is always vacated before it is reused, and cycles (a -> b, b -> a) go through a temporary
+    name. :func:`execute_plan` then performs the renames, writing every step to an undo journal
+    before it is done, so :func:`undo` can put the files back.
+
+    An existing file is never overwritten: a step whose target exists when it is reached is skipped.
+"""
+
+import json
+import os
+import time
+import uuid
+from collections import defaultdict
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+import tag_engine
+import tracing
+from library_index import DEFAULT_DATABASE, LibraryIndex
+
+DEFAULT_JOURNAL_DIRECTORY = os.path.join(os.path.dirname(DEFAULT_DATABASE), 'renames')
+
+# steps written to the journal (and flushed to disk) before they are performed
+JOURNAL_BATCH = 1000
+
+# files of a cycle are parked under this name, in their own directory
+TEMPORARY_PREFIX = '.pymtag-rename-'
+
+
+class RenameMove(NamedTuple):
+    """
+        A single os.rename
+    """
+    source: str
+    target: str
+
+
+class RenamePlan(NamedTuple):
+    """
+        Renames to perform, in order, and the files left out
+    """
+    steps: List[RenameMove]  # temporary names of cycles included
+    conflicts: Dict[str, str]  # path -> why it isn't renamed
+
+    @property
+    def moves(self) -> Dict[str, str]:
+        """
+            final path of every renamed file
+        """
+        moves, temporary = {}, {}
+        for source, target in self.steps:
+            source = temporary.pop(source, source)
+            if os.path.basename(target).startswith(TEMPORARY_PREFIX):
+                temporary[target] = source
+            else:
+                moves[source] = target
+
+        return moves
+
+
+class RenameSummary(NamedTuple):
+    """
+        Outcome of :func:`execute_plan` and :func:`undo`
+    """
+    renamed: int
+    failed: Dict[str, str]  # path -> error
+    journal: Optional[str]
+
+
+def _temporary_path(path: str) -> str:
+    return os.path.join(os.path.dirname(path), f"{TEMPORARY_PREFIX}{uuid.uuid4().hex}.mp3")
+
+
+def _existing_names(directories: Iterable[str]) -> Dict[str, set]:
+    """
+        Names in every directory, one listing per directory instead of a stat per file
+    """
+    names = {}
+    for directory in directories:
+        try:
+            names[directory] = set(os.listdir(directory))
+        except OSError:
+            names[directory] = set()
+
+    return names
+
+
+def _ordered_steps(moves: Dict[str, str]) -> List[RenameMove]:
+    """
+        Orders the moves so every target is free when it is reached.
+
+        Targets are unique, so the moves form chains and cycles: a chain is performed from its
+        end (the move whose target isn't renamed away) back to its start; a cycle by moving one
+        file to a temporary name, walking the cycle, and moving the temporary file to its target.
+    """
+    # the move whose target is the given path, i.e. the move waiting for that path to be vacated
+    waiting = {target: source for source, target in moves.items()}
+
+    steps, done = [], set()
+
+    def _unwind(source: str) -> None:
+        while source is not None and source not in done:
+            done.add(source)
+            steps.append(RenameMove(source, moves[source]))
+            source = waiting.get(source)
+
+    for source, target in moves.items():
+        if target not in moves:
+            _unwind(source)
+
+    for source, target in moves.items():
+        if source in done:
+            continue
+
+        # every move left is part of a cycle
+        temporary = _temporary_path(source)
+        steps.append(RenameMove(source, temporary))
+        done.add(source)
+        _unwind(waiting[source])
+        steps.append(RenameMove(temporary, target))
+
+    return steps
+
+
+def plan_renames(rows: Iterable[Mapping[str, str]], naming_format: str) -> RenamePlan:
+    """
+        Works out the renames of many files, without renaming anything
+
+    :param rows: path and tags of every file, e.g. `LibraryIndex.records()`
+    :type rows: Iterable[Mapping[str, str]]
+    :param naming_format: key or template of `Constants.rename`
+    :type naming_format: str
+    :return: the renames to perform and the files left out
+    :rtype: RenamePlan
+    """
+    template = tag_engine.rename_template(naming_format)
+    if template is None:
+        return RenamePlan([], {})
+
+    conflicts = {}
+    claimed: Dict[str, List[str]] = defaultdict(list)  # target -> sources
+    for row in rows:
+        source = os.path.abspath(row['path'])
+        missing = tag_engine.missing_tags(template, row)
+        if missing:
+            conflicts[source] = f"missing {'/'.join(missing)}"
+            continue
+
+        target = tag_engine.renamed_path(source, template, row)
+        if target != source:
+            claimed[target].append(source)
+
+    moves = {}
+    for target, sources in claimed.items():
+        sources.sort()
+        moves[sources[0]] = target
+        for source in sources[1:]:
+            conflicts[source] = f"same new name as {sources[0]}"
+
+    existing = _existing_names({os.path.dirname(target) for target in moves.values()})
+
+    # a taken target is only usable if the file holding it is renamed away; as leaving a file out
+    # can take its name away from another file, repeat until nothing changes
+    while True:
+        blocked = [source for source, target in moves.items()
+                   if target not in moves and os.path.basename(target) in existing[os.path.dirname(target)]]
+        if not blocked:
+            break
+
+        for source in blocked:
+            conflicts[source] = f"{moves.pop(source)} already exists"
+
+    return RenamePlan(_ordered_steps(moves), conflicts)
+
+
+def _journal_lines(steps: List[RenameMove]) -> Iterator[str]:
+    for source, target in steps:
+        yield json.dumps({'source': source, 'target': target}, ensure_ascii=False) + '\n'
+
+
+def _rename(source: str, target: str) -> None:
+    # os.rename silently replaces an existing target on POSIX
+    if os.path.lexists(target) and not os.path.samefile(source, target):
+        raise FileExistsError(f"{target} already exists")
+
+    os.rename(source, target)
+
+
+def _perform(steps: List[RenameMove], journal_path: Optional[str] = None, undoing: bool = False,
+             progress: Optional[Callable[[int, int], None]] = None) -> Tuple[List[RenameMove], Dict[str, str]]:
+    done, failed = [], {}
+
+    with open(journal_path, 'a', encoding='utf-8') if journal_path else nullcontext() as journal:
+        for start in range(0, len(steps), JOURNAL_BATCH):
+            batch = steps[start:start + JOURNAL_BATCH]
+
+            # the steps are on disk before any of them is performed, so an interrupted run can be undone
+            if journal is not None:
+                journal.writelines(_journal_lines(batch))
+                journal.flush()
+                os.fsync(journal.fileno())
+
+            with tracing.span('rename.batch', files=len(batch)):
+                for step in batch:
+                    # a journaled step the interrupted run didn't get to
+                    if undoing and (not os.path.lexists(step.source) or os.path.lexists(step.target)):
+                        continue
+
+                    try:
+                        _rename(*step)
+                        done.append(step)
+                    except OSError as error:
+                        failed[step.source] = str(error)
+
+            if progress is not None:
+                progress(start + len(batch), len(steps))
+
+    return done, failed
+
+
+def execute_plan(plan: RenamePlan, journal_path: Optional[str] = None, library: Optional[LibraryIndex] = None,
+                 progress: Optional[Callable[[int, int], None]] = None) -> RenameSummary:
+    """
+        Performs the renames of a plan
+
+    :param plan: plan made by :func:`plan_renames`
+    :type plan: RenamePlan
+    :param journal_path: undo journal, a new one in DEFAULT_JOURNAL_DIRECTORY when not given
+    :type journal_path: str
+    :param library: library index to move the renamed files in
+    :type library: LibraryIndex
+    :param progress: called with (steps done, total steps) after every batch
+    :type progress: Callable
+    :return: number of renamed files, the files that couldn't be renamed and the journal path
+    :rtype: RenameSummary
+    """
+    if not plan.steps:
+        return RenameSummary(0, {}, None)
+
+    if journal_path is None:
+        os.makedirs(DEFAULT_JOURNAL_DIRECTORY, exist_ok=True)
+        journal_path = os.path.join(DEFAULT_JOURNAL_DIRECTORY, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl")
+
+    done, failed = _perform(plan.steps, journal_path, progress=progress)
+
+    # the index follows the files step by step, through the temporary names of cycles
+    if library is not None:
+        library.rename_many(done)
+
+    return RenameSummary(len(RenamePlan(done, {}).moves), failed, journal_path)
+
+
+def read_journal(journal_path: str) -> List[RenameMove]:
+    """
+        Steps recorded in an undo journal, a line cut short by a crash is ignored
+
+    :param journal_path: path of the journal
+    :type journal_path: str
+    :return: the steps, in the order they were performed
+    :rtype: list
+    """
+    steps = []
+    with open(journal_path, encoding='utf-8') as journal:
+        for line in journal:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            steps.append(RenameMove(record['source'], record['target']))
+
+    return steps
+
+
+def undo(journal_path: str, library: Optional[LibraryIndex] = None) -> RenameSummary:
+    """
+        Reverts the renames recorded in a journal, latest first.
+        Steps which weren't performed (their target doesn't exist) are skipped.
+
+    :param journal_path: journal written by :func:`execute_plan`
+    :type journal_path: str
+    :param library: library index to move the files back in
+    :type library: LibraryIndex
+    :return: number of files put back and the files that couldn't be
+    :rtype: RenameSummary
+    """
+    steps = [RenameMove(target, source) for source, target in reversed(read_journal(journal_path))]
+    done, failed = _perform(steps, undoing=True)
+
+    if library is not None:
+        library.rename_many(done)
+
+    return RenameSummary(len(RenamePlan(done, {}).moves), failed, journal_path)
@@ -0,0 +1,309 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    In-memory inverted index of the editor tags, for searching as the user types.
+
+    Every word of the title, artist, album, album artist, genre and date of a track (case and
+    accents folded) maps to the ids of the tracks containing it. A query matches the tracks
+    having all of its words:
+        * the last word is a prefix (the user is still typing it), found with bisect on the
+          sorted vocabulary,
+        * a word which isn't in the vocabulary matches the words one typo away from it (one
+          character missing, extra, replaced or two swapped): every such variant of the word is
+          looked up in the vocabulary, which costs a few hundred dict lookups per query word but
+          no memory, unlike a precomputed map of the variants of every word in the library.
+
+    The index is built once from the library index and updated per file after saves, so a query
+    never reads a file or the database. It is kept small for large libraries: the words are
+    interned (stored once, however many tracks have them) and a word of a single track, which
+    most rare words are, maps to the track id itself instead of a set of one id.
+"""
+
+import bisect
+import heapq
+import os
+import re
+import sys
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple, Union
+
+FIELDS = ('title', 'artist', 'album', 'albumartist', 'genre', 'date')
+
+WORD = re.compile(r'\w+')
+
+# shorter words aren't looked up with a typo, too many words are one typo away from them
+TYPO_MIN_LENGTH = 4
+# a shorter query only matches the word itself, as a prefix it would match a good part of the library
+PREFIX_MIN_LENGTH = 2
+
+
+def words(text: str) -> List[str]:
+    """
+        Words of the text, folded for matching: 'Beyoncé Knowles' -> ['beyonce', 'knowles']
+
+    :param text: tag value or query
+    :type text: str
+    :return: folded words, in order
+    :rtype: list
+    """
+    text = unicodedata.normalize('NFKD', text.casefold())
+    return WORD.findall(''.join(character for character in text if not unicodedata.combining(character)))
+
+
+def one_typo_away(word: str, alphabet: Iterable[str]) -> Set[str]:
+    """
+        Every word one typo away from `word`: a character deleted, inserted, replaced or two
+        neighbouring characters swapped
+
+    :param word: the word
+    :type word: str
+    :param alphabet: characters which can be inserted or replaced
+    :type alphabet: Iterable[str]
+    :return: the variants
+    :rtype: set
+    """
+    splits = [(word[:position], word[position:]) for position in range(len(word) + 1)]
+    variants = {start + end[1:] for start, end in splits if end}
+    variants.update(start + end[1] + end[0] + end[2:] for start, end in splits if len(end) > 1)
+    for character in alphabet:
+        variants.update(start + character + end[1:] for start, end in splits if end)
+        variants.update(start + character + end for start, end in splits)
+
+    variants.discard(word)
+    return variants
+
+
+class SearchIndex:
+    """
+        Word -> tracks index of the library
+    """
+
+    def __init__(self, rows: Iterable[Mapping[str, str]] = ()) -> None:
+        """
+
+        :param rows: path and tags of every track, e.g. `LibraryIndex.records()`
+        :type rows: Iterable[Mapping[str, str]]
+        """
+        self._lock = threading.Lock()
+        self._paths: List[Optional[str]] = []  # track id -> path, None once removed
+        self._ids: Dict[str, int] = {}
+        self._words: List[Tuple[str, ...]] = []  # track id -> its words, to remove it again
+        self._postings: Dict[str, Union[int, Set[int]]] = {}  # word -> its track, or set of tracks
+        self._vocabulary: List[str] = []  # sorted words, for prefixes
+        self._alphabet: Set[str] = set()  # characters of the words, for typos
+
+        # built in one go: the vocabulary is sorted once instead of on every new word
+        for row in rows:
+            self._add(os.path.abspath(row['path']), row)
+
+        self._vocabulary = sorted(self._postings)
+
+    def __repr__(self) -> str:
+        return f"SearchIndex({len(self)} tracks, {len(self._vocabulary)} words)"
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, path: str) -> bool:
+        return os.path.abspath(path) in self._ids
+
+    def _add(self, path: str, tags: Mapping[str, str], track: Optional[int] = None) -> List[str]:
+        """
+            Adds a track (under the id it had before, when re-indexed), the words new to the index
+            are returned
+        """
+        track_words = tuple({sys.intern(word) for key in FIELDS for word in words(tags.get(key) or '')})
+        if track is None:
+            track = len(self._paths)
+            self._paths.append(path)
+            self._words.append(track_words)
+        else:
+            self._paths[track], self._words[track] = path, track_words
+        self._ids[path] = track
+
+        new_words = []
+        for word in track_words:
+            postings = self._postings.get(word)
+            if postings is None:
+                self._postings[word] = track
+                new_words.append(word)
+                self._alphabet.update(word)
+            elif isinstance(postings, int):
+                self._postings[word] = {postings, track}
+            else:
+                postings.add(track)
+
+        return new_words
+
+    def _remove(self, path: str) -> List[str]:
+        """
+            Removes a track, the words no other track has are returned
+        """
+        track = self._ids.pop(path, None)
+        if track is None:
+            return []
+
+        self._paths[track] = None
+        track_words, self._words[track] = self._words[track], ()
+
+        gone = []
+        for word in track_words:
+            postings = self._postings[word]
+            if isinstance(postings, int):
+                del self._postings[word]
+                gone.append(word)
+            else:
+                postings.discard(track)
+                if len(postings) == 1:
+                    self._postings[word] = postings.pop()
+
+        return gone
+
+    def _sort_in(self, new_words: Iterable[str], gone: Iterable[str]) -> None:
+        for word in gone:
+            del self._vocabulary[bisect.bisect_left(self._vocabulary, word)]
+        for word in new_words:
+            bisect.insort(self._vocabulary, word)
+
+    def update(self, path: str, tags: Mapping[str, str]) -> None:
+        """
+            Adds or re-indexes a track, e.g. right after it was saved
+
+        :param path: path of the MP3 file
+        :type path: str
+        :param tags: tags of the file
+        :type tags: Mapping[str, str]
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            track = self._ids.get(path)
+            gone = self._remove(path)
+            new_words = self._add(path, tags, track)
+            # a word which was removed and added back is still in the vocabulary
+            self._sort_in(set(new_words) - set(gone), set(gone) - set(new_words))
+
+    def remove(self, paths: Iterable[str]) -> None:
+        """
+            Drops tracks from the index
+
+        :param paths: paths of the removed files
+        :type paths: Iterable[str]
+        """
+        with self._lock:
+            for path in paths:
+                self._sort_in((), self._remove(os.path.abspath(path)))
+
+    def rename(self, old_path: str, new_path: str) -> None:
+        """
+            Moves a track to its new path
+
+        :param old_path: path before renaming
+        :type old_path: str
+        :param new_path: path after renaming
+        :type new_path: str
+        """
+        old_path, new_path = os.path.abspath(old_path), os.path.abspath(new_path)
+        with self._lock:
+            track = self._ids.pop(old_path, None)
+            if track is not None:
+                self._paths[track] = new_path
+                self._ids[new_path] = track
+
+    def paths(self, root: Optional[str] = None) -> List[str]:
+        """
+            Indexed tracks, optionally only the ones below `root`
+
+        :param root: directory to restrict the result to
+        :type root: str
+        :return: paths of the tracks
+        :rtype: list
+        """
+        with self._lock:
+            if root is None:
+                return list(self._ids)
+
+            root = os.path.join(os.path.abspath(root), '')
+            return [path for path in self._ids if path.startswith(root)]
+
+    def _tracks(self, word: str) -> Set[int]:
+        """
+            Tracks having the word (not to be modified), none when it isn't in the index
+        """
+        postings = self._postings.get(word, ())
+        return {postings} if isinstance(postings, int) else postings or set()
+
+    def _prefixed(self, prefix: str, minimum: int = 1) -> List[Set[int]]:
+        """
+            Tracks of every word starting with `prefix`, one set per word; only of the word
+            itself when the prefix is shorter than `minimum`
+        """
+        if len(prefix) < minimum:
+            return [self._tracks(prefix)] if prefix in self._postings else []
+
+        found = []
+        for position in range(bisect.bisect_left(self._vocabulary, prefix), len(self._vocabulary)):
+            word = self._vocabulary[position]
+            if not word.startswith(prefix):
+                break
+            found.append(self._tracks(word))
+
+        return found
+
+    def _typo_matches(self, word: str) -> Set[int]:
+        if len(word) < TYPO_MIN_LENGTH:
+            return set()
+
+        close = (self._tracks(variant) for variant in one_typo_away(word, self._alphabet)
+                 if variant in self._postings)
+        return set().union(*close)
+
+    def _matches(self, word: str) -> Set[int]:
+        """
+            Tracks having the word, or else a word one typo away from it (not to be modified)
+        """
+        return self._tracks(word) or self._typo_matches(word)
+
+    def search(self, text: str, limit: Optional[int] = None) -> List[str]:
+        """
+            Tracks matching every word of the query, the last word being a prefix
+
+        :param text: the query, e.g. 'beatles abbey ro'
+        :type text: str
+        :param limit: maximum number of paths returned, all when None
+        :type limit: int
+        :return: paths of the matching tracks, in the order they were added to the index
+                 (path order, for an index built from `LibraryIndex.records()`)
+        :rtype: list
+        """
+        query = words(text)
+        if not query:
+            return []
+
+        *complete, last = query
+        with self._lock:
+            if not complete:
+                prefixed = self._prefixed(last, PREFIX_MIN_LENGTH)
+                tracks = set().union(*prefixed) if prefixed else self._typo_matches(last)
+            else:
+                # the rarest word first, so the intersection shrinks as fast as possible
+                found = sorted((self._matches(word) for word in complete), key=len)
+                candidates = found[0].intersection(*found[1:])
+                prefixed = self._prefixed(last)
+
+                if len(candidates) < len(prefixed):
+                    # a short prefix of many words, checking the few candidates is cheaper
+                    tracks = {track for track in candidates
+                              if any(word.startswith(last) for word in self._words[track])}
+                else:
+                    # each word's tracks are intersected on their own (walking the smaller set),
+                    # instead of building the union of all of them
+                    tracks = set().union(*(candidates & word_tracks for word_tracks in prefixed))
+
+                if not tracks and not prefixed:
+                    tracks = candidates.intersection(self._typo_matches(last))
+
+            order = heapq.nsmallest(limit, tracks) if limit is not None else sorted(tracks)
+            return [self._paths[track] for track in order]
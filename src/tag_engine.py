@@ -0,0 +1,685 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Headless tagging engine.
+
+    Everything the GUI does to a file (open, edit, save, rename, apply cover art) is exposed here
+    as plain functions that never touch Kivy, so the same code can be driven from scripts, the
+    command line tool (py_batch.py) or a process pool working on a whole library.
+"""
+
+import os
+import re
+import signal
+import string
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Set, Tuple, Union
+
+from mutagen import id3
+# noinspection PyProtectedMember
+from mutagen.id3 import APIC, ID3, USLT
+
+import artwork
+from batch_journal import BatchJournal
+import id3_scanner
+import tag_writer
+import tracing
+from constants import Constants
+
+CONSTANTS = Constants()
+
+# every key shown in the editor, lyrics is stored in an USLT frame instead of an easy key
+TAG_KEYS = tuple(CONSTANTS)
+EASY_KEYS = tuple(key for key in TAG_KEYS if key != 'lyrics')
+
+# ID3 frame behind every easy key, same mapping as mutagen's EasyID3
+EASY_FRAMES = {'title': 'TIT2', 'artist': 'TPE1', 'album': 'TALB', 'albumartist': 'TPE2',
+               'date': 'TDRC', 'genre': 'TCON', 'tracknumber': 'TRCK'}
+
+# characters not allowed in file names on Linux, Windows or macOS, and control characters
+ILLEGAL_CHARACTERS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+# longest file name (in bytes) most file systems accept
+NAME_MAX = 255
+
+# tag I/O is mostly waiting on the disk, a few threads are enough to keep it busy
+DEFAULT_IO_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+
+class JobResult(NamedTuple):
+    """
+        Outcome of a job run on a single file by :func:`process_tree`
+    """
+    path: str
+    ok: bool
+    value: object = None
+    error: Optional[str] = None
+
+
+class TagSession:
+    """
+        A single parse of a file's ID3 tag.
+
+        The tag tree is read once and serves both the easy keys shown in the editor (title,
+        artist, album, ...) and the raw frames (APIC, USLT), instead of parsing the file once with
+        EasyID3 and again with MP3. Only the ID3 block is read; the MPEG stream isn't scanned.
+
+        Edits are tracked against the values loaded from the file, so that :meth:`save` writes all
+        frames (text, APIC, USLT) in a single commit, and doesn't write at all when nothing changed.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+
+        :param path: path of the MP3 file
+        :type path: str
+        """
+        self.path = path
+
+        with tracing.span('tag.parse', path=path):
+            try:
+                self.tags = ID3(path)
+                self.has_header = True
+                tracing.count('bytes_read', self.tags.size)
+
+            except id3.ID3NoHeaderError:
+                # the header is added when the session is saved
+                self.tags = ID3()
+                self.has_header = False
+
+        self.loaded = self.values()
+        self._loaded_cover = self.cover
+        self._touched = set()
+
+    def __repr__(self) -> str:
+        return f"TagSession({self.path!r})"
+
+    def __getitem__(self, key: str) -> str:
+        if key == 'lyrics':
+            lyrics = self.tags.getall('USLT')
+            return lyrics[0].text if lyrics else ''
+
+        frame = self.tags.get(EASY_FRAMES[key])
+        if frame is None or not frame.text:
+            return ''
+
+        if key == 'genre':
+            # resolves ID3v1 style numeric genres, like EasyID3 does
+            return frame.genres[0] if frame.genres else ''
+
+        return str(frame.text[0])
+
+    def __setitem__(self, key: str, value: str) -> None:
+        value = value.strip() if key == 'lyrics' else value
+        if value == self[key]:
+            # keeps frames holding several values (e.g. two artists) as they are
+            return
+
+        self._touched.add(key)
+        if key == 'lyrics':
+            self.tags.delall('USLT')
+            if value:
+                self.tags.add(USLT(encoding=3, lang=u'eng', desc=u'Lyrics', text=value))
+            return
+
+        frame_id = EASY_FRAMES[key]
+        if value:
+            self.tags.setall(frame_id, [id3.Frames[frame_id](encoding=3, text=[value])])
+        else:
+            self.tags.delall(frame_id)
+
+    def values(self) -> Dict[str, str]:
+        """
+            Tags shown in the editor
+
+        :return: mapping of every key of :class:`Constants` to its value ('' when missing)
+        :rtype: dict
+        """
+        return {key: self[key] for key in TAG_KEYS}
+
+    @property
+    def cover(self) -> Optional[APIC]:
+        """
+            The embedded album art frame, preferring the front cover
+        """
+        pictures = self.tags.getall('APIC')
+        if not pictures:
+            return None
+
+        return next((picture for picture in pictures if picture.type == 3), pictures[0])
+
+    @cover.setter
+    def cover(self, picture: Optional[APIC]) -> None:
+        if _same_picture(picture, self.cover):
+            return
+
+        self._touched.add('cover')
+        self.tags.delall('APIC')
+        if picture is not None:
+            self.tags.add(picture)
+
+    @property
+    def changed(self) -> Set[str]:
+        """
+            Keys (and 'cover') whose value differs from the one loaded from the file
+        """
+        changed = {key for key in self._touched - {'cover'} if self[key] != self.loaded[key]}
+        if 'cover' in self._touched and not _same_picture(self.cover, self._loaded_cover):
+            changed.add('cover')
+
+        return changed
+
+    def save(self, force: bool = False) -> bool:
+        """
+            Writes the tag back to the file in a single write, if anything changed
+
+        :param force: write even if nothing changed, e.g. to add a missing ID3 header
+        :type force: bool
+        :return: whether the file was written
+        :rtype: bool
+        """
+        if not force and not self.changed:
+            return False
+
+        with tracing.span('tag.write', path=self.path) as span_args:
+            # in place when the tag fits its old space, else a streaming rewrite of the whole file
+            written = tag_writer.write_tag(self.path, self.tags)
+            self.has_header = True
+
+            if tracing.ENABLED:
+                span_args.update(in_place=written.in_place, bytes_written=written.bytes_written)
+                tracing.count('bytes_written', written.bytes_written)
+                tracing.count('files_touched')
+
+        self.loaded = self.values()
+        self._loaded_cover = self.cover
+        self._touched.clear()
+
+        return True
+
+
+def _same_picture(first: Optional[APIC], second: Optional[APIC]) -> bool:
+    if first is None or second is None:
+        return first is second
+
+    return first.mime == second.mime and first.data == second.data
+
+
+def open_file(path: str) -> TagSession:
+    """
+        Opens the file for tag editing
+
+    :param path: path of the MP3 file
+    :type path: str
+    :return: tag session of the file
+    :rtype: TagSession
+    """
+    return TagSession(path)
+
+
+def read_tags(path: str) -> Dict[str, str]:
+    """
+        Reads the tags shown in the editor
+
+    :param path: path of the MP3 file
+    :type path: str
+    :return: mapping of every key of :class:`Constants` to its value ('' when missing)
+    :rtype: dict
+    """
+    return TagSession(path).values()
+
+
+def save_tags(path: str, tags: Mapping[str, str]) -> bool:
+    """
+        Writes the given tags to the file, keys not present in `tags` are left untouched.
+        An empty value removes the tag.
+
+    :param path: path of the MP3 file
+    :type path: str
+    :param tags: mapping of :class:`Constants` keys to their new value
+    :type tags: Mapping[str, str]
+    :return: whether the file was written
+    :rtype: bool
+    """
+    unknown = set(tags) - set(TAG_KEYS)
+    if unknown:
+        raise KeyError(f"Unknown tag(s): {', '.join(sorted(unknown))}")
+
+    session = TagSession(path)
+    for key, value in tags.items():
+        session[key] = value
+
+    return session.save()
+
+
+def apply_cover(path: str, image: Union[str, bytes, artwork.CoverArt],
+                options: Optional[artwork.NormalizeOptions] = None) -> bool:
+    """
+        Embeds the image as the front cover of the file
+
+    :param path: path of the MP3 file
+    :type path: str
+    :param image: path of the image, its content or an already prepared image
+    :type image: str or bytes or artwork.CoverArt
+    :param options: normalization of the image, None to embed it as it is
+    :type options: artwork.NormalizeOptions
+    :return: whether the file was written
+    :rtype: bool
+    """
+    if isinstance(image, str):
+        image = artwork.load(image, options)
+    elif isinstance(image, bytes):
+        image = artwork.prepare(image, options)
+
+    session = TagSession(path)
+    session.cover = image.picture()
+    return session.save()
+
+
+def remove_cover(path: str) -> bool:
+    """
+        Removes any embedded album art from the file
+
+    :param path: path of the MP3 file
+    :type path: str
+    :return: whether the file was written
+    :rtype: bool
+    """
+    session = TagSession(path)
+    session.cover = None
+    return session.save()
+
+
+class BatchSummary(NamedTuple):
+    """
+        Summary of a job run over many files
+    """
+    total: int
+    written: List[str]
+    failed: Dict[str, str]
+    cancelled: bool = False
+    skipped: int = 0  # files done by an earlier, interrupted run of the same job
+
+
+def read_album(path: str) -> Tuple[str, str]:
+    """
+        Reads only the album and album artist of the file, with the header-only scanner; other
+        frames (the album art in particular) are skipped without being read.
+
+    :param path: path of the MP3 file
+    :type path: str
+    :return: album and album artist, '' when missing
+    :rtype: tuple
+    """
+    tags = id3_scanner.scan_tags(path, ('album', 'albumartist'))
+    return tags['album'], tags['albumartist']
+
+
+def _apply_album_cover(path: str, album: str, album_artist: str, picture: APIC) -> bool:
+    if read_album(path) != (album, album_artist):
+        return False
+
+    session = TagSession(path)
+    session.cover = picture
+    return session.save()
+
+
+def apply_cover_to_album(paths: Iterable[str], album: str, album_artist: str, picture: APIC,
+                         workers: int = DEFAULT_IO_WORKERS,
+                         progress: Optional[Callable[[int, int], None]] = None,
+                         cancel: Optional[threading.Event] = None,
+                         journal: Optional[BatchJournal] = None) -> BatchSummary:
+    """
+        Embeds the album art in every file of `paths` whose album and album artist match.
+        Files are matched and written concurrently on a bounded thread pool; a file which can't be
+        read or written is reported in the summary instead of aborting the whole album.
+
+    :param paths: MP3 files to look at (usually every file of the album's directory)
+    :type paths: Iterable[str]
+    :param album: album whose album art has to be changed
+    :type album: str
+    :param album_artist: album artist whose album art has to be changed
+    :type album_artist: str
+    :param picture: the album art, read once for the whole album
+    :type picture: APIC
+    :param workers: number of worker threads
+    :type workers: int
+    :param progress: called with (files done, total files) after every file
+    :type progress: Callable[[int, int], None]
+    :param cancel: when set, files which weren't started yet are skipped
+    :type cancel: threading.Event
+    :param journal: checkpoints of the job, see :func:`_run_batch`
+    :type journal: BatchJournal
+    :return: summary of the written and failed files
+    :rtype: BatchSummary
+    """
+    if not album or not album_artist:
+        raise ValueError("Album and Album Artist are required")
+
+    paths = list(paths)
+    tracing.count('album_art.files', len(paths))
+
+    return _run_batch({path: partial(_apply_album_cover, path, album, album_artist, picture) for path in paths},
+                      workers, progress, cancel, journal)
+
+
+def save_many(edits: Mapping[str, Mapping[str, str]], workers: int = DEFAULT_IO_WORKERS,
+              progress: Optional[Callable[[int, int], None]] = None,
+              cancel: Optional[threading.Event] = None, journal: Optional[BatchJournal] = None) -> BatchSummary:
+    """
+        Writes different tags to many files, e.g. a column edited for the selected rows of the
+        track table. Files are written concurrently on a bounded thread pool, a file whose tags
+        already have the given values isn't written.
+
+    :param edits: path of every file -> tags to set on it (see :func:`save_tags`)
+    :type edits: Mapping[str, Mapping[str, str]]
+    :param workers: number of worker threads
+    :type workers: int
+    :param progress: called with (files done, total files) after every file
+    :type progress: Callable[[int, int], None]
+    :param cancel: when set, files which weren't started yet are skipped
+    :type cancel: threading.Event
+    :param journal: checkpoints of the job, see :func:`_run_batch`
+    :type journal: BatchJournal
+    :return: summary of the written and failed files
+    :rtype: BatchSummary
+    """
+    return _run_batch({path: partial(save_tags, path, tags) for path, tags in edits.items()},
+                      workers, progress, cancel, journal)
+
+
+def _run_batch(jobs: Mapping[str, Callable[[], bool]], workers: int,
+               progress: Optional[Callable[[int, int], None]],
+               cancel: Optional[threading.Event], journal: Optional[BatchJournal] = None) -> BatchSummary:
+    """
+        Runs a job per file on a thread pool, a job returns whether it wrote the file.
+
+        With a journal, the files an earlier run of the same job was done with are skipped (and
+        reported as done in one progress call before the others), every finished file is recorded,
+        and the journal is deleted when no file failed and the job wasn't cancelled. A cancelled
+        job lets the files being written finish, so no file is left half written.
+    """
+    written, failed = [], {}
+
+    skipped = 0
+    if journal is not None:
+        remaining = {path: job for path, job in jobs.items() if path not in journal}
+        skipped = len(jobs) - len(remaining)
+        if skipped and progress is not None:
+            progress(skipped, len(jobs))
+    else:
+        remaining = jobs
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(job): path for path, job in remaining.items()}
+
+        for done, future in enumerate(as_completed(futures), start=skipped + 1):
+            if cancel is not None and cancel.is_set():
+                for pending in futures:
+                    pending.cancel()
+
+            if future.cancelled():
+                continue
+
+            try:
+                if future.result():
+                    written.append(futures[future])
+                if journal is not None:
+                    journal.record(futures[future])
+
+            except Exception as error:  # pylint: disable=broad-except
+                failed[futures[future]] = f"{type(error).__name__}: {error}"
+
+            if progress is not None:
+                progress(done, len(jobs))
+
+    cancelled = cancel is not None and cancel.is_set()
+    if journal is not None:
+        if failed or cancelled:
+            journal.close()
+        else:
+            journal.discard()
+
+    return BatchSummary(len(jobs), sorted(written), failed, cancelled, skipped)
+
+
+def rename_template(naming_format: str) -> Optional[str]:
+    """
+        Resolves a rename option to its template.
+        Accepts either a key of `Constants.rename` or the template itself (as shown in the GUI)
+
+    :param naming_format: rename option
+    :type naming_format: str
+    :return: the template, or None for "Don't Rename"
+    :rtype: str
+    """
+    template = CONSTANTS.rename.get(naming_format, naming_format)
+    if template == CONSTANTS.rename['no-rename']:
+        return None
+
+    if template not in CONSTANTS.rename.values():
+        raise ValueError(f"Unknown rename format: {naming_format}")
+
+    return template
+
+
+def template_keys(template: str) -> Tuple[str, ...]:
+    """
+        Keys of the tags a rename template uses, e.g. ('artist', 'title')
+
+    :param template: template of `Constants.rename`
+    :type template: str
+    :return: the keys, in template order
+    :rtype: tuple
+    """
+    return tuple(name.lower() for _text, name, _spec, _conversion in string.Formatter().parse(template) if name)
+
+
+def missing_tags(template: str, tags: Mapping[str, str]) -> List[str]:
+    """
+        Tags the template uses which are empty: a file missing any of them isn't renamed, an
+        untagged file would become "-.mp3"
+
+    :param template: template of `Constants.rename`
+    :type template: str
+    :param tags: tags of the file
+    :type tags: Mapping[str, str]
+    :return: the keys of the empty tags, in template order
+    :rtype: list
+    """
+    return [key for key in template_keys(template) if not tags[key]]
+
+
+def renamed_path(path: str, template: str, tags: Mapping[str, str]) -> str:
+    """
+        Path the file gets when renamed with the template
+
+    :param path: current path of the MP3 file
+    :type path: str
+    :param template: template of `Constants.rename`
+    :type template: str
+    :param tags: tags of the file
+    :type tags: Mapping[str, str]
+    :return: the new path, in the same directory
+    :rtype: str
+    """
+    file_name = template.format(Artist=tags['artist'], AlbumArtist=tags['albumartist'],
+                                Album=tags['album'], Title=tags['title'])
+    return os.path.join(os.path.dirname(path), sanitize_file_name(f"{file_name}.mp3"))
+
+
+def sanitize_file_name(file_name: str) -> str:
+    """
+        Makes a file name built from tags safe to use: illegal characters are replaced by '_',
+        leading/trailing spaces and dots are dropped and the name is shortened to NAME_MAX bytes,
+        keeping its extension
+
+    :param file_name: file name, without directory
+    :type file_name: str
+    :return: the sanitized file name
+    :rtype: str
+    """
+    stem, extension = os.path.splitext(file_name)
+    stem = ILLEGAL_CHARACTERS.sub('_', stem).strip(' .') or '_'
+
+    limit = NAME_MAX - len(extension.encode())
+    while len(stem.encode()) > limit:
+        stem = stem[:-1]
+
+    return f"{stem.rstrip(' .') or '_'}{extension}"
+
+
+def rename_file(path: str, naming_format: str, tags: Optional[Mapping[str, str]] = None) -> str:
+    """
+        Renames the file according to the rename option, using its tags.
+        Never overwrites an existing file.
+
+    :param path: path of the MP3 file
+    :type path: str
+    :param naming_format: key or template of `Constants.rename`
+    :type naming_format: str
+    :param tags: tags of the file, read from the file when not given
+    :type tags: Mapping[str, str]
+    :return: the new path of the file
+    :rtype: str
+    :raises FileExistsError: another file already has the new name
+    :raises ValueError: a tag the template uses is empty, see :func:`missing_tags`
+    """
+    template = rename_template(naming_format)
+    if template is None:
+        return path
+
+    tags = tags if tags is not None else read_tags(path)
+    missing = missing_tags(template, tags)
+    if missing:
+        raise ValueError(f"missing {'/'.join(missing)}")
+
+    new_path = renamed_path(path, template, tags)
+
+    if os.path.exists(new_path) and not os.path.samefile(path, new_path):
+        raise FileExistsError(f"{new_path} already exists")
+
+    os.rename(path, new_path)
+    return new_path
+
+
+def iter_mp3_files(paths: Iterable[str], recursive: bool = True) -> Iterator[str]:
+    """
+        Expands the given files and directories to MP3 files
+
+    :param paths: files or directories
+    :type paths: Iterable[str]
+    :param recursive: walk directory trees instead of only the top directory
+    :type recursive: bool
+    :yield: path of every MP3 file
+    :rtype: Iterator[str]
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+
+        for directory, sub_directories, file_names in os.walk(path):
+            sub_directories.sort()
+            for file_name in sorted(file_names):
+                if file_name.lower().endswith('.mp3'):
+                    yield os.path.join(directory, file_name)
+
+            if not recursive:
+                break
+
+
+def _run_job(job: Callable[[str], object], path: str) -> JobResult:
+    try:
+        return JobResult(path, True, job(path))
+
+    except Exception as error:  # pylint: disable=broad-except
+        return JobResult(path, False, error=f"{type(error).__name__}: {error}")
+
+
+def process_tree(paths: Iterable[str], job: Callable[[str], object], workers: Optional[int] = None,
+                 recursive: bool = True, chunk_size: int = 64,
+                 executor: Optional[Executor] = None) -> Iterator[JobResult]:
+    """
+        Runs `job` on every MP3 file below `paths` on a process pool.
+        Failures are reported in the results instead of aborting the run.
+
+    :param paths: files or directories
+    :type paths: Iterable[str]
+    :param job: picklable callable (module level function or functools.partial) taking the file path
+    :type job: Callable[[str], object]
+    :param workers: number of worker processes, all cores when None, in-process when 1
+    :type workers: int
+    :param recursive: walk directory trees instead of only the top directory
+    :type recursive: bool
+    :param chunk_size: number of files submitted to the pool at once per worker
+    :type chunk_size: int
+    :param executor: pool to run the jobs on, kept open by the caller across runs; a pool of
+                     `workers` processes is started for the run when not given
+    :type executor: Executor
+    :yield: result of every file, in completion order
+    :rtype: Iterator[JobResult]
+    """
+    jobs = ((path, job) for path in iter_mp3_files(paths, recursive))
+    return process_jobs(jobs, workers, chunk_size, executor)
+
+
+def process_jobs(jobs: Iterable[Tuple[str, Callable[[str], object]]], workers: Optional[int] = None,
+                 chunk_size: int = 64, executor: Optional[Executor] = None) -> Iterator[JobResult]:
+    """
+        Like :func:`process_tree`, for jobs which differ from file to file (e.g. a sidecar file
+        paired with every track). Jobs are consumed lazily, as the pool frees up.
+
+    :param jobs: (path of the MP3 file, picklable job taking the path) pairs
+    :type jobs: Iterable[Tuple[str, Callable[[str], object]]]
+    :param workers: number of worker processes, all cores when None, in-process when 1
+    :type workers: int
+    :param chunk_size: number of files submitted to the pool at once per worker
+    :type chunk_size: int
+    :param executor: pool to run the jobs on, see :func:`process_tree`
+    :type executor: Executor
+    :yield: result of every file, in completion order
+    :rtype: Iterator[JobResult]
+    """
+    workers = workers or os.cpu_count() or 1
+
+    if executor is not None:
+        yield from _run_on(executor, jobs, workers * chunk_size)
+        return
+
+    if workers == 1:
+        for path, job in jobs:
+            yield _run_job(job, path)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_ignore_interrupt) as pool:
+        try:
+            yield from _run_on(pool, jobs, workers * chunk_size)
+        except BaseException:
+            # Ctrl+C, or the caller stopped reading: the files being written are finished, the
+            # queued ones dropped, so no file is left half written
+            pool.shutdown(cancel_futures=True)
+            raise
+
+
+def _ignore_interrupt() -> None:
+    # Ctrl+C reaches the whole process group, only the main process handles it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _run_on(pool: Executor, jobs: Iterable[Tuple[str, Callable[[str], object]]], limit: int) -> Iterator[JobResult]:
+    # bounded submission, so that a library of 200k tracks isn't queued at once
+    pending = set()
+    for path, job in jobs:
+        pending.add(pool.submit(_run_job, job, path))
+
+        if len(pending) >= limit:
+            done = next(as_completed(pending))
+            pending.remove(done)
+            yield done.result()
+
+    for future in as_completed(pending):
+        yield future.result()
@@ -0,0 +1,240 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Export of the editor tags of a whole tree to CSV or JSON Lines, to be edited in a spreadsheet,
+    and import of the edited file back into the tracks.
+
+    Both directions stream: export writes every row as soon as its file is scanned (in the order
+    of the walk, with at most a pool's worth of rows held back), import reads one row at a time
+    and hands it to the process pool. The import compares every row with the current tags of the
+    file (read by the header-only scanner) and only writes the files where something differs; a
+    dry run reports those differences without writing anything.
+"""
+
+import csv
+import json
+import os
+from collections import deque
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, Mapping, NamedTuple, Optional, TextIO, Tuple
+
+import id3_scanner
+import tag_engine
+
+FORMAT_CSV = 'csv'
+FORMAT_JSONL = 'jsonl'
+FORMATS = (FORMAT_CSV, FORMAT_JSONL)
+
+# columns of an exported file
+FIELDS = ('path',) + tag_engine.TAG_KEYS
+
+
+class ApplySummary(NamedTuple):
+    """
+        Outcome of :func:`import_rows`
+    """
+    changed: int  # files written, or to be written in a dry run
+    unchanged: int
+    failed: Dict[str, str]  # path (or row number) -> error
+
+
+def format_of(path: str) -> str:
+    """
+        Format of an export file from its extension, JSON Lines for .jsonl/.json/.ndjson, else CSV
+
+    :param path: path of the file
+    :type path: str
+    :return: FORMAT_CSV or FORMAT_JSONL
+    :rtype: str
+    """
+    extension = os.path.splitext(path)[1].lower()
+    return FORMAT_JSONL if extension in ('.jsonl', '.json', '.ndjson') else FORMAT_CSV
+
+
+def _in_order(results: Iterable[tag_engine.JobResult], submitted: deque) -> Iterator[tag_engine.JobResult]:
+    """
+        Yields the results in the order their paths were submitted, the pool completes them out of order.
+        Only the results finished ahead of a slower one are held back.
+    """
+    done = {}
+    for result in results:
+        done[result.path] = result
+        while submitted and submitted[0] in done:
+            yield done.pop(submitted.popleft())
+
+
+def _queued(paths: Iterable[str], submitted: deque) -> Iterator[str]:
+    for path in paths:
+        submitted.append(path)
+        yield path
+
+
+def export_tags(paths: Iterable[str], output: TextIO, file_format: str = FORMAT_CSV,
+                workers: Optional[int] = None, recursive: bool = True,
+                on_error: Optional[Callable[[str, str], None]] = None) -> int:
+    """
+        Writes the tags of every MP3 file below `paths` to `output`, one row per file
+
+    :param paths: files or directories
+    :type paths: Iterable[str]
+    :param output: text file to write to, opened with newline='' for CSV
+    :type output: TextIO
+    :param file_format: FORMAT_CSV or FORMAT_JSONL
+    :type file_format: str
+    :param workers: number of worker processes, all cores when None, in-process when 1
+    :type workers: int
+    :param recursive: walk directory trees instead of only the top directory
+    :type recursive: bool
+    :param on_error: called with (path, error) for every file which couldn't be read
+    :type on_error: Callable[[str, str], None]
+    :return: number of rows written
+    :rtype: int
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown format: {file_format}, expected one of {', '.join(FORMATS)}")
+
+    if file_format == FORMAT_CSV:
+        writer = csv.DictWriter(output, FIELDS)
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(row: Mapping[str, str]) -> None:
+            output.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    submitted = deque()
+    paths = _queued(tag_engine.iter_mp3_files(paths, recursive), submitted)
+    results = tag_engine.process_jobs(((path, id3_scanner.scan_tags) for path in paths), workers)
+
+    rows = 0
+    for result in _in_order(results, submitted):
+        if not result.ok:
+            if on_error is not None:
+                on_error(result.path, result.error)
+            continue
+
+        write({'path': result.path, **result.value})
+        rows += 1
+
+    return rows
+
+
+def read_rows(source: TextIO, file_format: str = FORMAT_CSV) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """
+        Reads the rows of an exported (and edited) file, one at a time.
+        Columns which aren't in the file are left untouched by the import; an empty cell removes
+        the tag, like in the editor.
+
+    :param source: text file to read, opened with newline='' for CSV
+    :type source: TextIO
+    :param file_format: FORMAT_CSV or FORMAT_JSONL
+    :type file_format: str
+    :yield: (line number, row with 'path' and the tags to set)
+    :rtype: Iterator[Tuple[int, Dict[str, str]]]
+    """
+    if file_format == FORMAT_CSV:
+        reader = csv.DictReader(source)
+        unknown = set(reader.fieldnames or ()) - set(FIELDS)
+        if 'path' not in (reader.fieldnames or ()) or unknown:
+            raise ValueError(f"Expected a 'path' column and columns among {', '.join(FIELDS[1:])}"
+                             + (f", got {', '.join(sorted(unknown))}" if unknown else ''))
+
+        for row in reader:
+            # the header is line 1, a row spans several lines when a cell holds lyrics
+            yield reader.line_num, {key: value or '' for key, value in row.items()}
+        return
+
+    for line_number, line in enumerate(source, start=1):
+        if line.strip():
+            row = json.loads(line)
+            unknown = set(row) - set(FIELDS)
+            if unknown or 'path' not in row:
+                raise ValueError(f"line {line_number}: expected 'path' and keys among {', '.join(FIELDS[1:])}")
+            yield line_number, {key: value if value is not None else '' for key, value in row.items()}
+
+
+def tag_changes(path: str, tags: Mapping[str, str]) -> Dict[str, Tuple[str, str]]:
+    """
+        Differences between the tags of the file and the given values
+
+    :param path: path of the MP3 file
+    :type path: str
+    :param tags: mapping of :class:`Constants` keys to their wanted value
+    :type tags: Mapping[str, str]
+    :return: key -> (current value, wanted value), for the keys which differ
+    :rtype: dict
+    """
+    current = id3_scanner.scan_tags(path, tags)
+    changes = {}
+    for key, value in tags.items():
+        # the lyrics are stored stripped, see TagSession.__setitem__
+        value = value.strip() if key == 'lyrics' else value
+        if current[key] != value:
+            changes[key] = (current[key], value)
+
+    return changes
+
+
+def apply_row(path: str, tags: Mapping[str, str], dry_run: bool = False) -> Dict[str, Tuple[str, str]]:
+    """
+        Writes the tags of an imported row to the file, if any of them differs
+
+    :param path: path of the MP3 file
+    :type path: str
+    :param tags: mapping of :class:`Constants` keys to their new value
+    :type tags: Mapping[str, str]
+    :param dry_run: only compare, never write
+    :type dry_run: bool
+    :return: the changes (see :func:`tag_changes`), empty when the file is already up to date
+    :rtype: dict
+    """
+    changes = tag_changes(path, tags)
+    if dry_run or not changes:
+        return changes
+
+    # the session compares again with the fully parsed tag, e.g. numeric genres
+    written = tag_engine.save_tags(path, {key: new for key, (_old, new) in changes.items()})
+    return changes if written else {}
+
+
+def import_rows(rows: Iterable[Tuple[int, Mapping[str, str]]], dry_run: bool = False,
+                workers: Optional[int] = None,
+                on_result: Optional[Callable[[tag_engine.JobResult], None]] = None) -> ApplySummary:
+    """
+        Applies the rows (see :func:`read_rows`) to their files on a process pool. The changed
+        files are only reported to `on_result`, nothing per file is kept.
+
+    :param rows: (line number, row) pairs
+    :type rows: Iterable[Tuple[int, Mapping[str, str]]]
+    :param dry_run: only report the differences, never write
+    :type dry_run: bool
+    :param workers: number of worker processes, all cores when None, in-process when 1
+    :type workers: int
+    :param on_result: called with the result of every row, its value are the changes
+    :type on_result: Callable
+    :return: the number of changed and already up to date files, and the failures
+    :rtype: ApplySummary
+    """
+    changed, unchanged, failed = 0, 0, {}
+
+    def _jobs() -> Iterator[Tuple[str, Callable[[str], object]]]:
+        for line_number, row in rows:
+            tags = {key: value for key, value in row.items() if key != 'path'}
+            if not row['path']:
+                failed[f"line {line_number}"] = "no path"
+                continue
+            yield row['path'], partial(apply_row, tags=tags, dry_run=dry_run)
+
+    for result in tag_engine.process_jobs(_jobs(), workers):
+        if not result.ok:
+            failed[result.path] = result.error
+        elif result.value:
+            changed += 1
+        else:
+            unchanged += 1
+
+        if on_result is not None:
+            on_result(result)
+
+    return ApplySummary(changed, unchanged, failed)
@@ -0,0 +1,622 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Long running tag service: a JSON-RPC 2.0 API over a Unix socket (or a localhost port), so
+    that scripts don't pay the start up of Python, mutagen and the library index for every call.
+
+    The service keeps the library index open and the tags of recently read files in memory
+    (checked against the size and mtime of the file on every read). Messages are one JSON
+    document per line; a line holding an array is a batch, answered with an array. A client can
+    send many lines without waiting for the answers (pipelining): every request runs on a worker
+    thread as soon as it is read, and its response is written when it is done, so responses come
+    back in completion order and are matched by their id.
+
+    Methods (parameters by name; `paths` are files or directories):
+        ping()                                          -> "pong"
+        read_tags(paths)                                -> {"tags": {path: tags}, "failed": {path: error}}
+        save_tags(edits: {path: {key: value}})          -> {"written": [path], "failed": {...}}
+        apply_cover(paths, image, normalize=false)      -> {"written": [path], "failed": {...}}
+        remove_cover(paths)                             -> {"written": [path], "failed": {...}}
+        rename(paths, format, dry_run=false)            -> {"moves": {old: new}, "conflicts": {...}, ...}
+        index(paths)                                    -> {"added": n, "updated": n, ...}
+        search(text, limit=100)                         -> [path]
+
+    Started with `python py_main.py --serve` (Kivy isn't imported), e.g.
+        python py_main.py --serve --socket /tmp/pymtag.sock
+        echo '{"jsonrpc": "2.0", "id": 1, "method": "read_tags", "params": {"paths": ["a.mp3"]}}' \\
+            | socat - UNIX-CONNECT:/tmp/pymtag.sock
+
+    The Unix socket is only accessible by the user. A localhost port is open to every local user,
+    so on a port the first line of every connection must be the token the service writes to its
+    token file (readable by the user only) when it starts; other connections are refused.
+"""
+
+import argparse
+import hmac
+import inspect
+import json
+import os
+import secrets
+import signal
+import socket
+import socketserver
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import artwork
+import id3_scanner
+import rename_engine
+import tag_engine
+import tracing
+from library_index import DEFAULT_DATABASE, LibraryIndex
+from search_index import SearchIndex
+
+DEFAULT_SOCKET = os.path.join(os.environ.get('XDG_RUNTIME_DIR') or os.path.dirname(DEFAULT_DATABASE), 'pymtag.sock')
+DEFAULT_TOKEN_FILE = os.path.join(os.path.dirname(DEFAULT_SOCKET), 'pymtag.token')
+
+# tags of this many files are kept in memory
+CACHE_SIZE = 100000
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+UNAUTHORIZED = -32001
+
+
+class RpcError(Exception):
+    """
+        Error returned to the client instead of a result
+    """
+
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class TagCache:
+    """
+        Tags of the most recently used files, valid as long as their size and mtime don't change
+    """
+
+    def __init__(self, size: int = CACHE_SIZE) -> None:
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Tuple[int, int, Dict[str, str]]]' = OrderedDict()
+
+    def __repr__(self) -> str:
+        return f"TagCache({len(self._entries)}/{self.size})"
+
+    def get(self, path: str) -> Dict[str, str]:
+        """
+            Tags of the file, read with the header-only scanner unless they are cached
+
+        :param path: path of the MP3 file
+        :type path: str
+        :return: mapping of every key of :class:`Constants` to its value
+        :rtype: dict
+        """
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+                self._entries.move_to_end(path)
+                return dict(entry[2])
+
+        tags = id3_scanner.scan_tags(path)
+        with self._lock:
+            self._entries[path] = (stat.st_size, stat.st_mtime_ns, tags)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+        return dict(tags)
+
+    def forget(self, paths: Iterable[str]) -> None:
+        """
+            Drops files from the cache, e.g. renamed ones
+        """
+        with self._lock:
+            for path in paths:
+                self._entries.pop(path, None)
+
+
+class TagService:
+    """
+        The methods of the API, run on a pool of worker threads
+    """
+
+    def __init__(self, library: LibraryIndex, workers: int = tag_engine.DEFAULT_IO_WORKERS) -> None:
+        """
+
+        :param library: library index, kept open while the service runs
+        :type library: LibraryIndex
+        :param workers: number of threads working on files
+        :type workers: int
+        """
+        self.library = library
+        self.cache = TagCache()
+        # requests wait for their files, files never wait: two pools, so they can't deadlock
+        self.requests = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='request')
+        self.files = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='file')
+        self._search_index: Optional[SearchIndex] = None
+        self._search_lock = threading.Lock()
+
+        self.methods: Dict[str, Callable[..., object]] = {
+            'ping': lambda: 'pong', 'read_tags': self.read_tags, 'save_tags': self.save_tags,
+            'apply_cover': self.apply_cover, 'remove_cover': self.remove_cover, 'rename': self.rename,
+            'index': self.index, 'search': self.search,
+        }
+
+    def __repr__(self) -> str:
+        return f"TagService({self.library!r})"
+
+    def close(self) -> None:
+        """
+            Waits for the running requests and stops the pools
+        """
+        self.requests.shutdown()
+        self.files.shutdown()
+
+    # --- protocol --- #
+
+    def handle_line(self, line: bytes) -> Optional[bytes]:
+        """
+            Answers a line read from a client
+
+        :param line: a request or a batch, as JSON
+        :type line: bytes
+        :return: the response line, None when there is nothing to answer (notifications only)
+        :rtype: bytes
+        """
+        try:
+            message = json.loads(line)
+        except ValueError as error:
+            response = _error(None, PARSE_ERROR, f"Parse error: {error}")
+        else:
+            if isinstance(message, list):
+                # the requests of a batch run one after the other, each spreads its files on the pool
+                responses = [response for response in map(self.handle, message) if response is not None]
+                response = (responses or None) if message else _error(None, INVALID_REQUEST, "Empty batch")
+            else:
+                response = self.handle(message)
+
+        return None if response is None else json.dumps(response, ensure_ascii=False).encode() + b'\n'
+
+    def handle(self, request: object) -> Optional[dict]:
+        """
+            Runs a single request
+
+        :param request: the decoded JSON-RPC request
+        :type request: object
+        :return: the response, None for a notification (a request without id)
+        :rtype: dict
+        """
+        if not isinstance(request, dict) or request.get('jsonrpc') != '2.0' or \
+                not isinstance(request.get('method'), str):
+            return _error(request.get('id') if isinstance(request, dict) else None, INVALID_REQUEST,
+                          "Invalid request")
+
+        request_id = request.get('id')
+        method = self.methods.get(request['method'])
+        params = request.get('params', {})
+
+        try:
+            if method is None:
+                raise RpcError(METHOD_NOT_FOUND, f"Method not found: {request['method']}")
+            if not isinstance(params, dict):
+                raise RpcError(INVALID_PARAMS, "params must be an object")
+
+            try:
+                inspect.signature(method).bind(**params)
+            except TypeError as error:
+                raise RpcError(INVALID_PARAMS, str(error)) from error
+
+            with tracing.span(f"service.{request['method']}"):
+                result = method(**params)
+
+        except RpcError as error:
+            response = _error(request_id, error.code, error.message)
+        except Exception as error:  # pylint: disable=broad-except
+            response = _error(request_id, SERVER_ERROR, f"{type(error).__name__}: {error}")
+        else:
+            response = {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+        return response if 'id' in request else None
+
+    # --- methods --- #
+
+    def _map(self, paths: Iterable[str], job: Callable[[str], object]) -> Tuple[Dict[str, object], Dict[str, str]]:
+        """
+            Runs `job` on every MP3 file of `paths` (files or directories) on the file pool
+        """
+        futures: Dict[Future, str] = {self.files.submit(job, path): path
+                                      for path in tag_engine.iter_mp3_files(map(os.path.abspath, paths))}
+        results, failed = {}, {}
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as error:  # pylint: disable=broad-except
+                failed[futures[future]] = f"{type(error).__name__}: {error}"
+
+        return results, failed
+
+    def _saved(self, written: Iterable[str]) -> None:
+        """
+            Brings the library index and the search index up to date with written files
+        """
+        for path in written:
+            tags = self.cache.get(path)
+            self.library.update(path, tags)
+            with self._search_lock:
+                if self._search_index is not None:
+                    self._search_index.update(path, tags)
+
+    def _write(self, paths: Iterable[str], job: Callable[[str], bool]) -> dict:
+        results, failed = self._map(paths, job)
+        written = sorted(path for path, changed in results.items() if changed)
+        self._saved(written)
+        return {'written': written, 'failed': failed}
+
+    def read_tags(self, paths: List[str]) -> dict:
+        """
+            Tags of every file
+        """
+        tags, failed = self._map(_paths(paths), self.cache.get)
+        return {'tags': tags, 'failed': failed}
+
+    def save_tags(self, edits: Mapping[str, Mapping[str, str]]) -> dict:
+        """
+            Writes the given tags to every file, files already having them aren't written
+        """
+        if not isinstance(edits, dict):
+            raise RpcError(INVALID_PARAMS, "edits must be an object of path -> tags")
+
+        edits = {os.path.abspath(path): tags for path, tags in edits.items()}
+        return self._write(list(edits), lambda path: tag_engine.save_tags(path, edits[path]))
+
+    def apply_cover(self, paths: List[str], image: str, normalize: bool = False) -> dict:
+        """
+            Embeds the image in every file, the image is read and prepared once
+        """
+        try:
+            cover = artwork.load(image, artwork.DEFAULT_OPTIONS if normalize else None)
+        except (OSError, ValueError) as error:
+            raise RpcError(INVALID_PARAMS, f"image: {error}") from error
+
+        return self._write(_paths(paths), lambda path: tag_engine.apply_cover(path, cover))
+
+    def remove_cover(self, paths: List[str]) -> dict:
+        """
+            Removes the album art of every file
+        """
+        return self._write(_paths(paths), tag_engine.remove_cover)
+
+    # pylint: disable=redefined-builtin
+    def rename(self, paths: List[str], format: str, dry_run: bool = False) -> dict:
+        """
+            Renames every file from its tags, see rename_engine
+        """
+        tags, failed = self._map(_paths(paths), self.cache.get)
+        try:
+            plan = rename_engine.plan_renames(({'path': path, **values} for path, values in tags.items()), format)
+        except ValueError as error:
+            raise RpcError(INVALID_PARAMS, str(error)) from error
+
+        result = {'moves': plan.moves, 'conflicts': plan.conflicts, 'failed': failed}
+        if dry_run:
+            return result
+
+        summary = rename_engine.execute_plan(plan, library=self.library)
+        self.cache.forget(plan.moves)
+        with self._search_lock:
+            if self._search_index is not None:
+                for old_path, new_path in plan.moves.items():
+                    if old_path not in summary.failed:
+                        self._search_index.rename(old_path, new_path)
+
+        result['failed'].update(summary.failed)
+        result.update(renamed=summary.renamed, journal=summary.journal)
+        return result
+
+    def index(self, paths: List[str]) -> dict:
+        """
+            Refreshes the library index with the directories, parsing in this process: forking a
+            pool from the threads of the service could copy a lock another thread holds
+        """
+        summary = self.library.refresh(_paths(paths), workers=1)
+        if summary.added or summary.updated or summary.removed:
+            with self._search_lock:
+                self._search_index = None  # built again on the next search
+
+        return summary._asdict()
+
+    def search(self, text: str, limit: Optional[int] = 100) -> List[str]:
+        """
+            Indexed files matching the words of `text`, see search_index
+        """
+        with self._search_lock:
+            if self._search_index is None:
+                self._search_index = SearchIndex(self.library.records())
+            search_index = self._search_index
+
+        return search_index.search(text, limit)
+
+
+def _paths(paths: object) -> List[str]:
+    if isinstance(paths, str) or not isinstance(paths, list) or not all(isinstance(path, str) for path in paths):
+        raise RpcError(INVALID_PARAMS, "paths must be an array of strings")
+
+    return paths
+
+
+def _error(request_id: object, code: int, message: str) -> dict:
+    return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+
+class _Connection(socketserver.StreamRequestHandler):
+    """
+        A client connection: every line read is handed to the request pool right away
+    """
+
+    server: '_Server'
+
+    def handle(self) -> None:
+        token = self.server.token
+        if token is not None and not hmac.compare_digest(self.rfile.readline().strip(), token.encode()):
+            self.wfile.write(json.dumps(_error(None, UNAUTHORIZED, "Invalid token")).encode() + b'\n')
+            return
+
+        service = self.server.service
+        lock = threading.Lock()
+        pending = []
+
+        def _respond(future: Future) -> None:
+            response = future.result()
+            if response is not None:
+                with lock:
+                    try:
+                        self.wfile.write(response)
+                        self.wfile.flush()
+                    except OSError:
+                        pass  # the client went away
+
+        for line in self.rfile:
+            if line.strip():
+                future = service.requests.submit(service.handle_line, line)
+                future.add_done_callback(_respond)
+                pending.append(future)
+                pending = [future for future in pending if not future.done()]
+
+        # the client closed its end, the responses still running are sent before hanging up
+        for future in pending:
+            future.exception()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.BaseServer):
+    daemon_threads = True
+    service: TagService
+    token: Optional[str] = None  # first line of every connection, None for the Unix socket
+
+
+def write_token(path: str = DEFAULT_TOKEN_FILE) -> str:
+    """
+        Writes a new random token to the file, readable by the user only
+
+    :param path: path of the token file
+    :type path: str
+    :return: the token
+    :rtype: str
+    """
+    token = secrets.token_urlsafe(32)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    # not following a symlink planted in place of the file
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+    with os.fdopen(fd, 'w') as token_file:
+        os.fchmod(token_file.fileno(), 0o600)  # an existing file keeps its mode otherwise
+        token_file.write(token + '\n')
+
+    return token
+
+
+def read_token(path: str = DEFAULT_TOKEN_FILE) -> str:
+    """
+        Token written by :func:`write_token`
+    """
+    with open(path) as token_file:
+        return token_file.read().strip()
+
+
+def serve(service: TagService, socket_path: Optional[str] = DEFAULT_SOCKET,
+          port: Optional[int] = None, token: Optional[str] = None) -> socketserver.BaseServer:
+    """
+        Creates the server of the service, listening on a Unix socket or on localhost.
+        `serve_forever()` runs it.
+
+    :param service: the service
+    :type service: TagService
+    :param socket_path: path of the Unix socket, readable by the user only
+    :type socket_path: str
+    :param port: TCP port on 127.0.0.1 to listen on instead
+    :type port: int
+    :param token: with `port`, the first line clients must send, see :func:`write_token`
+    :type token: str
+    :return: the server
+    :rtype: socketserver.BaseServer
+    """
+    if port is not None:
+        if not token:
+            raise ValueError("A token is needed to listen on a port, any local user can connect to it")
+
+        server_class = type('_TcpServer', (_Server, socketserver.TCPServer), {'allow_reuse_address': True})
+        server = server_class(('127.0.0.1', port), _Connection)
+        server.token = token
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+        _remove_stale_socket(socket_path)
+
+        server_class = type('_UnixServer', (_Server, socketserver.UnixStreamServer), {})
+        umask = os.umask(0o177)
+        try:
+            server = server_class(socket_path, _Connection)
+        finally:
+            os.umask(umask)
+
+    server.service = service
+    return server
+
+
+def _remove_stale_socket(socket_path: str) -> None:
+    if not os.path.exists(socket_path):
+        return
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+        except OSError:
+            os.unlink(socket_path)  # left by a service which didn't stop cleanly
+        else:
+            raise OSError(f"A service is already listening on {socket_path}")
+
+
+class ServiceClient:
+    """
+        Minimal client of the service, e.g. for scripts:
+
+            with ServiceClient() as client:
+                tags = client.call('read_tags', paths=['/music/a.mp3'])
+                results = client.pipeline([('read_tags', {'paths': [path]}) for path in paths])
+
+        On a port, the token of the service is read from `token_file` and sent first.
+    """
+
+    def __init__(self, socket_path: Optional[str] = DEFAULT_SOCKET, port: Optional[int] = None,
+                 token_file: str = DEFAULT_TOKEN_FILE) -> None:
+        if port is not None:
+            token = read_token(token_file)
+            self._socket = socket.create_connection(('127.0.0.1', port))
+            self._socket.sendall(token.encode() + b'\n')
+        else:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.connect(socket_path)
+
+        self._reader = self._socket.makefile('rb')
+        self._next_id = 0
+
+    def __repr__(self) -> str:
+        return f"ServiceClient({self._socket.getpeername()!r})"
+
+    def __enter__(self) -> 'ServiceClient':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+            Closes the connection
+        """
+        self._reader.close()
+        self._socket.close()
+
+    def call(self, method: str, **params) -> object:
+        """
+            Calls a method and waits for its result
+
+        :param method: name of the method
+        :type method: str
+        :return: the result
+        :rtype: object
+        :raises RpcError: when the service returned an error
+        """
+        return self.pipeline([(method, params)])[0]
+
+    def pipeline(self, calls: Iterable[Tuple[str, Mapping[str, object]]]) -> List[object]:
+        """
+            Sends all the calls at once, then collects their results
+
+        :param calls: (method, params) of every call
+        :type calls: Iterable[Tuple[str, Mapping[str, object]]]
+        :return: the results, in the order of the calls
+        :rtype: list
+        :raises RpcError: when the service returned an error for any call
+        """
+        ids = []
+        for method, params in calls:
+            self._next_id += 1
+            ids.append(self._next_id)
+            request = {'jsonrpc': '2.0', 'id': self._next_id, 'method': method, 'params': dict(params)}
+            self._socket.sendall(json.dumps(request).encode() + b'\n')
+
+        responses = {}
+        while len(responses) < len(ids):
+            line = self._reader.readline()
+            if not line:
+                raise ConnectionError("The service closed the connection")
+            response = json.loads(line)
+            responses[response['id']] = response
+
+        results = []
+        for request_id in ids:
+            response = responses[request_id]
+            if 'error' in response:
+                raise RpcError(response['error']['code'], response['error']['message'])
+            results.append(response['result'])
+
+        return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+        Runs the service until interrupted (Ctrl+C or SIGTERM)
+
+    :param argv: command line arguments
+    :type argv: list
+    :return: exit status
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(prog='py_main.py --serve', description='PyMTag - tag service')
+    parser.add_argument('--serve', action='store_true', help='run the tag service instead of the GUI')
+    listen = parser.add_mutually_exclusive_group()
+    listen.add_argument('--socket', default=DEFAULT_SOCKET, help='Unix socket to listen on (default: %(default)s)')
+    listen.add_argument('--port', type=int,
+                        help='listen on this port of 127.0.0.1 instead of a Unix socket; any local user can '
+                             'connect to it, so clients must first send the token of --token-file')
+    parser.add_argument('--token-file', default=DEFAULT_TOKEN_FILE,
+                        help='with --port, a new token is written to this file, readable by the user only '
+                             '(default: %(default)s)')
+    parser.add_argument('-j', '--workers', type=int, default=tag_engine.DEFAULT_IO_WORKERS,
+                        help='number of worker threads (default: %(default)s)')
+    parser.add_argument('--database', default=DEFAULT_DATABASE, help='library index database')
+    args = parser.parse_args(argv)
+
+    def _terminate(*_) -> None:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)  # a second signal doesn't interrupt the clean up
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, _terminate)
+
+    with LibraryIndex(args.database) as library:
+        service = TagService(library, args.workers)
+        token = write_token(args.token_file) if args.port is not None else None
+        server = serve(service, args.socket, args.port, token)
+        print(f"Listening on {f'127.0.0.1:{args.port}' if args.port is not None else args.socket}", flush=True)
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            service.close()
+            os.unlink(args.socket if args.port is None else args.token_file)
+
+    return 0
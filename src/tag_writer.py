@@ -0,0 +1,324 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Crash safe, bounded memory writing of ID3v2 tags.
+
+    When the new tag fits in the space of the old one (its frames and padding), only the tag is
+    overwritten in place. Otherwise the file is rewritten: the new tag followed by the audio is
+    streamed into a temporary file in the same directory, in chunks of COPY_CHUNK bytes (or with
+    copy_file_range where the kernel offers it), flushed to disk and renamed over the original.
+    Memory use doesn't depend on the size of the file, and a crash leaves either the old or the
+    new file, never a truncated one.
+
+    How much padding is left after the tag decides whether the next edit can be done in place;
+    it is chosen by a :class:`PaddingPolicy`, configurable with the PYMTAG_PADDING environment
+    variable, e.g. PYMTAG_PADDING=headroom=65536,growth=1.5,cap=4194304
+
+    The streaming rewrite uses internals of mutagen (ID3._prepare_data and the ID3v1 helpers),
+    checked against the versions allowed by requirements.txt. With a mutagen which no longer has
+    them, tags are written with mutagen's own save(), same padding policy, but a tag which grows
+    is then resized in the file itself instead of through a temporary file.
+"""
+
+import os
+import stat
+import tempfile
+from typing import BinaryIO, Callable, NamedTuple, Optional
+
+from mutagen import PaddingInfo
+from mutagen.id3 import ID3, ID3NoHeaderError
+
+import id3_scanner
+
+try:
+    # noinspection PyProtectedMember
+    from mutagen.id3._id3v1 import MakeID3v1, find_id3v1
+except ImportError:
+    MakeID3v1 = find_id3v1 = None
+
+# whether the mutagen internals the streaming rewrite needs are there
+STREAMING = find_id3v1 is not None and hasattr(ID3, '_prepare_data')
+
+COPY_CHUNK = 1024 * 1024
+
+
+class PaddingPolicy(NamedTuple):
+    """
+        Padding left after the tag.
+
+        A tag which still fits in its space keeps its padding. When it has to grow, it gets
+        (growth - 1) times its size as padding, at least `headroom` and at most `cap` bytes, so
+        the space grows geometrically with the tag (a tag with a 500 KiB cover gets more room
+        than a few text frames). A tag with more than `cap` bytes of padding is shrunk, by a
+        rewrite of the file, on its next write or by :func:`repad`.
+    """
+    headroom: int = 16 * 1024
+    growth: float = 1.25
+    cap: int = 1024 * 1024
+
+    @classmethod
+    def from_environment(cls, variable: str = 'PYMTAG_PADDING') -> 'PaddingPolicy':
+        """
+            Policy from an environment variable of comma separated name=value pairs, fields
+            which aren't given keep their default
+
+        :param variable: name of the variable
+        :type variable: str
+        :return: the policy
+        :rtype: PaddingPolicy
+        """
+        values = {}
+        for setting in filter(None, os.environ.get(variable, '').split(',')):
+            name, _, value = setting.partition('=')
+            name = name.strip()
+            if name not in cls._fields:
+                raise ValueError(f"{variable}: unknown setting {name!r}, expected one of {', '.join(cls._fields)}")
+            values[name] = float(value) if name == 'growth' else int(value)
+
+        return cls(**values)
+
+    def target(self, needed: int) -> int:
+        """
+            Padding given to a tag of `needed` bytes when it is (re)written
+
+        :param needed: size of the header and frames
+        :type needed: int
+        :return: padding in bytes
+        :rtype: int
+        """
+        return max(self.headroom, min(self.cap, int(needed * (self.growth - 1))))
+
+    def in_range(self, padding: int) -> bool:
+        """
+            whether a tag with this padding is left as it is
+        """
+        return self.headroom <= padding <= self.cap
+
+    def padding_function(self, available: int, rewrite_only: bool = False) -> Callable[[PaddingInfo], int]:
+        """
+            mutagen padding function for a tag currently taking `available` bytes
+
+        :param available: size of the current tag, header and padding included
+        :type available: int
+        :param rewrite_only: give the target padding even when the frames fit (repad)
+        :type rewrite_only: bool
+        :return: the padding function
+        :rtype: Callable[[PaddingInfo], int]
+        """
+        def _padding(info: PaddingInfo) -> int:
+            if info.padding > self.cap:
+                # the frames fit, but the tag is shrunk, which makes the write a rewrite
+                return self.target(available - info.padding)
+
+            if info.padding >= 0 and (not rewrite_only or self.in_range(info.padding)):
+                return info.padding
+
+            return self.target(available - info.padding)
+
+        return _padding
+
+
+POLICY = PaddingPolicy.from_environment()
+
+
+class TagWrite(NamedTuple):
+    """
+        How a tag was written
+    """
+    in_place: bool  # only the tag was overwritten
+    bytes_written: int
+
+
+def _tag_end(file: BinaryIO) -> int:
+    file.seek(0)
+    header = id3_scanner.read_header(file)
+    return header.end if header is not None else 0
+
+
+def _copy_range(source: BinaryIO, target: BinaryIO, length: int) -> None:
+    """
+        Copies `length` bytes from the current position of `source` to `target`, with a fixed
+        size buffer
+    """
+    source_fd, target_fd = source.fileno(), target.fileno()
+
+    if hasattr(os, 'copy_file_range'):
+        target.flush()
+        try:
+            while length > 0:
+                copied = os.copy_file_range(source_fd, target_fd, min(length, 1 << 30))
+                if copied == 0:
+                    break
+                length -= copied
+
+            # the calls moved the file offsets behind the buffered objects' back
+            source.seek(os.lseek(source_fd, 0, os.SEEK_CUR))
+            target.seek(os.lseek(target_fd, 0, os.SEEK_CUR))
+        except OSError:
+            # not supported between these file systems, fall back to read/write
+            source.seek(os.lseek(source_fd, 0, os.SEEK_CUR))
+            target.seek(os.lseek(target_fd, 0, os.SEEK_CUR))
+
+    buffer = memoryview(bytearray(min(COPY_CHUNK, max(length, 1))))
+    while length > 0:
+        read = source.readinto(buffer[:min(length, len(buffer))])
+        if not read:
+            raise EOFError(f"{source.name} ended {length} bytes early")
+        target.write(buffer[:read])
+        length -= read
+
+
+def _fsync_directory(directory: str) -> None:
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # e.g. Windows, where directories can't be opened
+
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _rewrite(path: str, source: BinaryIO, data: bytes, audio_start: int, audio_end: int,
+             trailer: bytes) -> int:
+    """
+        Streams the new tag, the audio and the ID3v1 trailer into a temporary file which then
+        replaces the original
+    """
+    directory, name = os.path.split(path)
+    fd, temporary = tempfile.mkstemp(prefix=f'.{name}.', suffix='.tmp', dir=directory or '.')
+
+    try:
+        with os.fdopen(fd, 'wb') as target:
+            target.write(data)
+            source.seek(audio_start)
+            _copy_range(source, target, audio_end - audio_start)
+            target.write(trailer)
+
+            target.flush()
+            os.fsync(target.fileno())
+            size = target.tell()
+
+        original = os.stat(path)
+        os.chmod(temporary, stat.S_IMODE(original.st_mode))
+        if hasattr(os, 'chown'):
+            try:
+                os.chown(temporary, original.st_uid, original.st_gid)
+            except OSError:
+                pass  # only the owner or root can give the file away
+
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.unlink(temporary)
+        except OSError:
+            pass
+        raise
+
+    _fsync_directory(directory or '.')
+    return size
+
+
+def write_tag(path: str, tags: ID3, policy: Optional[PaddingPolicy] = None, v2_version: int = 4) -> TagWrite:
+    """
+        Writes the tag to the file: in place when it fits in the old tag's space, else with a
+        streaming rewrite into a temporary file renamed over the original. An ID3v1 tag at the
+        end of the file is updated (not added), like mutagen does.
+
+    :param path: path of the MP3 file (a symlink is followed, the file it points to is written)
+    :type path: str
+    :param tags: the tag to write
+    :type tags: ID3
+    :param policy: padding policy, POLICY when not given
+    :type policy: PaddingPolicy
+    :param v2_version: ID3v2 version to write, 3 or 4
+    :type v2_version: int
+    :return: whether the write was done in place and the number of bytes written
+    :rtype: TagWrite
+    """
+    return _write(path, tags, policy or POLICY, v2_version, rewrite_only=False)
+
+
+def _write(path: str, tags: ID3, policy: PaddingPolicy, v2_version: int, rewrite_only: bool) -> Optional[TagWrite]:
+    path = os.path.realpath(path)
+    if not STREAMING:
+        return _save(path, tags, policy, v2_version, rewrite_only)
+
+    with open(path, 'rb+') as file:
+        old_size = _tag_end(file)
+        padding = policy.padding_function(old_size, rewrite_only)
+        # noinspection PyProtectedMember
+        data = tags._prepare_data(file, 0, old_size, v2_version, '/', padding)  # pylint: disable=protected-access
+
+        v1_tag, v1_offset = find_id3v1(file)
+        trailer = MakeID3v1(tags) if v1_tag is not None else b''
+
+        if len(data) == old_size:
+            if rewrite_only:
+                return None
+
+            file.seek(0)
+            file.write(data)
+            if trailer:
+                file.seek(v1_offset, os.SEEK_END)
+                file.write(trailer)
+                file.truncate()
+            file.flush()
+            os.fsync(file.fileno())
+            return TagWrite(True, len(data) + len(trailer))
+
+        audio_end = file.seek(v1_offset, os.SEEK_END)
+        return TagWrite(False, _rewrite(path, file, data, old_size, audio_end, trailer))
+
+
+def _save(path: str, tags: ID3, policy: PaddingPolicy, v2_version: int, rewrite_only: bool) -> Optional[TagWrite]:
+    """
+        Fallback of :func:`_write` on mutagen's public save(), with the same padding function
+    """
+    with open(path, 'rb') as file:
+        old_size = _tag_end(file)
+
+    padding = policy.padding_function(old_size, rewrite_only)
+    kept = []
+
+    def _padding(info: PaddingInfo) -> int:
+        value = padding(info)
+        kept.append(value == info.padding)
+        return value
+
+    # the tag is written even when repad finds its padding in range, then in its own space
+    tags.save(path, v1=1, v2_version=v2_version, padding=_padding)
+
+    with open(path, 'rb') as file:
+        new_size = _tag_end(file)
+
+    if rewrite_only and all(kept):
+        return None
+
+    return TagWrite(new_size == old_size, new_size)
+
+
+def repad(path: str, policy: Optional[PaddingPolicy] = None) -> bool:
+    """
+        Gives the file the padding of the policy, if its padding is out of range (less than the
+        headroom, or more than the cap), so that later edits are written in place.
+        A file without ID3v2 tag gets an empty one.
+
+    :param path: path of the MP3 file
+    :type path: str
+    :param policy: padding policy, POLICY when not given
+    :type policy: PaddingPolicy
+    :return: whether the file was rewritten
+    :rtype: bool
+    """
+    try:
+        tags = ID3(path)
+    except ID3NoHeaderError:
+        tags = ID3()
+
+    return _write(path, tags, policy or POLICY, 4, rewrite_only=True) is not None
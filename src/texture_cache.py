@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Decodes album art straight from the tag bytes into Kivy textures, without writing a temporary
+    image file, and keeps the decoded textures in an LRU cache so that flipping between tracks of
+    the same album reuses the texture instead of decoding the image again.
+"""
+
+import hashlib
+from collections import OrderedDict
+from io import BytesIO
+
+from kivy.core.image import Image as CoreImage
+from kivy.graphics.texture import Texture
+
+# extension Kivy's image loaders expect for a mime type
+MIME_EXTENSIONS = {'image/jpeg': 'jpg', 'image/jpg': 'jpg', 'image/png': 'png', 'image/gif': 'gif',
+                   'image/bmp': 'bmp', 'image/webp': 'webp'}
+
+
+class TextureCache:
+    """
+        LRU cache of decoded album art, keyed by the hash of the image bytes and bounded by the
+        memory taken by the decoded textures
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        """
+
+        :param max_bytes: upper bound of the memory used by the cached textures (RGBA pixels)
+        :type max_bytes: int
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._textures = OrderedDict()
+
+    def __repr__(self) -> str:
+        return f"TextureCache({len(self._textures)} textures, {self.size} bytes)"
+
+    def __len__(self) -> int:
+        return len(self._textures)
+
+    def get(self, data: bytes, mime: str = 'image/jpeg') -> Texture:
+        """
+            Texture of the image, decoded only if it isn't cached yet
+
+        :param data: content of the image
+        :type data: bytes
+        :param mime: mime type of the image
+        :type mime: str
+        :return: the decoded texture
+        :rtype: Texture
+        :raises ValueError: the image is corrupt or of a format no image loader reads
+        """
+        key = hashlib.blake2b(data, digest_size=16).digest()
+
+        texture = self._textures.get(key)
+        if texture is not None:
+            self._textures.move_to_end(key)
+            return texture
+
+        try:
+            texture = CoreImage(BytesIO(data), ext=MIME_EXTENSIONS.get(mime.lower(), 'jpg')).texture
+        except Exception as error:  # pylint: disable=broad-except
+            # the loaders raise bare Exceptions (e.g. "Unknown <jpg> type, no loader found")
+            raise ValueError(f"Can't decode the {mime} image: {error}") from error
+        if texture is None:
+            raise ValueError(f"Can't decode the {mime} image")
+
+        self._textures[key] = texture
+        self.size += _texture_size(texture)
+
+        # evicting the least recently used textures, always keeping the one just decoded
+        while self.size > self.max_bytes and len(self._textures) > 1:
+            _, evicted = self._textures.popitem(last=False)
+            self.size -= _texture_size(evicted)
+
+        return texture
+
+    def clear(self) -> None:
+        """
+            Drops every cached texture
+        """
+        self._textures.clear()
+        self.size = 0
+
+
+def _texture_size(texture: Texture) -> int:
+    return texture.width * texture.height * 4
@@ -0,0 +1,143 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Timing spans and counters around the stages of tag operations.
+
+    Tracing is off unless the PYMTAG_TRACE environment variable is set, a comma separated list of:
+        summary             print a table of the spans and counters on exit
+        chrome:FILE.json    write the spans as Chrome trace events (chrome://tracing, Perfetto)
+
+    e.g. PYMTAG_TRACE=summary,chrome:/tmp/pymtag.json python py_main.py
+
+    When it is off, :func:`span` returns a shared no-op context manager and :func:`count` returns
+    immediately. Spans are recorded per process; work done in worker processes isn't collected.
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional, TextIO
+
+_SETTINGS = [setting.strip() for setting in os.environ.get('PYMTAG_TRACE', '').split(',') if setting.strip()]
+
+ENABLED = bool(_SETTINGS)
+
+_NO_SPAN = nullcontext()
+_ORIGIN = time.perf_counter()
+
+_events: List[tuple] = []  # (name, start, duration, thread id, args)
+_counters: Dict[str, int] = defaultdict(int)
+_lock = threading.Lock()
+_flushed = False
+
+
+@contextmanager
+def _span(name: str, args: dict):
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        _events.append((name, start, time.perf_counter() - start, threading.get_ident(), args))
+
+
+def span(name: str, **args):
+    """
+        Times the enclosed block when tracing is on.
+        The yielded dict can be filled with more arguments shown in the trace.
+
+    :param name: name of the stage, e.g. 'save.write'
+    :type name: str
+    :param args: arguments shown in the trace, e.g. the file path
+    :return: context manager
+    """
+    if not ENABLED:
+        return _NO_SPAN
+
+    return _span(name, args)
+
+
+def count(name: str, value: int = 1) -> None:
+    """
+        Adds to a counter (bytes_read, bytes_written, files_touched, ...) when tracing is on
+
+    :param name: name of the counter
+    :type name: str
+    :param value: amount to add
+    :type value: int
+    """
+    if not ENABLED:
+        return
+
+    with _lock:
+        _counters[name] += value
+
+
+def chrome_trace() -> dict:
+    """
+        The recorded spans and counters as Chrome trace events
+
+    :return: JSON serializable trace
+    :rtype: dict
+    """
+    pid = os.getpid()
+    events = [{'name': name, 'ph': 'X', 'ts': (start - _ORIGIN) * 1e6, 'dur': duration * 1e6, 'pid': pid,
+               'tid': thread, 'args': {key: str(value) for key, value in args.items()}}
+              for name, start, duration, thread, args in list(_events)]
+
+    end = (time.perf_counter() - _ORIGIN) * 1e6
+    events.extend({'name': name, 'ph': 'C', 'ts': end, 'pid': pid, 'args': {name: value}}
+                  for name, value in dict(_counters).items())
+
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def summary_table() -> str:
+    """
+        Count, total, mean and max duration of every span, followed by the counters
+
+    :return: the table
+    :rtype: str
+    """
+    durations = defaultdict(list)
+    for name, _start, duration, _thread, _args in list(_events):
+        durations[name].append(duration * 1000)
+
+    lines = [f"{'span':<32} {'count':>7} {'total ms':>11} {'mean ms':>10} {'max ms':>10}"]
+    for name, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+        lines.append(f"{name:<32} {len(values):>7} {sum(values):>11.2f} {sum(values) / len(values):>10.2f} "
+                     f"{max(values):>10.2f}")
+
+    lines.extend(f"{name:<32} {value:>7}" for name, value in sorted(_counters.items()))
+    return '\n'.join(lines)
+
+
+def flush(stream: Optional[TextIO] = None) -> None:
+    """
+        Writes the outputs selected in PYMTAG_TRACE; only the first call does anything.
+        Registered to run on exit, the GUI also calls it when it stops.
+
+    :param stream: where the summary is printed, stderr by default
+    :type stream: TextIO
+    """
+    global _flushed  # pylint: disable=global-statement
+    if not ENABLED or _flushed:
+        return
+    _flushed = True
+
+    for setting in _SETTINGS:
+        if setting == 'summary':
+            print(summary_table(), file=stream or sys.stderr)
+        elif setting.startswith('chrome:'):
+            with open(setting[len('chrome:'):], 'w') as trace_file:
+                json.dump(chrome_trace(), trace_file)
+
+
+if ENABLED:
+    atexit.register(flush)
@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Compact in-memory record of a track, for everything which holds a whole library at once
+    (the track table, the search index, rename plans).
+
+    A row of the library index as a dict costs well over a kilobyte per track: the dict itself,
+    the size and mtime, and the lyrics. A record only keeps the path and the short tags, in
+    slots instead of a dict, and the values which repeat across tracks (the directory of the
+    path, artist, album, album artist, genre, date, track number) are interned, so an album's 12
+    tracks share one string of each; the path is put back together when it is read. With typical
+    paths and titles a record costs about 280 bytes (see benchmarks/bench_memory.py), a million
+    tracks fit in a few hundred MB.
+
+    Records are read-only mappings, so they are passed wherever a row of tags is expected;
+    :meth:`TrackRecord.replace` makes an edited copy.
+"""
+
+import os
+import sys
+from collections.abc import Mapping
+from typing import Iterator, Mapping as MappingType
+
+from constants import Constants
+
+# tags of a record: every editor tag but the lyrics
+FIELDS = tuple(key for key in Constants() if key != 'lyrics')
+KEYS = ('path',) + FIELDS
+
+# tags shared by many tracks, interned; titles are mostly unique and kept as they are
+SHARED_FIELDS = frozenset(('artist', 'album', 'albumartist', 'genre', 'date', 'tracknumber'))
+
+
+class TrackRecord(Mapping):
+    """
+        Path and tags of a track, read like a row of `LibraryIndex.tracks()`
+    """
+
+    # the path is kept as its directory (shared by the tracks of an album) and its file name
+    __slots__ = ('_directory', '_name') + FIELDS
+
+    def __init__(self, path: str, **tags: str) -> None:
+        """
+
+        :param path: path of the MP3 file
+        :type path: str
+        :param tags: values of FIELDS, a missing or None value is stored as ''
+        :type tags: str
+        """
+        directory, separator, name = path.rpartition(os.sep)
+        object.__setattr__(self, '_directory', sys.intern(directory + separator))
+        object.__setattr__(self, '_name', name)
+        for key in FIELDS:
+            value = tags.get(key) or ''
+            object.__setattr__(self, key, sys.intern(value) if key in SHARED_FIELDS else value)
+
+    @classmethod
+    def from_row(cls, row: MappingType[str, str]) -> 'TrackRecord':
+        """
+            Record of a row with a 'path' and every tag of FIELDS, other keys (lyrics, size...)
+            are dropped
+
+        :param row: e.g. a row of `LibraryIndex.tracks()` or an sqlite3.Row
+        :type row: Mapping[str, str]
+        :return: the record
+        :rtype: TrackRecord
+        """
+        return cls(row['path'], **{key: row[key] for key in FIELDS})
+
+    @property
+    def path(self) -> str:
+        """
+            Path of the MP3 file
+        """
+        return self._directory + self._name
+
+    def __setattr__(self, key: str, value: object) -> None:
+        raise AttributeError(f"TrackRecord is read-only, use replace({key}=...)")
+
+    def __repr__(self) -> str:
+        return f"TrackRecord({self.path!r}, title={self.title!r})"
+
+    def __getitem__(self, key: str) -> str:
+        if key not in KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(KEYS)
+
+    def __len__(self) -> int:
+        return len(KEYS)
+
+    def __reduce__(self) -> tuple:
+        # slots and the read-only __setattr__ need help to be pickled (e.g. sent to a worker process)
+        return _unpickle, tuple(getattr(self, key) for key in KEYS)
+
+    def replace(self, **changes: str) -> 'TrackRecord':
+        """
+            Copy of the record with some values changed, e.g. record.replace(genre='Jazz')
+
+        :param changes: new values of 'path' or FIELDS
+        :type changes: str
+        :return: the new record
+        :rtype: TrackRecord
+        """
+        unknown = set(changes) - set(KEYS)
+        if unknown:
+            raise KeyError(f"Unknown keys: {', '.join(sorted(unknown))}")
+
+        values = {key: getattr(self, key) for key in KEYS}
+        values.update(changes)
+        return TrackRecord(**values)
+
+
+def _unpickle(path: str, *values: str) -> TrackRecord:
+    return TrackRecord(path, **dict(zip(FIELDS, values)))
@@ -0,0 +1,229 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Track table of the multi-file editing mode.
+
+    The rows are shown by a RecycleView: only the rows on screen have widgets, which are reused
+    while scrolling, so a library of 100k tracks doesn't create 100k widgets. Rows are selected
+    with click, ctrl+click and shift+click; a column can then be set for all selected rows. Edits
+    are only kept for the files whose value differs from the one they were loaded with, so saving
+    writes those files and nothing else.
+
+    The data of the view are the TrackRecords themselves (they are read-only mappings, which is all
+    the RecycleView needs), an edited row gets an edited copy; there is no per-row dict.
+"""
+
+from typing import Dict, Iterable, List, Mapping
+
+from kivy.graphics import Color, Rectangle
+from kivy.metrics import dp
+from kivy.properties import BooleanProperty
+from kivy.uix.behaviors import FocusBehavior
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.label import Label
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.layout import LayoutSelectionBehavior
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+
+from constants import Constants
+from track_record import TrackRecord
+
+CONSTANTS = Constants()
+
+# editable columns, lyrics don't fit in a table cell
+COLUMNS = ('tracknumber', 'title', 'artist', 'album', 'albumartist', 'genre', 'date')
+
+ROW_HEIGHT = dp(28)
+
+
+def _cell(text: str = '', bold: bool = False) -> Label:
+    label = Label(text=text, color=(0, 0, 0, 1), bold=bold, shorten=True, shorten_from='right',
+                  halign='left', valign='middle')
+    label.bind(size=label.setter('text_size'))
+    return label
+
+
+class SelectableTrackLayout(FocusBehavior, LayoutSelectionBehavior, RecycleBoxLayout):
+    """
+        Layout of the rows, keeps track of the selected rows
+    """
+
+
+class TrackRow(RecycleDataViewBehavior, BoxLayout):
+    """
+        A row of the table, reused for whichever track is scrolled into view
+    """
+
+    selected = BooleanProperty(False)
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(orientation='horizontal', **kwargs)
+        self.index = None
+        self.path = ''
+
+        self.cells = {key: _cell() for key in COLUMNS}
+        for cell in self.cells.values():
+            self.add_widget(cell)
+
+        with self.canvas.before:
+            self._background = Color(0, 0, 0, 0)
+            self._rectangle = Rectangle(pos=self.pos, size=self.size)
+        self.bind(pos=self._redraw, size=self._redraw)
+
+    def __repr__(self) -> str:
+        return f"TrackRow({self.path!r})"
+
+    def _redraw(self, *_) -> None:
+        self._rectangle.pos, self._rectangle.size = self.pos, self.size
+
+    def refresh_view_attrs(self, rv: RecycleView, index: int, data: dict) -> None:
+        """
+            Shows the track at `index`
+        """
+        self.index = index
+        for key, cell in self.cells.items():
+            cell.text = data[key]
+
+        super().refresh_view_attrs(rv, index, data)
+
+    def on_touch_down(self, touch) -> bool:
+        if super().on_touch_down(touch):
+            return True
+
+        if self.collide_point(*touch.pos):
+            return self.parent.select_with_touch(self.index, touch)
+
+        return False
+
+    def apply_selection(self, _rv: RecycleView, _index: int, is_selected: bool) -> None:
+        """
+            Highlights the row when it is selected
+        """
+        self.selected = is_selected
+        self._background.rgba = (0, 0, 1, 0.3) if is_selected else (0, 0, 0, 0)
+
+
+class TrackTable(BoxLayout):
+    """
+        Header and virtualized rows of the tracks, with the edits not saved yet
+    """
+
+    def __init__(self, **kwargs) -> None:
+        kwargs['orientation'] = 'vertical'
+        super().__init__(**kwargs)
+
+        header = BoxLayout(orientation='horizontal', size_hint_y=None, height=ROW_HEIGHT)
+        for key in COLUMNS:
+            header.add_widget(_cell(CONSTANTS[key], bold=True))
+
+        self.rows = SelectableTrackLayout(default_size=(None, ROW_HEIGHT), default_size_hint=(1, None),
+                                          size_hint_y=None, orientation='vertical', multiselect=True,
+                                          touch_multiselect=False)
+        self.rows.bind(minimum_height=self.rows.setter('height'))
+
+        self.view = RecycleView(viewclass=TrackRow)
+        self.view.add_widget(self.rows)
+
+        for widget in header, self.view:
+            self.add_widget(widget)
+
+        self._loaded: Dict[str, TrackRecord] = {}  # path -> track as in its file
+        self._indices: Dict[str, int] = {}  # path -> row
+        self.edits: Dict[str, Dict[str, str]] = {}  # path -> tags whose value differs from the file
+
+    def __repr__(self) -> str:
+        return f"TrackTable({len(self.view.data)} tracks, {len(self.edits)} edited)"
+
+    def show(self, rows: Iterable[Mapping[str, str]]) -> None:
+        """
+            Replaces the tracks of the table, pending edits are dropped
+
+        :param rows: path and tags of every track, e.g. `LibraryIndex.records()`
+        :type rows: Iterable[Mapping[str, str]]
+        """
+        self.rows.clear_selection()
+        self.edits.clear()
+        records = [row if isinstance(row, TrackRecord) else TrackRecord.from_row(row) for row in rows]
+        self._loaded = {record.path: record for record in records}
+        self.view.data = records
+        self._indices = {record.path: index for index, record in enumerate(records)}
+
+    @property
+    def selected_paths(self) -> List[str]:
+        """
+            paths of the selected tracks
+        """
+        return [self.view.data[index]['path'] for index in self.rows.selected_nodes]
+
+    def select_all(self) -> None:
+        """
+            Selects every track
+        """
+        for index in range(len(self.view.data)):
+            self.rows.select_node(index)
+
+    def select_paths(self, paths: Iterable[str]) -> int:
+        """
+            Selects exactly the given tracks, e.g. the results of a search; tracks which aren't
+            in the table are ignored
+
+        :param paths: paths of the tracks to select
+        :type paths: Iterable[str]
+        :return: number of selected tracks
+        :rtype: int
+        """
+        self.rows.clear_selection()
+        indices = sorted(index for index in map(self._indices.get, paths) if index is not None)
+        for index in indices:
+            self.rows.select_node(index)
+
+        if indices:
+            # scrolls the first match into view, scroll_y is 1 at the top
+            self.view.scroll_y = 1 - indices[0] / max(len(self.view.data) - 1, 1)
+
+        return len(indices)
+
+    def edit_column(self, key: str, value: str) -> int:
+        """
+            Sets a column for all selected tracks
+
+        :param key: one of COLUMNS
+        :type key: str
+        :param value: the new value, '' removes the tag
+        :type value: str
+        :return: number of tracks with edits to save
+        :rtype: int
+        """
+        if key not in COLUMNS:
+            raise KeyError(f"Unknown column: {key}")
+
+        data = self.view.data
+        for index in self.rows.selected_nodes:
+            path = data[index].path
+            # set on the list itself, the view is refreshed once below instead of for every row
+            list.__setitem__(data, index, data[index].replace(**{key: value}))
+
+            edits = self.edits.setdefault(path, {})
+            if value == self._loaded[path][key]:
+                edits.pop(key, None)
+                if not edits:
+                    del self.edits[path]
+            else:
+                edits[key] = value
+
+        self.view.refresh_from_data()
+        return len(self.edits)
+
+    def saved(self, paths: Iterable[str]) -> None:
+        """
+            Marks the edits of the given tracks as written to their files
+
+        :param paths: tracks which were saved (or didn't need to be)
+        :type paths: Iterable[str]
+        """
+        for path in paths:
+            if self.edits.pop(path, None) is not None:
+                self._loaded[path] = self.view.data[self._indices[path]]
@@ -0,0 +1,397 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Watch folder ingest: new or modified MP3s dropped in a folder are tagged automatically.
+
+    Changes are picked up with inotify on Linux and by polling the folder elsewhere. A file is only
+    ingested once its size and modification time stopped changing for `settle` seconds, so a
+    rip still being copied isn't touched. Ingesting a file adds a missing ID3 header, embeds the
+    album art (the given image, or the cover/folder image next to the file when it has none) and
+    renames it with a `Constants.rename` template. Ready files are processed in batches on a
+    process pool and the library index is updated with the results.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import artwork
+import tag_engine
+from library_index import LibraryIndex
+
+# image files used as album art when no image is given, looked up next to the MP3 file
+FOLDER_COVERS = ('cover.jpg', 'folder.jpg', 'front.jpg', 'cover.png', 'folder.png', 'front.png')
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+class WatchOptions(NamedTuple):
+    """
+        What is done to every ingested file
+    """
+    naming_format: str = 'no-rename'  # key or template of `Constants.rename`
+    cover: Optional[str] = None  # image embedded in every file, else the folder image if the file has none
+    normalize: Optional[artwork.NormalizeOptions] = None  # normalization of the album art
+    settle: float = 2.0  # seconds a file must stay unchanged before it is ingested
+    poll_interval: float = 1.0  # seconds between scans when inotify isn't available
+    batch_size: int = 64  # files handed to the pool at once
+
+
+def _is_mp3(path: str) -> bool:
+    return path.lower().endswith('.mp3')
+
+
+def _signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat.st_size, stat.st_mtime_ns
+
+
+def folder_cover(directory: str) -> Optional[str]:
+    """
+        Album art image lying next to the MP3 files, see FOLDER_COVERS
+
+    :param directory: directory of the MP3 file
+    :type directory: str
+    :return: path of the image, None if there is none
+    :rtype: str
+    """
+    try:
+        names = {name.lower(): name for name in os.listdir(directory)}
+    except OSError:
+        return None
+
+    for cover in FOLDER_COVERS:
+        if cover in names:
+            return os.path.join(directory, names[cover])
+
+    return None
+
+
+def ingest_file(path: str, options: WatchOptions = WatchOptions()) -> Tuple[str, Dict[str, str]]:
+    """
+        Adds a missing ID3 header, embeds the album art and renames the file, in a single parse
+        and a single write. Files missing a tag used by the rename template keep their name.
+
+    :param path: path of the MP3 file
+    :type path: str
+    :param options: what is done to the file
+    :type options: WatchOptions
+    :return: the (new) path of the file and its tags
+    :rtype: tuple
+    """
+    session = tag_engine.TagSession(path)
+
+    image = options.cover
+    if image is None and session.cover is None:
+        image = folder_cover(os.path.dirname(path))
+    if image is not None:
+        session.cover = artwork.load(image, options.normalize).picture()
+
+    # what file_open used to do on ID3NoHeaderError: write an empty tag
+    session.save(force=not session.has_header)
+
+    values = session.values()
+    template = tag_engine.rename_template(options.naming_format)
+    if template is None or tag_engine.missing_tags(template, values):
+        # a fresh rip without tags keeps its name
+        return path, values
+
+    return tag_engine.rename_file(path, template, values), values
+
+
+class PollingWatcher:
+    """
+        Finds changed MP3 files by comparing the size and modification time of every file
+        between two scans
+    """
+
+    def __init__(self, directories: Iterable[str], recursive: bool = True, interval: float = 1.0) -> None:
+        self.directories = list(directories)
+        self.recursive = recursive
+        self.interval = interval
+        self._snapshot = self._scan()
+        self._scanned = time.monotonic()
+
+    def __repr__(self) -> str:
+        return f"PollingWatcher({self.directories!r})"
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for path in tag_engine.iter_mp3_files(self.directories, self.recursive):
+            signature = _signature(path)
+            if signature is not None:
+                snapshot[path] = signature
+
+        return snapshot
+
+    def changes(self, timeout: float) -> Set[str]:
+        """
+            Files created or modified since the last call, waits up to `timeout` seconds for the
+            next scan
+
+        :param timeout: seconds to wait at most
+        :type timeout: float
+        :return: paths of the changed files
+        :rtype: set
+        """
+        wait = self._scanned + self.interval - time.monotonic()
+        if wait > timeout:
+            time.sleep(max(timeout, 0))
+            return set()
+
+        time.sleep(max(wait, 0))
+        snapshot, self._scanned = self._scan(), time.monotonic()
+        changed = {path for path, signature in snapshot.items() if self._snapshot.get(path) != signature}
+        self._snapshot = snapshot
+
+        return changed
+
+    def close(self) -> None:
+        """
+            Nothing to release
+        """
+
+
+class InotifyWatcher:
+    """
+        Finds changed MP3 files with Linux inotify, new sub directories are watched as they appear
+    """
+
+    def __init__(self, directories: Iterable[str], recursive: bool = True) -> None:
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        self.directories = list(directories)
+        self.recursive = recursive
+        self._watches: Dict[int, str] = {}
+        self._started = time.time_ns()
+
+        try:
+            for directory in self.directories:
+                self._watch_tree(directory)
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    def __repr__(self) -> str:
+        return f"InotifyWatcher({self.directories!r})"
+
+    def _watch(self, directory: str) -> None:
+        descriptor = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if descriptor < 0:
+            raise OSError(ctypes.get_errno(), f'inotify_add_watch failed on {directory}')
+        self._watches[descriptor] = directory
+
+    def _watch_tree(self, directory: str) -> None:
+        for sub_directory, sub_directories, _file_names in os.walk(directory):
+            self._watch(sub_directory)
+            if not self.recursive:
+                sub_directories.clear()
+
+    def _modified_since_start(self) -> Set[str]:
+        # events were lost, fall back to the modification times
+        return {path for path in tag_engine.iter_mp3_files(self.directories, self.recursive)
+                if (_signature(path) or (0, 0))[1] >= self._started}
+
+    def changes(self, timeout: float) -> Set[str]:
+        """
+            Files created or modified since the last call, waits up to `timeout` seconds for events
+
+        :param timeout: seconds to wait at most
+        :type timeout: float
+        :return: paths of the changed files
+        :rtype: set
+        """
+        readable, _writable, _errors = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changed = set()
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+
+            offset = 0
+            while offset < len(buffer):
+                descriptor, mask, _cookie, length = EVENT_HEADER.unpack_from(buffer, offset)
+                name = buffer[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+                offset += EVENT_HEADER.size + length
+
+                if mask & IN_Q_OVERFLOW:
+                    changed |= self._modified_since_start()
+                    continue
+                if mask & IN_IGNORED:
+                    self._watches.pop(descriptor, None)
+                    continue
+
+                directory = self._watches.get(descriptor)
+                if directory is None:
+                    continue
+
+                path = os.path.join(directory, os.fsdecode(name))
+                if mask & IN_ISDIR:
+                    if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                        # files may have landed in it before it was watched
+                        self._watch_tree(path)
+                        changed.update(tag_engine.iter_mp3_files([path]))
+                elif _is_mp3(path):
+                    changed.add(path)
+
+        return changed
+
+    def close(self) -> None:
+        """
+            Closes the inotify descriptor
+        """
+        os.close(self._fd)
+
+
+def open_watcher(directories: Iterable[str], recursive: bool = True, poll_interval: float = 1.0):
+    """
+        inotify watcher on Linux, polling watcher where inotify isn't available
+
+    :param directories: directories to watch
+    :type directories: Iterable[str]
+    :param recursive: watch the sub directories as well
+    :type recursive: bool
+    :param poll_interval: seconds between scans of the polling watcher
+    :type poll_interval: float
+    :return: the watcher
+    :rtype: InotifyWatcher or PollingWatcher
+    """
+    directories = list(directories)
+    try:
+        return InotifyWatcher(directories, recursive)
+    except (OSError, AttributeError):
+        return PollingWatcher(directories, recursive, poll_interval)
+
+
+class _Debouncer:
+    """
+        Holds changed files back until they stopped changing for `settle` seconds
+    """
+
+    def __init__(self, settle: float) -> None:
+        self.settle = settle
+        self._pending: Dict[str, Tuple[Optional[Tuple[int, int]], float]] = {}
+        self._ingested: Dict[str, Tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def changed(self, paths: Iterable[str]) -> None:
+        now = time.monotonic()
+        for path in paths:
+            self._pending[path] = (_signature(path), now)
+
+    def ingested(self, path: str) -> None:
+        """
+            Remembers the state the file was left in, so the events of our own write are ignored
+        """
+        signature = _signature(path)
+        if signature is not None:
+            self._ingested[path] = signature
+
+    def ready(self) -> List[str]:
+        now, ready = time.monotonic(), []
+        for path, (signature, since) in list(self._pending.items()):
+            if now - since < self.settle:
+                continue
+
+            current = _signature(path)
+            if current is None or current == self._ingested.get(path):
+                del self._pending[path]
+            elif current != signature:
+                # still being written
+                self._pending[path] = (current, now)
+            else:
+                del self._pending[path]
+                ready.append(path)
+
+        return ready
+
+
+def watch(directories: Iterable[str], options: WatchOptions = WatchOptions(), library: Optional[LibraryIndex] = None,
+          workers: Optional[int] = None, recursive: bool = True, stop: Optional[threading.Event] = None,
+          on_result: Optional[Callable[[tag_engine.JobResult], None]] = None) -> None:
+    """
+        Ingests the MP3 files created or modified in the directories until `stop` is set
+
+    :param directories: directories to watch
+    :type directories: Iterable[str]
+    :param options: what is done to every file
+    :type options: WatchOptions
+    :param library: library index to update with the ingested files
+    :type library: LibraryIndex
+    :param workers: number of worker processes, all cores when None
+    :type workers: int
+    :param recursive: watch the sub directories as well
+    :type recursive: bool
+    :param stop: set to stop watching
+    :type stop: threading.Event
+    :param on_result: called with the result of every ingested file, its value is (new path, tags)
+    :type on_result: Callable
+    """
+    stop = stop or threading.Event()
+    watcher = open_watcher(directories, recursive, options.poll_interval)
+    debouncer = _Debouncer(options.settle)
+    job = partial(ingest_file, options=options)
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        try:
+            while not stop.is_set():
+                # wake up in time to hand over files which settled
+                debouncer.changed(watcher.changes(min(options.settle, 1.0) if len(debouncer) else 1.0))
+
+                ready = debouncer.ready()
+                for start in range(0, len(ready), options.batch_size):
+                    batch = ready[start:start + options.batch_size]
+                    for result in tag_engine.process_tree(batch, job, recursive=False, executor=pool):
+                        _record_result(result, debouncer, library)
+                        if on_result is not None:
+                            on_result(result)
+        finally:
+            watcher.close()
+
+
+def _record_result(result: tag_engine.JobResult, debouncer: _Debouncer, library: Optional[LibraryIndex]) -> None:
+    if not result.ok:
+        debouncer.ingested(result.path)
+        return
+
+    new_path, tags = result.value
+    debouncer.ingested(new_path)
+
+    if library is not None:
+        if new_path != result.path:
+            library.rename(result.path, new_path)
+        library.update(new_path, tags)
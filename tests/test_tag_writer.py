@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+
+"""
+    18-10-2026
+
+    Regression checks of tag_writer, the one code path that rewrites audio files: the audio must
+    come out byte for byte, with the new tag and an updated ID3v1 trailer, whether the tag is
+    written in place, grows through the streaming rewrite or is repadded. The same checks run on
+    the fallback to mutagen's save().
+
+    Usage: python -m unittest discover tests
+"""
+
+import os
+import random
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+# pylint: disable=wrong-import-position
+from mutagen.id3 import APIC, ID3, TIT2
+
+import id3_scanner
+import tag_writer
+
+POLICY = tag_writer.PaddingPolicy(headroom=1024, growth=1.25, cap=64 * 1024)
+
+# MPEG-1 layer III frame header, 128 kbps 44.1 kHz, followed by noise so misplaced bytes show
+MPEG_HEADER = b'\xff\xfb\x90\x64'
+
+
+def _id3v1(title: str) -> bytes:
+    return b'TAG' + title.encode('latin-1').ljust(30, b'\x00') + b'\x00' * 94 + b'\xff'
+
+
+class TagWriterTest(unittest.TestCase):
+    """
+        Writes through the streaming rewrite
+    """
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = os.path.join(self.directory.name, 'track.mp3')
+        rng = random.Random(2018)
+        self.audio = b''.join(MPEG_HEADER + rng.randbytes(413) for _ in range(50))
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def _make(self, padding: int, trailer: bool = False) -> None:
+        with open(self.path, 'wb') as file:
+            file.write(self.audio + (_id3v1('Old') if trailer else b''))
+
+        tags = ID3()
+        tags.add(TIT2(encoding=3, text='Old'))
+        tags.save(self.path, v1=1, padding=lambda _info: padding)
+
+    def _read(self, trailer: bool = False):
+        """
+            (tags, padding of the tag, audio, ID3v1 trailer) of the file; the padding is counted
+            from the zero bytes ending the tag, which may include a terminator of the last frame
+        """
+        with open(self.path, 'rb') as file:
+            end = id3_scanner.read_header(file).end
+            file.seek(0)
+            data = file.read()
+
+        frames = data[10:end]
+        audio, v1 = (data[end:-128], data[-128:]) if trailer else (data[end:], b'')
+        return ID3(self.path), len(frames) - len(frames.rstrip(b'\x00')), audio, v1
+
+    def test_in_place(self):
+        self._make(padding=4096)
+        size, old_padding = os.path.getsize(self.path), self._read()[1]
+
+        tags = ID3(self.path)
+        tags.add(TIT2(encoding=3, text='New'))
+        written = tag_writer.write_tag(self.path, tags, POLICY)
+
+        self.assertTrue(written.in_place)
+        self.assertEqual(os.path.getsize(self.path), size)
+        tags, padding, audio, _v1 = self._read()
+        self.assertEqual(str(tags['TIT2']), 'New')
+        self.assertEqual(padding, old_padding)  # same size title, same space
+        self.assertEqual(audio, self.audio)
+
+    def _grow(self, trailer: bool) -> None:
+        self._make(padding=0, trailer=trailer)
+
+        tags = ID3(self.path)
+        tags.add(TIT2(encoding=3, text='New'))
+        tags.add(APIC(mime='image/png', type=3, desc='Cover', encoding=3,
+                      data=b'\x89PNG\r\n\x1a\n' + random.Random(1).randbytes(20000) + b'\xff'))
+        written = tag_writer.write_tag(self.path, tags, POLICY)
+
+        self.assertFalse(written.in_place)
+        tags, padding, audio, v1 = self._read(trailer)
+        self.assertEqual(str(tags['TIT2']), 'New')
+        self.assertEqual(len(tags.getall('APIC')[0].data), 20009)
+        self.assertTrue(POLICY.in_range(padding), padding)
+        self.assertEqual(audio, self.audio)
+        if trailer:
+            self.assertEqual(v1[:3 + 30], b'TAG' + b'New'.ljust(30, b'\x00'))
+        else:
+            self.assertNotIn(b'TAG', self._tail())  # an ID3v1 tag is updated, never added
+
+    def _tail(self) -> bytes:
+        with open(self.path, 'rb') as file:
+            file.seek(-128, os.SEEK_END)
+            return file.read(3)
+
+    def test_grow(self):
+        self._grow(trailer=False)
+
+    def test_grow_with_id3v1(self):
+        self._grow(trailer=True)
+
+    def test_padding_over_cap_is_shrunk(self):
+        self._make(padding=POLICY.cap * 4)
+
+        tags = ID3(self.path)
+        tags.add(TIT2(encoding=3, text='New'))
+        written = tag_writer.write_tag(self.path, tags, POLICY)
+
+        self.assertFalse(written.in_place)
+        _tags, padding, audio, _v1 = self._read()
+        self.assertTrue(POLICY.in_range(padding), padding)
+        self.assertEqual(audio, self.audio)
+
+    def test_repad(self):
+        self._make(padding=0, trailer=True)
+
+        self.assertTrue(tag_writer.repad(self.path, POLICY))
+        tags, padding, audio, v1 = self._read(trailer=True)
+        self.assertEqual(str(tags['TIT2']), 'Old')
+        self.assertTrue(POLICY.in_range(padding), padding)
+        self.assertEqual(audio, self.audio)
+        self.assertEqual(v1[:3], b'TAG')
+
+        self.assertFalse(tag_writer.repad(self.path, POLICY))
+
+
+class SaveFallbackTest(TagWriterTest):
+    """
+        The same writes through mutagen's save(), as with a mutagen lacking the internals
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        patcher = mock.patch.object(tag_writer, 'STREAMING', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+if __name__ == '__main__':
+    unittest.main()